@@ -2,13 +2,20 @@
 Analizador de IA Unificado
 Combina patrones, datos de Futures, y volumen para señales de alta confianza
 """
-import pandas as pd
+import time
 import logging
-from binance.client import Client
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from config import Config
+from binance_client import get_client, WeightLimiter
+from candles import CandleStore
 from pattern_recognition import PatternRecognizer
 from futures_data import FuturesAnalyzer
-from volume_analyzer import VolumeAnalyzer
+from volume_analyzer import VolumeAnalyzer, PROFILE_CANDLES
+from market_stream import KlineStream
+from scan_scheduler import TierScheduler
+from analyzer import MultiTimeframeAnalyzer
+from analysis_service import analysis_cache
+from rule_tables import rules
 
 logger = logging.getLogger(__name__)
 
@@ -16,17 +23,60 @@ logger = logging.getLogger(__name__)
 class AIAnalyzer:
     """Analizador avanzado que combina múltiples fuentes"""
     
-    def __init__(self):
-        self.client = Client(Config.BINANCE_API_KEY, Config.BINANCE_SECRET_KEY)
+    # Velas que se guardan por símbolo: (intervalo, cantidad). De 1h se
+    # piden las del perfil de volumen (mismo peso REST que 100)
+    CANDLE_WINDOWS = (('1h', PROFILE_CANDLES), ('15m', 50))
+    
+    # Velas de 1h de patrones y volumen (las últimas de candles_1h)
+    ANALYSIS_CANDLES = 100
+    
+    # Peso REST del resto de datos de un análisis: ticker + funding + OI
+    # (OI histórico y ratio L/S van a /futures/data, con límite propio)
+    INPUT_WEIGHT = 3
+    
+    def __init__(self, stream: bool = None, tiers: bool = None):
+        """
+        Args:
+            stream: suscribir el stream de velas (Config.STREAM_ENABLED por defecto)
+            tiers: planificador por niveles (Config.TIERS_ENABLED por defecto)
+        """
+        if stream is None:
+            stream = Config.STREAM_ENABLED
+        if tiers is None:
+            tiers = Config.TIERS_ENABLED
+        
+        self.client = get_client()
         self.pattern_recognizer = PatternRecognizer()
         self.futures_analyzer = FuturesAnalyzer()
         self.volume_analyzer = VolumeAnalyzer()
         
+        # Velas en memoria: en cada análisis solo se descargan las nuevas
+        self.candles = CandleStore(self.client)
+        self.backfill_limiter = WeightLimiter(Config.BACKFILL_WEIGHT_PER_MINUTE)
+        
         # Umbral mínimo de confianza para emitir señal
         self.min_confidence = 70
+        
+        # Frecuencia de escaneo por niveles (liquidez, volatilidad, cercanía al umbral)
+        self.scheduler = TierScheduler(self.min_confidence) if tiers else None
+        
+        # Señal multi-timeframe por símbolo (del último barrido), sobre el mismo CandleStore
+        self.mtf = MultiTimeframeAnalyzer(candles=self.candles) if Config.MTF_CONFIRMATION else None
+        self.trends = {}  # symbol -> 'LONG' / 'SHORT' / None
+        
+        # Universo del último get_scan_pairs (lo que vigilan stream y sondeo de OI)
+        self.universe = []
+        
+        # Stream de velas: mantiene las estadísticas de volumen al día
+        self.stream = None
+        if stream:
+            self.stream = KlineStream(intervals=('15m', '1h'))
+            self.stream.add_listener(self.volume_analyzer.stats.on_kline)
     
-    def get_klines_df(self, symbol: str, interval: str = '1h', limit: int = 100) -> pd.DataFrame:
+    def get_klines_df(self, symbol: str, interval: str = '1h', limit: int = 100):
         """Obtiene datos de velas como DataFrame"""
+        import pandas as pd  # solo aquí: el camino rápido usa arrays
+        
         try:
             klines = self.client.futures_klines(
                 symbol=symbol,
@@ -52,13 +102,28 @@ class AIAnalyzer:
             logger.error(f"Error obteniendo datos: {e}")
             return None
     
-    def analyze_symbol(self, symbol: str) -> dict:
+    def get_klines_arrays(self, symbol: str, interval: str = '1h', limit: int = 100,
+                          limiter: WeightLimiter = None) -> dict:
+        """Obtiene datos de velas como arrays de numpy (sin DataFrame)"""
+        try:
+            return self.candles.get(symbol, interval, limit, limiter=limiter)
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo datos: {e}")
+            return None
+    
+    def fetch_inputs(self, symbol: str, limiter: WeightLimiter = None) -> dict:
         """
-        Análisis completo de un símbolo usando IA
+        Descarga los datos de un análisis (precio, velas y métricas de Futures)
+        
+        Args:
+            limiter: presupuesto de peso a descontar (backfill)
         
         Returns:
-            dict con señal, confianza, y razones detalladas
+            dict con price, candles_1h, candles_15m, spike_15m y futures o None
         """
+        if limiter:
+            limiter.acquire(self.INPUT_WEIGHT)
         
         # Obtener precio actual
         try:
@@ -68,20 +133,105 @@ class AIAnalyzer:
             return None
         
         # 1. Obtener datos de velas
-        df = self.get_klines_df(symbol, '1h', 100)
-        if df is None:
+        candles_1h = self.get_klines_arrays(symbol, '1h', PROFILE_CANDLES, limiter)
+        if candles_1h is None:
+            return None
+        
+        # 2. Datos de Futures
+        futures_analysis = self.futures_analyzer.get_full_futures_analysis(symbol)
+        
+        # 3. Spike de volumen de 15m: del stream si está caliente (se guarda
+        #    ya evaluado: el cómputo puede llegar después de max_age), si no
+        #    de las velas
+        candles_15m = None
+        spike_15m = self.volume_analyzer.stats.spike(symbol, '15m')
+        if spike_15m is None:
+            candles_15m = self.get_klines_arrays(symbol, '15m', 50, limiter)
+        
+        return {
+            'price': current_price,
+            'candles_1h': candles_1h,
+            'candles_15m': candles_15m,
+            'spike_15m': spike_15m,
+            'futures': futures_analysis,
+        }
+    
+    def analyze_symbol(self, symbol: str, inputs: dict = None) -> dict:
+        """
+        Análisis completo de un símbolo usando IA
+        
+        Args:
+            inputs: datos ya descargados por fetch_inputs (si no, se descargan)
+        
+        Returns:
+            dict con señal, confianza, y razones detalladas
+        """
+        if inputs is None:
+            inputs = self.fetch_inputs(symbol)
+        if inputs is None:
             return None
         
-        # 2. Análisis de patrones
-        patterns = self.pattern_recognizer.find_all_patterns(df)
+        return self.analyze_arrays(symbol, inputs['price'], inputs['candles_1h'],
+                                   inputs['candles_15m'], inputs['futures'],
+                                   spike_15m=inputs.get('spike_15m'))
+    
+    def record(self, analysis: dict):
+        """
+        Registra un análisis del barrido en el planificador y en la caché
+        del bot (solo desde el hilo del escáner: workers y análisis bajo
+        demanda no lo llaman)
+        """
+        if not analysis:
+            return
+        
+        if self.scheduler:
+            self.scheduler.record(analysis)
+        
+        # Último análisis disponible para el bot
+        analysis_cache.put(analysis)
+    
+    def analyze_arrays(self, symbol: str, current_price: float, candles_1h: dict,
+                       candles_15m: dict, futures_analysis: dict, spike_15m: dict = None) -> dict:
+        """
+        Parte de cómputo del análisis: patrones + volumen + scoring
+        sobre arrays de numpy ya descargados
+        
+        Args:
+            candles_1h: velas de 1h (PROFILE_CANDLES para el perfil; patrones
+                y volumen miran las últimas ANALYSIS_CANDLES)
+            spike_15m: spike de 15m evaluado en el stream al descargar
+                (si falta, de candles_15m o del stream ahora)
+        
+        Returns:
+            dict con señal, confianza, y razones detalladas
+        """
+        started = time.perf_counter()
+        
+        profile_candles = candles_1h
+        candles_1h = {col: values[-self.ANALYSIS_CANDLES:] for col, values in candles_1h.items()}
+        
+        # 4. Análisis de patrones
+        patterns = self.pattern_recognizer.find_patterns(candles_1h, symbol)
         pattern_signal = self.pattern_recognizer.get_pattern_signal(patterns)
         
-        # 3. Datos de Futures
-        futures_analysis = self.futures_analyzer.get_full_futures_analysis(symbol)
+        # 5. Análisis de volumen (las mismas 100 velas de 1h, sin otra petición)
+        stats = self.volume_analyzer.stats
+        stats.sync(symbol, '1h', candles_1h)
+        volume_analysis = (self.volume_analyzer.analyze_volume_stream(symbol, '1h')
+                           or self.volume_analyzer.analyze_volume(candles_1h['volume']))
         
-        # 4. Análisis de volumen
-        volume_analysis = self.volume_analyzer.get_volume_analysis(symbol)
-        volume_spike = self.volume_analyzer.detect_volume_spike(symbol)
+        if candles_15m is not None:
+            stats.sync(symbol, '15m', candles_15m)
+            volume_spike = self.volume_analyzer.detect_spike(
+                candles_15m['volume'], candles_15m['close']
+            )
+        elif spike_15m is not None:
+            volume_spike = spike_15m
+        else:
+            volume_spike = stats.spike(symbol, '15m')
+        
+        # 6. Perfil de volumen (en caché hasta el cierre de 1h; el barrido lo calcula en lote)
+        profile = self.volume_analyzer.get_volume_profiles([symbol], candles={symbol: profile_candles}).get(symbol)
         
         # === CONSOLIDAR SEÑALES ===
         bullish_score = 0
@@ -115,15 +265,16 @@ class AIAnalyzer:
         elif volume_analysis and volume_analysis['signal'] in ['STRONG_MOVE', 'MOVE']:
             all_reasons.append(f"📊 {volume_analysis['interpretation']}")
         
+        # Perfil de volumen: contexto, no suma score
+        if profile and profile['current_in_hvz']:
+            all_reasons.append(f"📊 {profile['interpretation']}")
+        
         # === DETERMINAR SEÑAL FINAL ===
         total_score = max(bullish_score, bearish_score)
         
-        # Normalizar confianza (máximo 95%)
-        if total_score > 0:
-            # Promedio ponderado para no inflar demasiado
-            confidence = min(95, int(total_score / 2) + 30)
-        else:
-            confidence = 0
+        # Normalizar confianza (máximo 95%, ver signal_consolidation en rules.json)
+        # Promedio ponderado para no inflar demasiado
+        confidence = int(rules.signal_confidence(total_score))
         
         if bullish_score > bearish_score and confidence >= self.min_confidence:
             signal = 'LONG'
@@ -132,6 +283,11 @@ class AIAnalyzer:
         else:
             signal = None
         
+        # Tendencia 4H/1H/15m del barrido (MTF_CONFIRMATION): contexto, no suma score
+        trend = self.trends.get(symbol)
+        if signal and trend == signal:
+            all_reasons.append(f"📈 Tendencia 4H, 1H y 15m confirma {signal}")
+        
         # === CONSTRUIR RESULTADO ===
         result = {
             'symbol': symbol,
@@ -144,12 +300,19 @@ class AIAnalyzer:
             'patterns': patterns,
             'futures': futures_analysis,
             'volume': volume_analysis,
+            'volume_profile': {k: v for k, v in profile.items() if k != 'profiles'} if profile else None,
             
             # Scores individuales
             'bullish_score': bullish_score,
             'bearish_score': bearish_score,
         }
         
+        if self.mtf:
+            result['trend_signal'] = trend
+        
+        # Tiempo de cómputo por símbolo (sin contar red)
+        result['analysis_ms'] = (time.perf_counter() - started) * 1000
+        
         if signal:
             # Calcular TP/SL
             if signal == 'LONG':
@@ -161,15 +324,128 @@ class AIAnalyzer:
         
         return result
     
-    def scan_all_pairs(self, limit: int = None) -> list:
+    def scan_all_pairs(self, limit: int = None, between=None) -> list:
         """
         Escanea todos los pares de Futures buscando señales
         
+        Args:
+            limit: máximo de pares a analizar
+            between: callback sin argumentos llamado entre símbolo y símbolo
+                     (p. ej. para atender disparos sin esperar al final)
+        
         Returns:
             Lista de señales encontradas
         """
         logger.info("🔄 Escaneando todos los pares de Futures...")
         
+        due_pairs = self.get_scan_pairs(limit)
+        
+        # Perfiles de volumen de todo el lote con las velas de 1h en memoria
+        # (los símbolos sin velas todavía lo calculan al analizarse)
+        stored = {s: self.candles.peek(s, '1h') for s in due_pairs}
+        stored = {s: c for s, c in stored.items() if c is not None and len(c['close']) >= PROFILE_CANDLES}
+        if stored:
+            self.volume_analyzer.get_volume_profiles(list(stored), candles=stored)
+            self.update_trends(list(stored))
+        
+        signals = []
+        analysis_ms = []
+        for symbol, inputs in self.ready_pairs(due_pairs):
+            try:
+                analysis = self.analyze_symbol(symbol, inputs)
+                self.record(analysis)
+                if analysis:
+                    analysis_ms.append(analysis['analysis_ms'])
+                if analysis and analysis['signal']:
+                    signals.append(analysis)
+            except Exception as e:
+                logger.error(f"Error analizando {symbol}: {e}")
+                continue
+            finally:
+                if between:
+                    between()
+        
+        # Ordenar por confianza
+        signals.sort(key=lambda x: x['confidence'], reverse=True)
+        
+        if analysis_ms:
+            logger.info(f"⏱️ Cómputo por símbolo: {sum(analysis_ms) / len(analysis_ms):.2f} ms promedio")
+        logger.info(f"🎯 Encontradas {len(signals)} señales")
+        return signals
+    
+    def update_trends(self, symbols: list) -> dict:
+        """
+        Señal multi-timeframe de todo el lote en una pasada (analyze_universe)
+        
+        Returns:
+            symbol -> señal de los símbolos actualizados ({} con MTF apagado)
+        """
+        if not self.mtf:
+            return {}
+        try:
+            with ThreadPoolExecutor(max_workers=Config.BACKFILL_WORKERS, thread_name_prefix="mtf") as pool:
+                self.mtf.prefetch(symbols, pool)
+            signals = self.mtf.analyze_universe(symbols).signals()
+        except Exception as e:
+            logger.warning(f"⚠️ Tendencia multi-timeframe no disponible: {e}")
+            return {}
+        self.trends.update(signals)
+        return signals
+    
+    def ready_pairs(self, symbols: list):
+        """
+        Recorre `symbols` según sus datos están listos: (símbolo, inputs)
+        
+        Los que ya tienen velas en memoria salen primero (inputs None: se
+        descargan al analizarlos, solo el hueco). Los demás (arranque en
+        frío, símbolos nuevos) se descargan en paralelo dentro del
+        presupuesto de peso, en el orden recibido (más líquidos primero), y
+        salen en cuanto terminan: el análisis empieza sin esperar a todos.
+        """
+        missing = [s for s in symbols if not self.candles.has(s, self.CANDLE_WINDOWS[0][0])]
+        if len(missing) < 2:
+            yield from ((s, None) for s in symbols)
+            return
+        
+        logger.info(f"📥 Backfill de velas: {len(missing)} símbolos ({Config.BACKFILL_WORKERS} en paralelo)")
+        started = time.perf_counter()
+        
+        pool = ThreadPoolExecutor(max_workers=Config.BACKFILL_WORKERS, thread_name_prefix="backfill")
+        try:
+            futures = {pool.submit(self._backfill, symbol): symbol for symbol in missing}
+            
+            pending = set(missing)
+            yield from ((s, None) for s in symbols if s not in pending)
+            
+            for future in as_completed(futures):
+                try:
+                    inputs = future.result()
+                except Exception as e:
+                    logger.debug(f"Backfill {futures[future]}: {e}")
+                    inputs = None
+                yield futures[future], inputs
+        finally:
+            # Si el barrido se corta no se espera al resto de descargas
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        logger.info(f"📥 Backfill completado en {time.perf_counter() - started:.1f}s")
+    
+    def _backfill(self, symbol: str) -> dict:
+        """Llena el CandleStore del símbolo y deja listos los datos del análisis"""
+        inputs = self.fetch_inputs(symbol, limiter=self.backfill_limiter)
+        for interval, limit in self.CANDLE_WINDOWS:
+            if not self.candles.has(symbol, interval):
+                self.candles.get(symbol, interval, limit, limiter=self.backfill_limiter)
+        return inputs
+    
+    def get_scan_pairs(self, limit: int = None) -> list:
+        """
+        Pares a analizar en este ciclo: perpetuos USDT con volumen mínimo,
+        filtrados por el planificador de niveles
+        
+        Returns:
+            Lista de símbolos (vacía si falla exchange info)
+        """
         # Obtener pares
         try:
             exchange_info = self.client.futures_exchange_info()
@@ -186,33 +462,35 @@ class AIAnalyzer:
         # Filtrar por volumen mínimo
         try:
             tickers = self.client.futures_ticker()
+            volumes = {t['symbol']: float(t['quoteVolume']) for t in tickers}
             high_volume_pairs = [
-                t['symbol'] for t in tickers 
-                if t['symbol'] in pairs and float(t['quoteVolume']) >= Config.MIN_VOLUME_24H
+                s for s in pairs if volumes.get(s, 0) >= Config.MIN_VOLUME_24H
             ]
+            # Más líquidos primero (orden del backfill y del barrido)
+            high_volume_pairs.sort(key=lambda s: volumes[s], reverse=True)
+            if self.scheduler:
+                self.scheduler.update_market(tickers)
         except:
             high_volume_pairs = pairs
         
         if limit:
             high_volume_pairs = high_volume_pairs[:limit]
+        self.universe = high_volume_pairs
         
-        logger.info(f"📊 Analizando {len(high_volume_pairs)} pares con alto volumen...")
-        
-        signals = []
-        for symbol in high_volume_pairs:
+        # Mantener el stream suscrito al universo actual (los que salen se quitan)
+        if self.stream:
             try:
-                analysis = self.analyze_symbol(symbol)
-                if analysis and analysis['signal']:
-                    signals.append(analysis)
+                self.stream.unsubscribe(self.stream.symbols - set(high_volume_pairs))
+                self.stream.subscribe(high_volume_pairs)
             except Exception as e:
-                logger.error(f"Error analizando {symbol}: {e}")
-                continue
+                logger.warning(f"⚠️ Stream de velas no disponible: {e}")
         
-        # Ordenar por confianza
-        signals.sort(key=lambda x: x['confidence'], reverse=True)
+        # Solo los símbolos cuyo nivel toca en este ciclo
+        due_pairs = self.scheduler.plan(high_volume_pairs) if self.scheduler else high_volume_pairs
         
-        logger.info(f"🎯 Encontradas {len(signals)} señales")
-        return signals
+        logger.info(f"📊 Analizando {len(due_pairs)}/{len(high_volume_pairs)} pares con alto volumen...")
+        
+        return due_pairs
 
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ import ta
 import os
 import logging
 from glob import glob
+from pattern_recognition import PatternRecognizer, candle_patterns
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -55,12 +56,14 @@ class FeatureCalculator:
         - ATR
         - Volume Ratio
         - Price Change %
+        - Pendientes/R² de 20 velas (las de triángulo y canal del escáner)
+        - Patrones de velas (envolventes, martillo, estrella fugaz, doji)
         """
         if df is None or len(df) < 200:
             return None
         
         # Asegurarse de que tenemos las columnas necesarias
-        required = ['close', 'high', 'low', 'volume']
+        required = ['open', 'close', 'high', 'low', 'volume']
         if not all(col in df.columns for col in required):
             return None
         
@@ -122,6 +125,21 @@ class FeatureCalculator:
             (df['candle_type'] != 0).cumsum()
         ).cumsum()
         
+        # ===== PATRONES =====
+        # Misma regresión de 20 velas que triángulo/canal, para cada vela
+        regression = PatternRecognizer.regression_features(
+            {col: df[col].to_numpy(dtype=float) for col in ('high', 'low', 'close')}
+        )
+        df['close_r2'] = regression['close_r2']
+        # Pendientes en % del precio por vela (comparables entre símbolos)
+        for name in ('high_slope', 'low_slope', 'close_slope'):
+            df[f'{name}_pct'] = regression[name] / df['close'] * 100
+        
+        # Mismo detector de velas que el análisis en vivo, sobre todo el historial
+        flags = candle_patterns(*(df[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close')))
+        for name, values in flags.items():
+            df[f'pattern_{name.lower()}'] = values.astype(int)
+        
         # ===== TIME FEATURES =====
         if 'timestamp' in df.columns:
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -112,7 +112,10 @@ class AITrainer:
             'bb_width', 'bb_position',
             'atr', 'volume_ratio',
             'price_change_1', 'price_change_3',
-            'green_streak', 'red_streak'
+            'green_streak', 'red_streak',
+            'high_slope_pct', 'low_slope_pct', 'close_slope_pct', 'close_r2',
+            'pattern_engulfing_bullish', 'pattern_engulfing_bearish',
+            'pattern_hammer', 'pattern_shooting_star', 'pattern_doji'
         ]
         
         # Verificar que existan las columnas
@@ -0,0 +1,242 @@
+"""
+Análisis bajo demanda para el bot
+- Caché de los últimos análisis por símbolo (la alimenta el escáner)
+- Los análisis pedidos por usuarios van a una caché aparte (no entran en el ranking)
+- Peticiones simultáneas del mismo símbolo comparten un único cálculo
+- Límite de análisis por usuario para no quitarle recursos al escáner
+- Ranking "Top Señales" servido desde memoria
+"""
+import asyncio
+import bisect
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """
+    Último análisis de cada símbolo con su hora (thread-safe)
+
+    El ranking "Top Señales" se mantiene ordenado en cada put (lista
+    ordenada por (con señal, confianza, hora)), así top() solo lee los k
+    mejores. Las entradas caducan también en put: van en orden de llegada
+    y se recortan por delante.
+    """
+
+    def __init__(self, ttl: float = None, max_age: float = None):
+        """
+        Args:
+            ttl: antigüedad máxima para get (Config.ANALYSIS_CACHE_TTL)
+            max_age: antigüedad máxima del ranking (Config.TOP_SIGNALS_MAX_AGE)
+        """
+        self.ttl = ttl if ttl is not None else Config.ANALYSIS_CACHE_TTL
+        self.max_age = max_age if max_age is not None else Config.TOP_SIGNALS_MAX_AGE
+        self._retention = max(self.ttl, self.max_age)
+        self._entries = OrderedDict()  # symbol -> (time.time(), analysis), el más viejo primero
+        self._ranked = []              # claves de _rank, de peor a mejor
+        self._lock = threading.Lock()
+
+    def put(self, analysis: dict):
+        if not analysis:
+            return
+        now = time.time()
+        with self._lock:
+            self._store(now, analysis)
+            self._evict(now)
+
+    def get(self, symbol: str) -> tuple:
+        """(análisis, antigüedad en s) si sigue fresco, si no (None, None)"""
+        with self._lock:
+            entry = self._entries.get(symbol)
+        if entry is None:
+            return None, None
+        age = time.time() - entry[0]
+        if age > self.ttl:
+            return None, None
+        return entry[1], age
+
+    def export_state(self) -> list:
+        """[(time.time() del análisis, análisis), ...]"""
+        with self._lock:
+            return list(self._entries.values())
+
+    def load_state(self, entries: list):
+        """Restaura entradas conservando su hora (las caducadas no entran)"""
+        with self._lock:
+            for ts, analysis in sorted(entries, key=lambda entry: entry[0]):
+                current = self._entries.get(analysis['symbol'])
+                if current is None or current[0] < ts:
+                    self._store(ts, analysis)
+            # Mezcladas con las que ya había: el recorte por delante necesita el orden por hora
+            self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1][0]))
+            self._evict(time.time())
+
+    def top(self, k: int = None, max_age: float = None) -> list:
+        """
+        Ranking de los análisis recientes: primero los que tienen señal,
+        luego por confianza
+
+        Args:
+            k: cuántos devolver (Config.TOP_SIGNALS_COUNT por defecto)
+            max_age: antigüedad máxima en s (self.max_age por defecto)
+
+        Returns:
+            Lista de (análisis, antigüedad en s), el mejor primero
+        """
+        k = k or Config.TOP_SIGNALS_COUNT
+        max_age = max_age or self.max_age
+        now = time.time()
+
+        best = []
+        with self._lock:
+            self._evict(now)
+            for _, _, ts, symbol in reversed(self._ranked):
+                if now - ts > max_age:
+                    continue  # solo si max_age < retención (p. ej. ttl mayor)
+                best.append((self._entries[symbol][1], now - ts))
+                if len(best) == k:
+                    break
+        return best
+
+    @staticmethod
+    def _rank(ts: float, analysis: dict) -> tuple:
+        return (analysis['signal'] is not None, analysis['confidence'], ts, analysis['symbol'])
+
+    def _store(self, ts: float, analysis: dict):
+        """Guarda y coloca en el ranking (con el lock tomado)"""
+        symbol = analysis['symbol']
+        previous = self._entries.pop(symbol, None)
+        if previous is not None:
+            self._unrank(previous)
+        self._entries[symbol] = (ts, analysis)
+        bisect.insort(self._ranked, self._rank(ts, analysis))
+
+    def _unrank(self, entry: tuple):
+        key = self._rank(*entry)
+        i = bisect.bisect_left(self._ranked, key)
+        if i < len(self._ranked) and self._ranked[i] == key:
+            del self._ranked[i]
+
+    def _evict(self, now: float):
+        """Saca las entradas más viejas que la retención (amortizado O(1) por entrada)"""
+        while self._entries:
+            symbol, entry = next(iter(self._entries.items()))
+            if now - entry[0] <= self._retention:
+                break
+            del self._entries[symbol]
+            self._unrank(entry)
+
+
+# Compartida por el escáner y el bot (mismo proceso)
+analysis_cache = AnalysisCache()
+
+
+class OnDemandAnalyzer:
+    """Atiende las peticiones de análisis de los usuarios del bot"""
+
+    def __init__(self, analyzer=None, cache: AnalysisCache = None):
+        """
+        Args:
+            analyzer: AIAnalyzer propio; si no se indica se crea uno (sin
+                stream ni planificador) al primer uso. No debe ser el del
+                escáner: su estado no se comparte entre hilos.
+            cache: caché del escáner a consultar primero (analysis_cache por defecto)
+        """
+        self.analyzer = analyzer
+        self.cache = cache or analysis_cache
+        
+        # Resultados calculados aquí: símbolos fuera del universo del escáner
+        # o sin análisis reciente; no se mezclan con el ranking "Top Señales"
+        self.results = AnalysisCache()
+        self.executor = ThreadPoolExecutor(
+            max_workers=Config.ANALYSIS_EXECUTOR_WORKERS,
+            thread_name_prefix="analysis"
+        )
+        self.user_limit = Config.ANALYZE_USER_LIMIT
+        self.user_window = Config.ANALYZE_USER_WINDOW
+
+        self._inflight = {}      # symbol -> asyncio.Future del cálculo en curso
+        self._user_requests = {}  # user_id -> deque[time.monotonic()]
+        self._analyzer_lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+
+    def cached(self, symbol: str) -> tuple:
+        """(análisis, antigüedad en s) del escáner o de una petición anterior"""
+        analysis, age = self.cache.get(symbol)
+        if analysis is None:
+            analysis, age = self.results.get(symbol)
+        return analysis, age
+
+    async def analyze(self, symbol: str, user_id: int) -> dict:
+        """
+        Análisis de `symbol` para `user_id`
+
+        Returns:
+            dict con status ('ok', 'rate_limited' o 'error'), analysis,
+            age (segundos desde el cálculo) y retry_in (si rate_limited)
+        """
+        analysis, age = self.cached(symbol)
+        if analysis:
+            return {'status': 'ok', 'analysis': analysis, 'age': age}
+
+        task = self._inflight.get(symbol)
+        if task is None:
+            # Solo cuentan para el límite los cálculos nuevos
+            retry_in = self._charge(user_id)
+            if retry_in:
+                return {'status': 'rate_limited', 'retry_in': retry_in}
+
+            loop = asyncio.get_running_loop()
+            task = loop.run_in_executor(self.executor, self._compute, symbol)
+            self._inflight[symbol] = task
+            task.add_done_callback(lambda _: self._inflight.pop(symbol, None))
+
+        try:
+            # shield: si un usuario cancela, el cálculo sigue para los demás
+            analysis = await asyncio.shield(task)
+        except Exception as e:
+            logger.error(f"❌ Error analizando {symbol} bajo demanda: {e}")
+            analysis = None
+
+        if not analysis:
+            return {'status': 'error'}
+        return {'status': 'ok', 'analysis': analysis, 'age': 0.0}
+
+    def _charge(self, user_id: int) -> float:
+        """Registra un cálculo; devuelve segundos a esperar si supera el límite"""
+        now = time.monotonic()
+        requests = self._user_requests.setdefault(user_id, deque())
+        while requests and now - requests[0] > self.user_window:
+            requests.popleft()
+
+        if len(requests) >= self.user_limit:
+            return self.user_window - (now - requests[0])
+
+        requests.append(now)
+        return 0.0
+
+    def _compute(self, symbol: str) -> dict:
+        with self._analyzer_lock:
+            if self.analyzer is None:
+                from ai_analyzer import AIAnalyzer
+                self.analyzer = AIAnalyzer(stream=False, tiers=False)
+
+        started = time.perf_counter()
+        # Descargas en paralelo; el cómputo (patrones, perfiles) de uno en uno
+        inputs = self.analyzer.fetch_inputs(symbol)
+        if inputs is None:
+            return None
+        with self._compute_lock:
+            analysis = self.analyzer.analyze_symbol(symbol, inputs)
+        self.results.put(analysis)
+        logger.info(f"🔍 {symbol} analizado bajo demanda en {(time.perf_counter() - started) * 1000:.0f} ms")
+        return analysis
+
+
+# Instancia del bot (con su propio analizador, creado al primer uso)
+on_demand = OnDemandAnalyzer()
@@ -1,14 +1,46 @@
 """
 Analizador Multi-Timeframe para detección de tendencias
+Una sola serie base (15m); 1h y 4h se construyen localmente con resample
 """
+import numpy as np
 from config import Config
+from candles import CandleStore, INTERVAL_MS, resample
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Velas que se analizan por timeframe
+CANDLES_SHOWN = 6
+
+# Velas de un color (de las mostradas) para marcar tendencia
+TREND_MIN_CANDLES = 4
+
+
 class MultiTimeframeAnalyzer:
-    def __init__(self, binance_client):
+    def __init__(self, binance_client=None, candles: CandleStore = None):
+        """
+        Args:
+            binance_client: BinanceClient (solo hace falta sin `candles`)
+            candles: CandleStore a compartir (p. ej. el de AIAnalyzer);
+                si no se indica se crea uno propio
+        """
         self.client = binance_client
+        self.candles = candles if candles is not None else CandleStore(binance_client.client)
+        
+        # Velas base para cubrir CANDLES_SHOWN velas del timeframe mayor
+        # (la vela en curso puede traer de 1 a `ratio` velas base)
+        self.base_interval = Config.TIMEFRAME_SHORT
+        self.base_limit = CANDLES_SHOWN * max(
+            self._ratio(tf) or 1 for tf in (Config.TIMEFRAME_LONG, Config.TIMEFRAME_MEDIUM)
+        )
+    
+    def _ratio(self, interval):
+        """Velas base por vela de `interval` (None si no se puede derivar)"""
+        base = INTERVAL_MS.get(self.base_interval)
+        step = INTERVAL_MS.get(interval)
+        if not base or not step or step % base:
+            return None
+        return step // base
     
     def analyze_symbol(self, symbol):
         """
@@ -23,131 +55,220 @@ class MultiTimeframeAnalyzer:
                 - analysis_15m: análisis del 15m
                 - confirmed: bool si hay confirmación
         """
-        try:
-            # Obtener precio actual
-            current_price = self.client.get_current_price(symbol)
-            if not current_price:
-                return None
-            
-            # Analizar cada timeframe
-            analysis_4h = self._analyze_timeframe(symbol, Config.TIMEFRAME_LONG)
-            analysis_1h = self._analyze_timeframe(symbol, Config.TIMEFRAME_MEDIUM)
-            analysis_15m = self._analyze_timeframe(symbol, Config.TIMEFRAME_SHORT)
-            
-            # Determinar señal
-            signal, confirmed = self._determine_signal(
-                analysis_4h, analysis_1h, analysis_15m
-            )
-            
-            return {
-                'symbol': symbol,
-                'price': current_price,
-                'signal': signal,
-                'confirmed': confirmed,
-                'analysis_4h': analysis_4h,
-                'analysis_1h': analysis_1h,
-                'analysis_15m': analysis_15m
-            }
-            
-        except Exception as e:
-            logger.error(f"❌ Error analizando {symbol}: {e}")
-            return None
+        return self.analyze_universe([symbol]).analysis(symbol)
+    
+    def prefetch(self, symbols, pool):
+        """Pone al día las velas base de `symbols` en paralelo (analyze_universe ya no espera a la red)"""
+        list(pool.map(lambda symbol: self.candles.get(symbol, self.base_interval, self.base_limit), symbols))
     
-    def _analyze_timeframe(self, symbol, interval):
+    def analyze_universe(self, symbols):
         """
-        Analiza un timeframe específico
+        Analiza varios símbolos a la vez: las velas de cada timeframe se
+        apilan en matrices (símbolos x velas) y tendencia, color, rachas y
+        señales salen de unas pocas operaciones de numpy
         
         Returns:
-            dict con:
-                - trend: 'BULLISH', 'BEARISH', 'NEUTRAL'
-                - candles: lista de últimas 6 velas ['green', 'red', ...]
-                - consecutive_count: cuántas velas consecutivas del mismo color
+            TrendSnapshot con los arrays del lote (los símbolos sin datos
+            no aparecen); el dict de un símbolo se arma al pedirlo
         """
-        # Obtener últimas 10 velas (mostramos 6)
-        klines = self.client.get_klines(symbol, interval, limit=10)
-        
-        if not klines or len(klines) < 6:
-            return {
-                'trend': 'NEUTRAL',
-                'candles': [],
-                'consecutive_count': 0
-            }
+        timeframes = (Config.TIMEFRAME_LONG, Config.TIMEFRAME_MEDIUM, Config.TIMEFRAME_SHORT)
         
-        # Analizar las últimas 6 velas
-        candles = []
-        for k in klines[-6:]:
-            if k['close'] > k['open']:
-                candles.append('green')
-            elif k['close'] < k['open']:
-                candles.append('red')
-            else:
-                candles.append('neutral')
+        ready = []
+        prices = []
+        rows = {tf: ([], []) for tf in timeframes}
+        for symbol in symbols:
+            try:
+                # Una petición (o ninguna si el CandleStore está al día)
+                base = self.candles.get(symbol, self.base_interval, self.base_limit)
+                if base is None:
+                    continue
+                
+                for tf in timeframes:
+                    opens, closes = rows[tf]
+                    klines = self._timeframe(symbol, base, tf)
+                    if klines is None or len(klines['close']) < CANDLES_SHOWN:
+                        opens.append(_MISSING)
+                        closes.append(_MISSING)
+                    else:
+                        opens.append(klines['open'][-CANDLES_SHOWN:])
+                        closes.append(klines['close'][-CANDLES_SHOWN:])
+                
+                ready.append(symbol)
+                # Precio actual = cierre de la vela en curso
+                prices.append(float(base['close'][-1]))
+                
+            except Exception as e:
+                logger.error(f"❌ Error analizando {symbol}: {e}")
+                for opens, closes in rows.values():
+                    del opens[len(ready):], closes[len(ready):]
         
-        # Contar velas consecutivas del mismo color (desde la más reciente)
-        consecutive_count = self._count_consecutive_candles(candles)
+        if not ready:
+            return TrendSnapshot([], [], [], np.zeros(0, dtype=bool), np.zeros(0, dtype=bool))
         
-        # Determinar tendencia general
-        green_count = candles.count('green')
-        red_count = candles.count('red')
-        
-        if green_count >= 4:
-            trend = 'BULLISH'
-        elif red_count >= 4:
-            trend = 'BEARISH'
-        else:
-            trend = 'NEUTRAL'
-        
-        return {
-            'trend': trend,
-            'candles': candles,
-            'consecutive_count': consecutive_count,
-            'color': candles[-1] if candles else 'neutral'
-        }
+        trends = [classify_trends(np.array(rows[tf][0]), np.array(rows[tf][1])) for tf in timeframes]
+        longs, shorts = determine_signals(*trends)
+        return TrendSnapshot(ready, prices, trends, longs, shorts)
     
-    def _count_consecutive_candles(self, candles):
-        """Cuenta velas consecutivas del mismo color desde la última"""
-        if not candles:
-            return 0
-        
-        last_color = candles[-1]
-        count = 0
-        
-        # Contar desde el final hacia atrás
-        for candle in reversed(candles):
-            if candle == last_color and candle != 'neutral':
-                count += 1
-            else:
-                break
-        
-        return count
+    def _timeframe(self, symbol, base, interval):
+        """Velas de `interval` derivadas de la serie base (o descargadas si no se puede)"""
+        if interval == self.base_interval:
+            return base
+        if self._ratio(interval):
+            return resample(base, interval)
+        return self.candles.get(symbol, interval, CANDLES_SHOWN)
+
+
+class TrendSnapshot:
+    """
+    Resultado de analyze_universe tal como sale de numpy: tendencia, color,
+    racha y señal por símbolo en arrays. Lo que se consulta en cada
+    análisis (la señal) se lee por índice; el dict completo de un símbolo
+    (colores, rachas por timeframe) solo se arma si se pide.
+    """
     
-    def _determine_signal(self, analysis_4h, analysis_1h, analysis_15m):
+    def __init__(self, symbols, prices, trends, longs, shorts):
         """
-        Determina si hay señal válida
-        
-        Reglas:
-        - LONG: 4H alcista, 1H alcista, 15m tiene 3+ velas verdes consecutivas
-        - SHORT: 4H bajista, 1H bajista, 15m tiene 3+ velas rojas consecutivas
+        Args:
+            symbols: símbolos del lote (fila i de cada array)
+            prices: cierre de la vela en curso por símbolo
+            trends: classify_trends de 4H, 1H y 15m
+            longs, shorts: máscaras de determine_signals
         """
-        # Verificar que tengamos datos válidos
-        if not all([analysis_4h, analysis_1h, analysis_15m]):
-            return None, False
-        
-        # Confirmación en 15m
-        confirmed_15m = analysis_15m['consecutive_count'] >= Config.MIN_CANDLES_CONFIRMATION
-        
-        # SEÑAL LONG
-        if (analysis_4h['trend'] == 'BULLISH' and
-            analysis_1h['trend'] == 'BULLISH' and
-            analysis_15m['color'] == 'green' and
-            confirmed_15m):
-            return 'LONG', True
-        
-        # SEÑAL SHORT
-        if (analysis_4h['trend'] == 'BEARISH' and
-            analysis_1h['trend'] == 'BEARISH' and
-            analysis_15m['color'] == 'red' and
-            confirmed_15m):
-            return 'SHORT', True
-        
-        return None, False
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.prices = prices
+        self.trends = trends
+        # -1 SHORT, 0 sin señal, 1 LONG
+        self.codes = longs.astype(np.int8) - shorts.astype(np.int8)
+    
+    def __contains__(self, symbol):
+        return symbol in self.index
+    
+    def __len__(self):
+        return len(self.symbols)
+    
+    def signal(self, symbol) -> str:
+        """'LONG', 'SHORT' o None (también si el símbolo no está)"""
+        i = self.index.get(symbol)
+        return None if i is None else SIGNAL_NAMES[self.codes[i] + 1]
+    
+    def signals(self) -> dict:
+        """symbol -> señal de todo el lote"""
+        return dict(zip(self.symbols, SIGNAL_NAMES[self.codes + 1].tolist()))
+    
+    def analysis(self, symbol) -> dict:
+        """Resultado completo de un símbolo (formato de analyze_symbol) o None"""
+        i = self.index.get(symbol)
+        if i is None:
+            return None
+        signal = self.signal(symbol)
+        analysis_4h, analysis_1h, analysis_15m = (_row_analysis(t, i) for t in self.trends)
+        return {
+            'symbol': symbol,
+            'price': self.prices[i],
+            'signal': signal,
+            'confirmed': signal is not None,
+            'analysis_4h': analysis_4h,
+            'analysis_1h': analysis_1h,
+            'analysis_15m': analysis_15m
+        }
+
+
+# Fila de un símbolo sin velas suficientes en un timeframe
+_MISSING = np.full(CANDLES_SHOWN, np.nan)
+
+# Códigos -1 / 0 / 1 -> nombres (índice código + 1)
+TREND_NAMES = np.array(['BEARISH', 'NEUTRAL', 'BULLISH'])
+COLOR_NAMES = np.array(['red', 'neutral', 'green'])
+SIGNAL_NAMES = np.array(['SHORT', None, 'LONG'], dtype=object)
+
+
+def classify_trends(opens, closes):
+    """
+    Tendencia, color de la última vela y racha final de cada fila
+    
+    Tendencia alcista/bajista con TREND_MIN_CANDLES velas verdes/rojas de
+    las mostradas; la racha cuenta velas del mismo color (no neutras)
+    desde la última hacia atrás.
+    
+    Args:
+        opens, closes: matrices (símbolos x velas); filas con NaN = sin datos
+    
+    Returns:
+        dict de arrays por símbolo: signs (matriz -1/0/1), trend y color
+        (-1/0/1), consecutive (int) y valid (bool)
+    """
+    valid = np.isfinite(opens).all(axis=1) & np.isfinite(closes).all(axis=1)
+    signs = np.sign(np.where(valid[:, None], closes - opens, 0)).astype(np.int8)
+    
+    green = (signs > 0).sum(axis=1)
+    red = (signs < 0).sum(axis=1)
+    trend = np.where(green >= TREND_MIN_CANDLES, 1, np.where(red >= TREND_MIN_CANDLES, -1, 0))
+    
+    color = signs[:, -1]
+    same = (signs == color[:, None]) & (signs != 0)
+    # Racha = Trues al final de `same` (primer False desde la derecha)
+    consecutive = np.where(same.all(axis=1), same.shape[1], np.argmin(same[:, ::-1], axis=1))
+    
+    return {
+        'signs': signs,
+        'trend': trend,
+        'color': color,
+        'consecutive': consecutive,
+        'valid': valid,
+    }
+
+
+def determine_signals(trends_4h, trends_1h, trends_15m):
+    """
+    Señales de todo el universo como máscaras booleanas
+    
+    Reglas:
+    - LONG: 4H alcista, 1H alcista, 15m tiene 3+ velas verdes consecutivas
+    - SHORT: 4H bajista, 1H bajista, 15m tiene 3+ velas rojas consecutivas
+    
+    Returns:
+        (longs, shorts) arrays booleanos por símbolo
+    """
+    # Confirmación en 15m
+    confirmed_15m = trends_15m['consecutive'] >= Config.MIN_CANDLES_CONFIRMATION
+    
+    longs = ((trends_4h['trend'] == 1) & (trends_1h['trend'] == 1)
+             & (trends_15m['color'] == 1) & confirmed_15m)
+    shorts = ((trends_4h['trend'] == -1) & (trends_1h['trend'] == -1)
+              & (trends_15m['color'] == -1) & confirmed_15m)
+    return longs, shorts
+
+
+def _row_analysis(trends, i):
+    """Análisis de un timeframe para un símbolo (formato de analyze_symbol)"""
+    if not trends['valid'][i]:
+        return {
+            'trend': 'NEUTRAL',
+            'candles': [],
+            'consecutive_count': 0
+        }
+    return {
+        'trend': str(TREND_NAMES[trends['trend'][i] + 1]),
+        'candles': COLOR_NAMES[trends['signs'][i] + 1].tolist(),
+        'consecutive_count': int(trends['consecutive'][i]),
+        'color': str(COLOR_NAMES[trends['color'][i] + 1])
+    }
+
+if __name__ == "__main__":
+    # Comprueba que las velas derivadas coinciden con las del exchange
+    import sys
+    from binance_client import BinanceClient
+    from candles import klines_to_arrays
+    
+    symbol = sys.argv[1] if len(sys.argv) > 1 else 'BTCUSDT'
+    client = BinanceClient().client
+    
+    base = klines_to_arrays(client.futures_klines(symbol=symbol, interval='15m', limit=499))
+    for interval in ('1h', '4h'):
+        derived = resample(base, interval)
+        n = len(derived['timestamp'])
+        exchange = klines_to_arrays(client.futures_klines(symbol=symbol, interval=interval, limit=n))
+        same = all(np.array_equal(derived[col][:-1], exchange[col][:-1]) for col in derived)
+        print(f"{symbol} {interval}: {n} velas, {'✅ idénticas' if same else '❌ distintas'}"
+              f" (la vela en curso puede diferir por el tiempo entre peticiones)")
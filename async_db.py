@@ -0,0 +1,43 @@
+"""
+Acceso a datos para los handlers asíncronos del bot
+Las funciones de keys_manager (SQLite, bloqueantes) corren en un pool de
+hilos propio para no frenar el event loop de python-telegram-bot
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import keys_manager
+from config import Config
+
+# Pool para SQLite (cada hilo reutiliza su conexión, ver keys_manager)
+db_executor = ThreadPoolExecutor(
+    max_workers=Config.DB_EXECUTOR_WORKERS,
+    thread_name_prefix="db"
+)
+
+
+async def run_blocking(fn, *args, executor=None, **kwargs):
+    """Ejecuta `fn` en un hilo del pool (db_executor por defecto)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or db_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def is_user_authorized(user_id: int) -> dict:
+    # Con el índice de suscriptores cargado es una lectura en memoria
+    if keys_manager.subscribers.loaded:
+        return keys_manager.is_user_authorized(user_id)
+    return await run_blocking(keys_manager.is_user_authorized, user_id)
+
+
+async def get_authorized_chat_ids() -> tuple:
+    if keys_manager.subscribers.loaded:
+        return keys_manager.get_authorized_chat_ids()
+    return await run_blocking(keys_manager.get_authorized_chat_ids)
+
+
+async def validate_key(key: str) -> dict:
+    return await run_blocking(keys_manager.validate_key, key)
+
+
+async def activate_key(key: str, user_id: int, chat_id: int, username: str = None) -> dict:
+    return await run_blocking(keys_manager.activate_key, key, user_id, chat_id, username)
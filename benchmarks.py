@@ -0,0 +1,921 @@
+"""
+Benchmarks y comprobaciones de equivalencia de las optimizaciones
+Todo corre offline (velas sintéticas, velas reales grabadas en fixtures/ y
+un cliente de Binance simulado), así que los números se pueden reproducir
+sin claves ni red. Cada prueba compara
+la versión actual con la implementación anterior (copiada aquí en forma
+compacta como referencia) o con la librería que sustituye.
+
+Uso:
+    python benchmarks.py              # todas
+    python benchmarks.py swing rules  # solo algunas
+    python benchmarks.py --list
+    python benchmarks.py --record BTCUSDT ETHUSDT  # graba fixtures/ (con red)
+"""
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+# Sin stream ni claves: nada de esto debe tocar la red
+os.environ.setdefault('STREAM_ENABLED', 'false')
+
+import numpy as np
+
+import binance_client
+from candles import INTERVAL_MS, klines_to_arrays
+
+# Historial sintético por serie del cliente simulado
+SERIES_LENGTH = 1000
+
+
+# ==================== DATOS SINTÉTICOS ====================
+
+def synthetic_klines(n: int, interval: str = '1h', seed: int = 0, decimals: int = 2) -> list:
+    """
+    Velas crudas con el formato de futures_klines (strings), la última es
+    la vela en curso. Precios redondeados (empates como en el exchange),
+    algún doji y volúmenes con 3 decimales.
+    """
+    step = INTERVAL_MS[interval]
+    current = int(time.time() * 1000) // step * step
+    rng = np.random.default_rng(seed)
+
+    closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.004, n))), decimals)
+    opens = np.round(np.r_[closes[0], closes[:-1]] * (1 + rng.normal(0, 0.0005, n)), decimals)
+    opens = np.where(rng.random(n) < 0.1, closes, opens)
+    highs = np.round(np.maximum(opens, closes) * (1 + rng.exponential(0.002, n)), decimals)
+    lows = np.round(np.minimum(opens, closes) * (1 - rng.exponential(0.002, n)), decimals)
+    volumes = rng.exponential(1000, n).round(3)
+
+    klines = []
+    for i in range(n):
+        ts = current - (n - 1 - i) * step
+        klines.append([ts, f"{opens[i]:.{decimals}f}", f"{highs[i]:.{decimals}f}",
+                       f"{lows[i]:.{decimals}f}", f"{closes[i]:.{decimals}f}", f"{volumes[i]:.3f}",
+                       ts + step - 1, "0", 1, "0", "0", "0"])
+    return klines
+
+
+def synthetic_ohlc(shape, seed: int = 0, decimals: int = 2) -> tuple:
+    """(opens, highs, lows, closes) sintéticos de forma `shape` (velas o símbolos x velas)"""
+    rng = np.random.default_rng(seed)
+    closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.004, shape), axis=-1)), decimals)
+    opens = np.round(np.roll(closes, 1, axis=-1) * (1 + rng.normal(0, 0.0005, shape)), decimals)
+    opens = np.where(rng.random(shape) < 0.2, closes, opens)  # dojis
+    highs = np.round(np.maximum(opens, closes) * (1 + rng.exponential(0.002, shape) * (rng.random(shape) < 0.8)),
+                     decimals)
+    lows = np.round(np.minimum(opens, closes) * (1 - rng.exponential(0.002, shape) * (rng.random(shape) < 0.8)),
+                    decimals)
+    return opens, highs, lows, closes
+
+
+class OfflineClient:
+    """
+    Cliente de Binance simulado: series sintéticas deterministas por
+    (símbolo, intervalo) y contador de peticiones por tipo
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self._series = {}
+
+    def ping(self):
+        return {}
+
+    def futures_klines(self, symbol, interval, limit=500, **kwargs):
+        self.calls[f"klines {interval}"] += 1
+        key = (symbol, interval)
+        step = INTERVAL_MS[interval]
+        klines = self._series.get(key)
+        if klines is None or klines[-1][0] != int(time.time() * 1000) // step * step:
+            klines = synthetic_klines(SERIES_LENGTH, interval, zlib.crc32(f"{symbol}{interval}".encode()))
+            self._series[key] = klines
+        return klines[-limit:]
+
+    def futures_symbol_ticker(self, symbol):
+        self.calls['ticker'] += 1
+        return {'symbol': symbol, 'price': self.futures_klines(symbol, '1h', 1)[-1][4]}
+
+    def futures_funding_rate(self, symbol, limit=1):
+        self.calls['funding'] += 1
+        return [{'fundingRate': '0.0006'}]
+
+    def futures_open_interest(self, symbol):
+        self.calls['open_interest'] += 1
+        return {'openInterest': '1000'}
+
+    def futures_open_interest_hist(self, symbol, period, limit):
+        self.calls['open_interest_hist'] += 1
+        return [{'sumOpenInterest': '900'}]
+
+    def futures_top_longshort_account_ratio(self, symbol, period, limit):
+        self.calls['long_short'] += 1
+        return [{'longShortRatio': '1.2', 'longAccount': '0.545', 'shortAccount': '0.455'}]
+
+
+def _offline_client() -> OfflineClient:
+    """Instala un OfflineClient como cliente compartido del proceso"""
+    client = OfflineClient()
+    binance_client._shared_client = client
+    return client
+
+
+def _per_call(fn, repeat: int) -> float:
+    """Segundos por llamada de fn() (mejor de 3 tandas)"""
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best
+
+
+def _result(ok: bool) -> str:
+    return '✅' if ok else '❌'
+
+
+# ==================== 026 / 027: ANÁLISIS SOBRE ARRAYS ====================
+
+def bench_analysis():
+    """Análisis por símbolo sobre arrays y perfiles de volumen en lote"""
+    import pandas as pd
+    from ai_analyzer import AIAnalyzer
+    from volume_analyzer import compute_volume_profiles
+
+    _offline_client()
+    analyzer = AIAnalyzer(stream=False, tiers=False)
+    symbols = [f"SYN{i}USDT" for i in range(100)]
+
+    # Conversión de la respuesta cruda: DataFrame (antes) vs arrays (ahora)
+    klines = synthetic_klines(100, '1h', seed=1)
+    columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+               'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore']
+
+    def to_df():
+        df = pd.DataFrame(klines, columns=columns)
+        for col in ['open', 'high', 'low', 'close', 'volume']:
+            df[col] = df[col].astype(float)
+        return df
+
+    df_time = _per_call(to_df, 200)
+    arrays_time = _per_call(lambda: klines_to_arrays(klines), 200)
+    print(f"Velas -> DataFrame: {df_time * 1e3:.3f} ms | -> arrays: {arrays_time * 1e3:.3f} ms")
+
+    # Cómputo por símbolo (patrones + volumen + scoring) con los datos ya descargados
+    inputs = {symbol: analyzer.fetch_inputs(symbol) for symbol in symbols}
+    started = time.perf_counter()
+    for symbol in symbols:
+        data = inputs[symbol]
+        analyzer.analyze_arrays(symbol, data['price'], data['candles_1h'], data['candles_15m'],
+                                data['futures'], spike_15m=data['spike_15m'])
+    compute = (time.perf_counter() - started) / len(symbols)
+    print(f"analyze_arrays: {compute * 1e3:.2f} ms/símbolo ({len(symbols)} símbolos)")
+
+    # Perfil de volumen: lote vectorizado vs bucle por vela y nivel
+    rng = np.random.default_rng(0)
+    n_symbols, n_candles, n_bins = 250, 200, 20
+    closes = 100 + np.cumsum(rng.normal(0, 1, (n_symbols, n_candles)), axis=1)
+    highs = closes + rng.random((n_symbols, n_candles))
+    lows = closes - rng.random((n_symbols, n_candles))
+    volumes = rng.random((n_symbols, n_candles)) * 1000
+
+    def loop_profile(s):
+        price_min, price_max = lows[s].min(), highs[s].max()
+        width = (price_max - price_min) / n_bins
+        profile = np.zeros(n_bins)
+        for i in range(n_candles):
+            lo = min(int((lows[s, i] - price_min) // width), n_bins - 1)
+            hi = min(int((highs[s, i] - price_min) // width), n_bins - 1)
+            profile[lo:hi + 1] += volumes[s, i] / (hi - lo + 1)
+        return profile
+
+    batch = compute_volume_profiles(highs, lows, volumes, n_bins)
+    same = all(np.allclose(loop_profile(s), batch['volume'][s]) for s in range(n_symbols))
+    loop_time = _per_call(lambda: [loop_profile(s) for s in range(n_symbols)], 1)
+    batch_time = _per_call(lambda: compute_volume_profiles(highs, lows, volumes, n_bins), 20)
+    print(f"Perfil de volumen {n_symbols} símbolos x {n_candles} velas: bucle {loop_time * 1e3:.1f} ms | "
+          f"lote {batch_time * 1e3:.2f} ms | {_result(same)} mismos volúmenes por nivel")
+
+
+# ==================== 036 / 037: KEYS ====================
+
+def bench_keys():
+    """Autorización: consulta con conexión nueva por llamada vs conexión por hilo vs índice en memoria"""
+    import tempfile
+    from unittest import mock
+    import keys_manager
+
+    n_users = 100_000
+    previous_conn = getattr(keys_manager._local, 'conn', None)
+    index = keys_manager.SubscriberIndex()
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(keys_manager, 'DB_PATH', Path(tmp) / 'access_keys.db'), \
+            mock.patch.object(keys_manager, '_db_ready', False), \
+            mock.patch.object(keys_manager, 'subscribers', index):
+        keys_manager._local.conn = None
+        try:
+            _bench_keys(keys_manager, n_users)
+        finally:
+            # Nada del proceso debe quedar apuntando a la base de datos temporal
+            index.stop()
+            if keys_manager._local.conn is not None:
+                keys_manager._local.conn.close()
+            keys_manager._local.conn = previous_conn
+
+
+def _bench_keys(keys_manager, n_users: int):
+    import sqlite3
+    from datetime import datetime, timedelta
+
+    conn = keys_manager.get_db_connection()
+    now = datetime.now()
+    conn.executemany(
+        'INSERT INTO authorized_users (user_id, chat_id, expires_at) VALUES (?, ?, ?)',
+        [(i, i, now + timedelta(hours=(i % 48) - 8)) for i in range(n_users)]
+    )
+    conn.commit()
+
+    started = time.perf_counter()
+    keys_manager.subscribers.preload()
+    print(f"Usuarios: {n_users} | carga del índice {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+    def per_call_connection(user_id):
+        # Como antes: conexión nueva, consulta y cierre en cada llamada
+        fresh = sqlite3.connect(keys_manager.DB_PATH)
+        row = fresh.execute('SELECT expires_at FROM authorized_users WHERE user_id = ? AND expires_at > ?',
+                            (user_id, datetime.now())).fetchone()
+        fresh.close()
+        return row
+
+    def thread_connection(user_id):
+        return keys_manager.get_db_connection().execute(
+            'SELECT expires_at FROM authorized_users WHERE user_id = ? AND expires_at > ?',
+            (user_id, datetime.now())).fetchone()
+
+    users = iter(range(10 ** 9))
+    same = all((per_call_connection(u) is not None) == (keys_manager.is_user_authorized(u) is not None)
+               for u in range(0, n_users, 7))
+
+    print(f"  {_result(same)} mismo resultado de autorización")
+    for label, fn in (('conexión por llamada (antes)', per_call_connection),
+                      ('conexión por hilo (036)', thread_connection),
+                      ('índice en memoria (037)', keys_manager.is_user_authorized)):
+        spent = _per_call(lambda: fn(next(users) % n_users), 2000)
+        print(f"  is_user_authorized, {label}: {spent * 1e6:.1f} µs")
+
+    def chat_ids_query():
+        fresh = sqlite3.connect(keys_manager.DB_PATH)
+        rows = fresh.execute('SELECT chat_id FROM authorized_users WHERE expires_at > ?',
+                             (datetime.now(),)).fetchall()
+        fresh.close()
+        return [row[0] for row in rows]
+
+    same = sorted(chat_ids_query()) == sorted(keys_manager.get_authorized_chat_ids())
+    query = _per_call(chat_ids_query, 50)
+    index = _per_call(keys_manager.get_authorized_chat_ids, 2000)
+    print(f"  get_authorized_chat_ids: consulta {query * 1e3:.2f} ms | índice {index * 1e6:.1f} µs | "
+          f"{_result(same)} mismos chats")
+    cleanup = _per_call(keys_manager.cleanup_expired, 20)
+    print(f"  cleanup_expired: {cleanup * 1e3:.2f} ms")
+
+
+# ==================== 038: EVENT LOOP ====================
+
+def bench_loop(latency: float = 0.02, requests: int = 20):
+    """Retraso del event loop con llamadas bloqueantes dentro del handler vs en el pool (async_db)"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from async_db import run_blocking
+
+    def blocking_call():
+        time.sleep(latency)  # disco lento / lock de SQLite
+
+    async def measure(offload: bool, executor) -> tuple:
+        lags = []
+        done = asyncio.Event()
+
+        async def heartbeat():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - started - 0.001)
+
+        async def handler():
+            if offload:
+                await run_blocking(blocking_call, executor=executor)
+            else:
+                blocking_call()
+
+        beat = asyncio.create_task(heartbeat())
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await asyncio.gather(*(handler() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await beat
+        return max(lags), elapsed
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for label, offload in (('en el event loop (antes)', False), ('run_blocking (038)', True)):
+            lag, elapsed = asyncio.run(measure(offload, executor))
+            print(f"{requests} handlers x {latency * 1e3:.0f} ms, {label}: retraso máximo del loop "
+                  f"{lag * 1e3:.1f} ms | total {elapsed * 1e3:.0f} ms")
+
+
+# ==================== 040: TOP SEÑALES ====================
+
+def bench_top(n_symbols: int = 600):
+    """Ranking "Top Señales": nlargest sobre toda la caché por petición (antes) vs ranking mantenido en put"""
+    import heapq
+    from analysis_service import AnalysisCache
+    from config import Config
+
+    rng = np.random.default_rng(0)
+    cache = AnalysisCache()
+    for i in range(n_symbols):
+        cache.put({'symbol': f"SYN{i}USDT", 'signal': 'LONG' if rng.random() < 0.2 else None,
+                   'confidence': int(rng.integers(0, 20)) * 5})
+    entries = cache.export_state()
+
+    def nlargest_top():
+        now = time.time()
+        fresh = [(ts, a) for ts, a in entries if now - ts <= Config.TOP_SIGNALS_MAX_AGE]
+        best = heapq.nlargest(Config.TOP_SIGNALS_COUNT, fresh,
+                              key=lambda e: (e[1]['signal'] is not None, e[1]['confidence'], e[0]))
+        return [(a, now - ts) for ts, a in best]
+
+    same = [a['symbol'] for a, _ in nlargest_top()] == [a['symbol'] for a, _ in cache.top()]
+    old = _per_call(nlargest_top, 2000)
+    new = _per_call(cache.top, 2000)
+    put = _per_call(lambda: cache.put({'symbol': 'SYN1USDT', 'signal': None, 'confidence': 50}), 2000)
+    print(f"top() con {n_symbols} símbolos: nlargest {old * 1e6:.0f} µs | ranking {new * 1e6:.1f} µs "
+          f"(put {put * 1e6:.1f} µs) | {_result(same)} mismo orden")
+
+
+# ==================== 042: IMPORTS ====================
+
+def bench_imports(repeat: int = 5):
+    """Total de python -X importtime (acumulado del módulo, mejor de `repeat`) y módulos pesados cargados"""
+    import subprocess
+
+    heavy = ('pandas', 'scipy', 'sklearn', 'joblib', 'ta', 'telegram', 'aiohttp', 'binance', 'dateparser')
+    for module in ('scanner', 'bot_telegram', 'main'):
+        code = f"import sys, {module}; print(','.join(m for m in {heavy!r} if m in sys.modules))"
+        best, loaded = None, ''
+        for _ in range(repeat):
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True,
+                                    text=True, cwd=Path(__file__).parent,
+                                    env={**os.environ, 'STREAM_ENABLED': 'false'})
+            if result.returncode != 0:
+                break
+            # "import time: self [us] | cumulative | módulo", la línea del propio módulo va al final
+            total = next(int(line.split('|')[1]) for line in reversed(result.stderr.splitlines())
+                         if line.split('|')[-1].strip() == module)
+            best = total if best is None else min(best, total)
+            loaded = result.stdout.strip()
+        if best is None:
+            print(f"import {module}: ❌ {result.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"import {module}: {best / 1e3:.0f} ms | pesados cargados: {loaded or 'ninguno'}")
+    print("(detalle por módulo: python -X importtime -c 'import scanner')")
+
+
+# ==================== 045: RESAMPLE ====================
+
+def bench_resample():
+    """1h/4h construidas desde 15m vs agregación de referencia, y peticiones por ciclo de MTF"""
+    from decimal import Decimal
+    from candles import resample
+    from analyzer import MultiTimeframeAnalyzer
+    from candles import CandleStore
+
+    # Equivalencia: agregación de referencia sobre las velas crudas (volumen en decimal)
+    checks = mismatches = 0
+    for seed in range(50):
+        raw = synthetic_klines(499, '15m', seed=seed, decimals=int(seed % 5))
+        base = klines_to_arrays(raw)
+        for interval in ('1h', '4h'):
+            step = INTERVAL_MS[interval]
+            groups = {}
+            for k in raw:
+                groups.setdefault(k[0] // step * step, []).append(k)
+            reference = [
+                (ts, float(g[0][1]), max(float(k[2]) for k in g), min(float(k[3]) for k in g), float(g[-1][4]),
+                 float(sum(Decimal(k[5]) for k in g)))
+                for ts, g in groups.items()
+                if g[0][0] == ts  # cubo completo por el inicio, como resample
+            ]
+            derived = resample(base, interval)
+            got = list(zip(*(derived[col].tolist() for col in
+                             ('timestamp', 'open', 'high', 'low', 'close', 'volume'))))
+            checks += 1
+            mismatches += got != reference
+    print(f"Resample 15m -> 1h/4h: {checks} series, {_result(mismatches == 0)} {mismatches} distintas "
+          f"(contra velas reales del exchange: python benchmarks.py fixtures)")
+
+    # Peticiones por ciclo: antes ticker + 3 timeframes por símbolo; ahora una serie base incremental
+    client = OfflineClient()
+    symbols = [f"SYN{i}USDT" for i in range(50)]
+    for symbol in symbols:
+        client.futures_symbol_ticker(symbol)
+        for interval in ('4h', '1h', '15m'):
+            client.futures_klines(symbol, interval, 10)
+    legacy = sum(client.calls.values())
+
+    client = OfflineClient()
+    mtf = MultiTimeframeAnalyzer(candles=CandleStore(client, fresh_seconds=0))
+    mtf.analyze_universe(symbols)
+    first = sum(client.calls.values())
+    mtf.analyze_universe(symbols)
+    second = sum(client.calls.values()) - first
+    print(f"Peticiones por ciclo ({len(symbols)} símbolos): antes {legacy} | ahora {first} en frío, "
+          f"{second} al día (límite {mtf.base_limit} -> 1-2 velas)")
+
+
+# ==================== 046: MULTI-TIMEFRAME ====================
+
+def _legacy_timeframe(opens, closes) -> dict:
+    """_analyze_timeframe anterior (bucle por vela) sobre las 6 últimas velas"""
+    if len(closes) < 6:
+        return {'trend': 'NEUTRAL', 'candles': [], 'consecutive_count': 0}
+    candles = []
+    for o, c in zip(opens[-6:], closes[-6:]):
+        candles.append('green' if c > o else 'red' if c < o else 'neutral')
+    count = 0
+    for candle in reversed(candles):
+        if candle == candles[-1] and candle != 'neutral':
+            count += 1
+        else:
+            break
+    green, red = candles.count('green'), candles.count('red')
+    trend = 'BULLISH' if green >= 4 else 'BEARISH' if red >= 4 else 'NEUTRAL'
+    return {'trend': trend, 'candles': candles, 'consecutive_count': count, 'color': candles[-1]}
+
+
+def _legacy_signal(a4h, a1h, a15m):
+    """_determine_signal anterior"""
+    from config import Config
+    confirmed = a15m['consecutive_count'] >= Config.MIN_CANDLES_CONFIRMATION
+    if a4h['trend'] == 'BULLISH' and a1h['trend'] == 'BULLISH' and a15m.get('color') == 'green' and confirmed:
+        return 'LONG'
+    if a4h['trend'] == 'BEARISH' and a1h['trend'] == 'BEARISH' and a15m.get('color') == 'red' and confirmed:
+        return 'SHORT'
+    return None
+
+
+def bench_mtf():
+    """Tendencias de todo el universo con numpy vs el bucle por símbolo anterior"""
+    from analyzer import TrendSnapshot, classify_trends, determine_signals
+
+    n_symbols = 500
+    frames = []
+    for seed in range(3):
+        # Sesgo por símbolo para que salgan tendencias y señales
+        rng = np.random.default_rng(100 + seed)
+        drift = rng.normal(0, 0.004, (n_symbols, 1))
+        closes = 100 + np.cumsum(drift + rng.normal(0, 0.003, (n_symbols, 6)), axis=1).round(2)
+        opens = np.round(closes - drift * 100 - rng.normal(0, 0.2, (n_symbols, 6)), 2)
+        opens = np.where(rng.random((n_symbols, 6)) < 0.05, closes, opens)
+        frames.append((opens, closes))
+
+    def legacy():
+        out = []
+        for i in range(n_symbols):
+            analyses = [_legacy_timeframe(o[i].tolist(), c[i].tolist()) for o, c in frames]
+            out.append((_legacy_signal(*analyses), analyses))
+        return out
+
+    symbols = [f"SYN{i}USDT" for i in range(n_symbols)]
+
+    def snapshot():
+        trends = [classify_trends(o, c) for o, c in frames]
+        return TrendSnapshot(symbols, [0.0] * n_symbols, trends, *determine_signals(*trends))
+
+    # Equivalencia con el detalle completo de cada símbolo (lo que arma analyze_symbol)
+    full = snapshot()
+    batched = [(full.signal(symbol), [full.analysis(symbol)[f"analysis_{tf}"] for tf in ('4h', '1h', '15m')])
+               for symbol in symbols]
+    expected = legacy()
+    same = expected == batched and list(full.signals().values()) == [signal for signal, _ in expected]
+    signals = Counter(signal for signal, _ in expected)
+
+    legacy_time = _per_call(legacy, 5)
+    signals_time = _per_call(lambda: snapshot().signals(), 50)
+    detail_time = _per_call(lambda: full.analysis(symbols[0]), 2000)
+    print(f"MTF {n_symbols} símbolos: {_result(same)} mismas señales y análisis ({dict(signals)})")
+    print(f"  bucle por símbolo {legacy_time * 1e3:.1f} ms | numpy + señales del lote {signals_time * 1e3:.2f} ms "
+          f"| detalle de un símbolo bajo demanda {detail_time * 1e6:.0f} µs")
+
+
+# ==================== 047: ESCALERAS DE REGLAS ====================
+
+def _legacy_funding(rate):
+    if rate > 0.1:
+        return "Funding MUY ALTO - Exceso de longs", 'BEARISH', 70
+    elif rate > 0.05:
+        return "Funding alto - Mayoría long", 'BEARISH', 55
+    elif rate < -0.1:
+        return "Funding MUY NEGATIVO - Exceso de shorts", 'BULLISH', 70
+    elif rate < -0.05:
+        return "Funding negativo - Mayoría short", 'BULLISH', 55
+    return "Funding neutral", 'NEUTRAL', 0
+
+
+def _legacy_open_interest(change):
+    if change > 10:
+        return "OI subiendo fuerte (+{:.1f}%) - Nueva actividad".format(change), 'STRONG_TREND', 65
+    elif change > 5:
+        return "OI subiendo (+{:.1f}%) - Interés creciente".format(change), 'TREND', 50
+    elif change < -10:
+        return "OI cayendo fuerte ({:.1f}%) - Posiciones cerrándose".format(change), 'WEAK', 60
+    elif change < -5:
+        return "OI cayendo ({:.1f}%) - Pérdida de interés".format(change), 'WEAK', 45
+    return "OI estable ({:.1f}%)".format(change), 'NEUTRAL', 0
+
+
+def _legacy_long_short(ratio, long_pct, short_pct):
+    if ratio > 2.5:
+        return f"Extremo LONG ({long_pct:.0f}%) - Riesgo de caída", 'BEARISH', 75
+    elif ratio > 1.5:
+        return f"Mayoría LONG ({long_pct:.0f}%)", 'BEARISH', 55
+    elif ratio < 0.4:
+        return f"Extremo SHORT ({short_pct:.0f}%) - Riesgo de subida", 'BULLISH', 75
+    elif ratio < 0.67:
+        return f"Mayoría SHORT ({short_pct:.0f}%)", 'BULLISH', 55
+    return f"Equilibrado (L:{long_pct:.0f}%/S:{short_pct:.0f}%)", 'NEUTRAL', 0
+
+
+def _legacy_volume(ratio):
+    if ratio >= 5:
+        return f"Volumen EXTREMO ({ratio:.1f}x) - Ballenas activas", 'STRONG_MOVE', 85
+    elif ratio >= 3:
+        return f"Volumen MUY ALTO ({ratio:.1f}x) - Movimiento importante", 'STRONG_MOVE', 70
+    elif ratio >= 2:
+        return f"Volumen ALTO ({ratio:.1f}x) - Interés creciente", 'MOVE', 55
+    elif ratio <= 0.3:
+        return f"Volumen MUY BAJO ({ratio:.1f}x) - Calma antes de tormenta?", 'CALM', 40
+    return f"Volumen normal ({ratio:.1f}x)", 'NORMAL', 0
+
+
+def bench_rules():
+    """rules.json (bisect + textos) vs las escaleras if/elif anteriores, con sus textos"""
+    from rule_tables import rules
+
+    rng = np.random.default_rng(3)
+    # Llamadas como en futures_data / volume_analyzer: solo long/short lleva los porcentajes
+    cases = (
+        (rules.funding, _legacy_funding, rng.normal(0, 0.08, 20000), (-0.1, -0.05, 0.05, 0.1), False),
+        (rules.open_interest, _legacy_open_interest, rng.normal(0, 8, 20000), (-10, -5, 5, 10), False),
+        (rules.long_short, _legacy_long_short, rng.lognormal(0, 0.8, 20000), (0.4, 0.67, 1.5, 2.5), True),
+        (rules.volume, _legacy_volume, rng.lognormal(0, 0.9, 20000), (0.3, 2, 3, 5), False),
+    )
+    universe = 500
+    for table, legacy, values, edges, with_pcts in cases:
+        # Los bordes exactos (y sus vecinos) son donde se equivocaría un > por >=
+        edges = np.array(edges, dtype=float)
+        values = np.concatenate([values, edges, np.nextafter(edges, np.inf), np.nextafter(edges, -np.inf)])
+        values = values.tolist()  # floats de Python, como llegan de la API
+        sample = values[:universe]
+
+        if with_pcts:
+            def new(v):
+                long_pct = 100 * v / (1 + v)
+                return table.lookup(v, long_pct=long_pct, short_pct=100 - long_pct)
+
+            def old(v):
+                long_pct = 100 * v / (1 + v)
+                return legacy(v, long_pct, 100 - long_pct)
+        else:
+            new, old = table.lookup, legacy
+
+        same = all(new(v) == old(v) for v in values)
+        legacy_time = _per_call(lambda: [old(v) for v in sample], 200)
+        lookup_time = _per_call(lambda: [new(v) for v in sample], 200)
+        print(f"{table.name}: {_result(same)} mismos textos/señales/confianzas en {len(values)} valores | "
+              f"{universe} símbolos: if/elif {legacy_time * 1e6:.0f} µs, lookup {lookup_time * 1e6:.0f} µs")
+
+
+# ==================== 048: REGRESIÓN ====================
+
+def _polyfit_r2(y):
+    """Lo que hacían _detect_triangle / _detect_channel: np.polyfit + R² a mano"""
+    x = np.arange(len(y))
+    slope, intercept = np.polyfit(x, y, 1)
+    predicted = slope * x + intercept
+    ss_res = np.sum((y - predicted) ** 2)
+    ss_tot = np.sum((y - np.mean(y)) ** 2)
+    return slope, intercept, 1 - ss_res / ss_tot if ss_tot > 0 else 0
+
+
+def _centered_fit(y):
+    """Referencia bien condicionada: polyfit sobre y centrada y R² = correlación²"""
+    x = np.arange(len(y))
+    d = y - y.mean()
+    slope, intercept = np.polyfit(x, d, 1)
+    r2 = 0.0 if np.ptp(d) <= 1e-12 * abs(y.mean()) else np.corrcoef(x, d)[0, 1] ** 2
+    return slope, intercept + y.mean(), r2
+
+
+def bench_regression():
+    """linear_fit / rolling_regression vs np.polyfit ventana a ventana"""
+    from rolling_regression import linear_fit, rolling_regression
+
+    rng = np.random.default_rng(1)
+    worst = {'linear_fit': [0.0, 0.0], 'polyfit': [0.0, 0.0]}
+    decisions = 0
+    for k in range(5000):
+        scale = 10 ** rng.uniform(-6, 5)
+        kind = k % 3
+        if kind == 0:
+            y = scale * (1 + np.cumsum(rng.normal(0, 0.002, 20)))
+        elif kind == 1:
+            y = scale * (1 + 0.001 * np.arange(20) + rng.normal(0, 0.0003, 20))
+        else:
+            y = np.round(scale * (1 + rng.normal(0, 0.001, 20)), 4)
+        exact = _centered_fit(y)
+        for name, got in (('linear_fit', linear_fit(y)), ('polyfit', _polyfit_r2(y))):
+            worst[name][0] = max(worst[name][0], abs(got[0] - exact[0]) / scale)
+            worst[name][1] = max(worst[name][1], abs(got[2] - exact[2]))
+        # Decisión de canal/triángulo (R² > 0.7) que cambiaría
+        decisions += (linear_fit(y)[2] > 0.7) != (_polyfit_r2(y)[2] > 0.7)
+    print("Ventanas de 20 velas (precios 1e-6..1e5) vs referencia centrada:")
+    for name, (slope_error, r2_error) in worst.items():
+        print(f"  {name}: error de pendiente / precio {slope_error:.1e}, error de R² {r2_error:.1e}")
+    print(f"  ventanas donde cambia R² > 0.7 entre polyfit y linear_fit: {decisions}")
+
+    y = 60000 * np.exp(np.cumsum(rng.normal(0, 0.003, 9000)))
+    slope, intercept, r2 = rolling_regression(y, 20)
+    error = max(max(abs(slope[t] - ref[0]) / abs(ref[0]), abs(r2[t] - ref[2]))
+                for t in range(19, len(y), 7) for ref in [_polyfit_r2(y[t - 19:t + 1])])
+    print(f"rolling_regression vs polyfit (9000 velas): error máximo {error:.1e}, "
+          f"{_result(np.isnan(slope[:19]).all())} NaN en las primeras 19")
+
+    window = y[-20:]
+    polyfit_time = _per_call(lambda: _polyfit_r2(window), 5000)
+    fit_time = _per_call(lambda: linear_fit(window), 5000)
+    print(f"Una ventana: polyfit + R² {polyfit_time * 1e6:.1f} µs | linear_fit {fit_time * 1e6:.1f} µs")
+
+    history = 60000 * np.exp(np.cumsum(rng.normal(0, 0.003, (250, 8760)), axis=1))
+    started = time.perf_counter()
+    for row in history:
+        rolling_regression(row, 20)
+    full = time.perf_counter() - started
+    per_window = _per_call(lambda: _polyfit_r2(history[0, :20]), 500)
+    print(f"Historial 250 símbolos x 8760 velas: rolling_regression {full * 1e3:.0f} ms | "
+          f"polyfit ventana a ventana ~{per_window * history.size:.0f} s (estimado)")
+
+
+# ==================== 049: PIVOTES ====================
+
+def bench_swing():
+    """SwingPoints incremental vs argrelextrema sobre cada ventana"""
+    from swing_points import SwingPoints, argrelextrema
+    try:
+        from scipy.signal import argrelextrema as scipy_argrelextrema
+    except ImportError:
+        scipy_argrelextrema = None
+
+    rng = np.random.default_rng(7)
+    n = 6000
+    _, highs, lows, _ = synthetic_ohlc(n, seed=7, decimals=1)  # redondeo = empates
+    timestamps = np.arange(n, dtype=np.int64) * INTERVAL_MS['1h']
+
+    swings = SwingPoints()
+    checks = mismatches = scipy_mismatches = 0
+    t = 120
+    while t < n:
+        for tick in range(2):  # la vela en curso cambia entre llamadas
+            h, l = highs[t - 100:t].copy(), lows[t - 100:t].copy()
+            if tick:
+                h[-1] *= 1.01
+                l[-1] *= 0.99
+            candles = {'timestamp': timestamps[t - 100:t], 'high': h, 'low': l}
+            for order, start in ((5, 0), (3, 70), (3, 0), (5, 95)):
+                got = swings.pivots('SYN', candles, order, start)
+                ref = (argrelextrema(h[start:], np.greater, order), argrelextrema(l[start:], np.less, order))
+                checks += 1
+                mismatches += not (np.array_equal(got[0], ref[0]) and np.array_equal(got[1], ref[1]))
+                if scipy_argrelextrema is not None:
+                    scipy_ref = (scipy_argrelextrema(h[start:], np.greater, order=order)[0],
+                                 scipy_argrelextrema(l[start:], np.less, order=order)[0])
+                    scipy_mismatches += not (np.array_equal(ref[0], scipy_ref[0])
+                                             and np.array_equal(ref[1], scipy_ref[1]))
+        t += 1 if rng.random() < 0.97 else int(rng.integers(2, 150))  # huecos ocasionales
+    print(f"Pivotes: {checks} ventanas (con huecos y vela en curso cambiante), "
+          f"{_result(mismatches == 0)} {mismatches} distintas de argrelextrema")
+    if scipy_argrelextrema is not None:
+        print(f"  argrelextrema local vs scipy.signal: {_result(scipy_mismatches == 0)} {scipy_mismatches} distintas")
+
+    windows = [{'timestamp': timestamps[t - 100:t], 'high': highs[t - 100:t], 'low': lows[t - 100:t]}
+               for t in range(1000, 1300)]
+    swings = SwingPoints()
+
+    def incremental():
+        for candles in windows:
+            swings.pivots('SYN', candles, 5)
+            swings.pivots('SYN', candles, 3, 70)
+
+    def full(fn):
+        for candles in windows:
+            h, l = candles['high'], candles['low']
+            fn(h, np.greater, order=5), fn(l, np.less, order=5)
+            fn(h[70:], np.greater, order=3), fn(l[70:], np.less, order=3)
+
+    cycle = len(windows)
+    print(f"Por símbolo y ciclo: SwingPoints {_per_call(incremental, 3) / cycle * 1e6:.1f} µs | "
+          f"argrelextrema {_per_call(lambda: full(argrelextrema), 3) / cycle * 1e6:.1f} µs"
+          + (f" | scipy {_per_call(lambda: full(scipy_argrelextrema), 3) / cycle * 1e6:.1f} µs"
+             if scipy_argrelextrema is not None else ""))
+
+
+# ==================== 045 / 049: VELAS GRABADAS DEL EXCHANGE ====================
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+FIXTURE_INTERVALS = ('15m', '1h', '4h')
+
+
+def record_fixtures(symbols, bars_15m: int = 499):
+    """
+    Graba velas reales de Futures en fixtures/klines_<SYMBOL>_<intervalo>.json
+    (respuesta cruda de futures_klines). Los tres intervalos cubren el mismo
+    tramo, todo velas cerradas: termina en el último cierre de 4h y empieza
+    en el primer inicio de 4h que deja como mucho `bars_15m` velas de 15m.
+    """
+    import json
+
+    client = binance_client.get_client()
+    step_4h = INTERVAL_MS['4h']
+    end = int(time.time() * 1000) // step_4h * step_4h
+    start = -(-(end - bars_15m * INTERVAL_MS['15m']) // step_4h) * step_4h
+
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for symbol in symbols:
+        for interval in FIXTURE_INTERVALS:
+            klines = client.futures_klines(symbol=symbol, interval=interval, startTime=start,
+                                           endTime=end - 1, limit=bars_15m)
+            path = FIXTURES_DIR / f"klines_{symbol}_{interval}.json"
+            path.write_text(json.dumps(klines))
+            print(f"💾 {path.name}: {len(klines)} velas")
+
+
+def _load_fixtures() -> dict:
+    """{símbolo: {intervalo: velas como arrays}} de fixtures/"""
+    import json
+
+    fixtures = {}
+    for path in sorted(FIXTURES_DIR.glob('klines_*.json')):
+        symbol, interval = path.stem[len('klines_'):].rsplit('_', 1)
+        fixtures.setdefault(symbol, {})[interval] = klines_to_arrays(json.loads(path.read_text()))
+    return fixtures
+
+
+def bench_fixtures():
+    """Resample y pivotes sobre velas reales grabadas: contra las velas del exchange y contra scipy"""
+    from candles import KLINE_COLUMNS, resample
+    from swing_points import SwingPoints, argrelextrema
+    try:
+        from scipy.signal import argrelextrema as scipy_argrelextrema
+    except ImportError:
+        scipy_argrelextrema = None
+
+    fixtures = _load_fixtures()
+    if not fixtures:
+        print(f"⚠️ No hay velas grabadas en {FIXTURES_DIR.name}/ "
+              f"(grabarlas con red: python benchmarks.py --record BTCUSDT ETHUSDT)")
+        return
+
+    for symbol, series in fixtures.items():
+        # 1h/4h construidas desde 15m vs las del exchange, en el tramo común
+        base = series.get('15m')
+        for interval in ('1h', '4h'):
+            exchange = series.get(interval)
+            if base is None or exchange is None:
+                continue
+            derived = resample(base, interval)
+            common, got, expected = np.intersect1d(derived['timestamp'], exchange['timestamp'],
+                                                   return_indices=True)
+            different = [col for col in KLINE_COLUMNS
+                         if not np.array_equal(derived[col][got], exchange[col][expected])]
+            same = len(common) > 0 and not different
+            print(f"{symbol} {interval} desde 15m: {len(common)} velas, {_result(same)} "
+                  + ("idénticas a las del exchange" if same else f"distintas del exchange en {', '.join(different)}"))
+
+        # Pivotes de ventanas que avanzan vela a vela (la última hace de vela en curso)
+        for interval, candles in series.items():
+            n = len(candles['timestamp'])
+            size = min(100, n // 2)
+            swings = SwingPoints()
+            checks = mismatches = scipy_mismatches = 0
+            for t in range(size, n + 1):
+                window = {col: candles[col][t - size:t] for col in ('timestamp', 'high', 'low')}
+                for order, start in ((5, 0), (3, max(0, size - 30))):
+                    h, l = window['high'][start:], window['low'][start:]
+                    got = swings.pivots(f"{symbol} {interval}", window, order, start)
+                    ref = (argrelextrema(h, np.greater, order), argrelextrema(l, np.less, order))
+                    checks += 1
+                    mismatches += not (np.array_equal(got[0], ref[0]) and np.array_equal(got[1], ref[1]))
+                    if scipy_argrelextrema is not None:
+                        scipy_ref = (scipy_argrelextrema(h, np.greater, order=order)[0],
+                                     scipy_argrelextrema(l, np.less, order=order)[0])
+                        scipy_mismatches += not (np.array_equal(ref[0], scipy_ref[0])
+                                                 and np.array_equal(ref[1], scipy_ref[1]))
+            print(f"{symbol} {interval} pivotes: {checks} ventanas de {size} velas, "
+                  f"{_result(mismatches == 0)} SwingPoints = argrelextrema ({mismatches} distintas)"
+                  + (f", {_result(scipy_mismatches == 0)} = scipy.signal ({scipy_mismatches} distintas)"
+                     if scipy_argrelextrema is not None else ""))
+
+
+# ==================== 050: PATRONES DE VELAS ====================
+
+def _legacy_candle_patterns(o, h, l, c) -> list:
+    """_detect_candle_patterns anterior (escalar, sobre las 2 últimas velas)"""
+    o2, h2, l2, c2, o3, h3, l3, c3 = o[-2], h[-2], l[-2], c[-2], o[-1], h[-1], l[-1], c[-1]
+    body = abs(c3 - o3)
+    rng = h3 - l3
+    found = []
+    if c2 < o2 and c3 > o3 and o3 < c2 and c3 > o2:
+        found.append('ENGULFING_BULLISH')
+    if c2 > o2 and c3 < o3 and o3 > c2 and c3 < o2:
+        found.append('ENGULFING_BEARISH')
+    if rng > 0:
+        lower = min(o3, c3) - l3
+        upper = h3 - max(o3, c3)
+        if lower > body * 2 and upper < body * 0.5 and body < rng * 0.3:
+            found.append('HAMMER')
+        if upper > body * 2 and lower < body * 0.5 and body < rng * 0.3:
+            found.append('SHOOTING_STAR')
+        if body / rng < 0.1:
+            found.append('DOJI')
+    return found
+
+
+def bench_candles():
+    """candle_patterns sobre el historial completo vs el detector escalar vela a vela"""
+    from pattern_recognition import CANDLE_PATTERNS, candle_patterns
+
+    checks = mismatches = 0
+    hits = Counter()
+    for seed in range(10):
+        o, h, l, c = synthetic_ohlc(1500, seed=seed, decimals=seed % 4)
+        flags = candle_patterns(o, h, l, c)
+        ol, hl, ll, cl = o.tolist(), h.tolist(), l.tolist(), c.tolist()
+        for t in range(5, 1500):
+            expected = _legacy_candle_patterns(ol[t - 2:t], hl[t - 2:t], ll[t - 2:t], cl[t - 2:t])
+            got = [name for name in CANDLE_PATTERNS if flags[name][t - 1]]
+            checks += 1
+            mismatches += expected != got
+            hits.update(expected)
+    print(f"Patrones de velas: {checks} velas, {_result(mismatches == 0)} {mismatches} distintas "
+          f"del detector anterior ({dict(hits)})")
+
+    o, h, l, c = synthetic_ohlc((250, 8760), seed=11)
+    full = _per_call(lambda: candle_patterns(o, h, l, c), 3)
+    rows = [x[0].tolist() for x in (o, h, l, c)]
+    per_bar = _per_call(lambda: [_legacy_candle_patterns(*(r[t - 2:t] for r in rows))
+                                 for t in range(2, 8760)], 3) / 8758
+    print(f"Historial 250 símbolos x 8760 velas: candle_patterns {full * 1e3:.0f} ms | "
+          f"detector escalar vela a vela ~{per_bar * o.size:.1f} s (estimado)")
+
+
+BENCHMARKS = {
+    'analysis': ('026/027 análisis sobre arrays y perfiles de volumen en lote', bench_analysis),
+    'keys': ('036/037 conexiones por hilo e índice de suscriptores', bench_keys),
+    'loop': ('038 llamadas bloqueantes fuera del event loop', bench_loop),
+    'top': ('040 ranking Top Señales mantenido en put', bench_top),
+    'imports': ('042 arranque: tiempo de import', bench_imports),
+    'resample': ('045 velas 1h/4h desde 15m', bench_resample),
+    'mtf': ('046 multi-timeframe vectorizado', bench_mtf),
+    'rules': ('047 escaleras de reglas como datos', bench_rules),
+    'regression': ('048 regresión en ventana deslizante', bench_regression),
+    'swing': ('049 pivotes incrementales', bench_swing),
+    'fixtures': ('045/049 resample y pivotes sobre velas reales grabadas', bench_fixtures),
+    'candles': ('050 patrones de velas sobre el historial', bench_candles),
+}
+
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    names = sys.argv[1:] or list(BENCHMARKS)
+    if '--record' in names:
+        record_fixtures([name for name in names if name != '--record'] or ['BTCUSDT', 'ETHUSDT'])
+        sys.exit(0)
+    if '--list' in names:
+        for name, (description, _) in BENCHMARKS.items():
+            print(f"{name:<12} {description}")
+        sys.exit(0)
+
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"❌ Desconocidos: {', '.join(unknown)} (ver --list)")
+        sys.exit(1)
+
+    for name in names:
+        description, bench = BENCHMARKS[name]
+        print(f"\n{'=' * 60}\n📊 {description}\n{'=' * 60}")
+        bench()
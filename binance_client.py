@@ -1,16 +1,67 @@
 """
 Cliente optimizado para Binance Futures API
+python-binance se importa al crear el cliente: su import arrastra aiohttp y
+dateparser (~0.7 s) y no hace falta para importar el escáner o el bot
 """
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
+import threading
+import time
 from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Cliente de Binance compartido dentro del proceso
+    (un solo ping al crearlo y un solo pool de conexiones HTTP)
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            from binance.client import Client
+            _shared_client = Client(Config.BINANCE_API_KEY, Config.BINANCE_SECRET_KEY)
+        return _shared_client
+
+
+class WeightLimiter:
+    """
+    Presupuesto de peso de la API REST (token bucket, thread-safe)
+
+    Binance limita el peso por minuto e IP. La ráfaga inicial equivale a
+    `burst_seconds` de presupuesto y la recarga es más lenta en la misma
+    medida, así que ninguna ventana de 60 s pasa de `weight_per_minute`.
+    """
+
+    def __init__(self, weight_per_minute: float, burst_seconds: float = 10.0):
+        self.capacity = max(1.0, weight_per_minute * burst_seconds / 60.0)
+        self.rate = max(weight_per_minute - self.capacity, 1.0) / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, weight: float = 1):
+        """Bloquea hasta que haya presupuesto para `weight`"""
+        weight = min(weight, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = (weight - self.tokens) / self.rate
+            time.sleep(wait)
+
+
 class BinanceClient:
     def __init__(self):
         """Inicializa el cliente de Binance Futures"""
+        from binance.client import Client
         self.client = Client(
             Config.BINANCE_API_KEY,
             Config.BINANCE_SECRET_KEY,
@@ -23,6 +74,8 @@ class BinanceClient:
         Obtiene todos los pares USDT disponibles en Binance FUTURES
         Filtra por volumen mínimo
         """
+        from binance.exceptions import BinanceAPIException
+
         try:
             # Obtener info del exchange de FUTURES
             exchange_info = self.client.futures_exchange_info()
@@ -89,6 +142,8 @@ class BinanceClient:
         Returns:
             Lista de velas en formato [timestamp, open, high, low, close, volume]
         """
+        from binance.exceptions import BinanceAPIException
+
         try:
             # Usar futures_klines en lugar de get_klines
             klines = self.client.futures_klines(
@@ -2,7 +2,6 @@
 """
 Bot de Telegram con autenticación por keys y menú interactivo
 """
-import asyncio
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -10,13 +9,10 @@ from telegram.ext import (
     CallbackQueryHandler, filters, ContextTypes
 )
 from config import Config
-from keys_manager import (
-    is_user_authorized, 
-    validate_key, 
-    activate_key, 
-    get_authorized_chat_ids,
-    cleanup_expired
-)
+from telegram_broadcaster import TelegramBroadcaster, make_bot_sender
+import async_db as db
+from analysis_service import on_demand, analysis_cache
+from signal_generator import SignalGenerator
 
 # Configurar logging
 logging.basicConfig(
@@ -28,6 +24,9 @@ logger = logging.getLogger(__name__)
 # Estado de usuarios
 users_waiting_key = set()
 
+# Broadcaster por bot (conserva los límites de envío entre señales)
+_broadcasters = {}
+
 
 def get_main_menu():
     """Retorna el menú principal"""
@@ -46,7 +45,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     username = update.effective_user.username
     
     # Verificar si ya tiene acceso
-    auth_info = is_user_authorized(user_id)
+    auth_info = await db.is_user_authorized(user_id)
     
     if auth_info:
         # Usuario autorizado - mostrar menú
@@ -86,10 +85,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Verificar si está esperando key
     if user_id in users_waiting_key:
-        key_info = validate_key(text)
+        key_info = await db.validate_key(text)
         
         if key_info:
-            result = activate_key(text, user_id, chat_id, username)
+            result = await db.activate_key(text, user_id, chat_id, username)
             
             if result:
                 users_waiting_key.discard(user_id)
@@ -118,7 +117,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Usuario no autenticado
-    auth_info = is_user_authorized(user_id)
+    auth_info = await db.is_user_authorized(user_id)
     
     if not auth_info:
         users_waiting_key.add(user_id)
@@ -134,22 +133,34 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not symbol.endswith('USDT'):
             symbol = symbol + 'USDT'
         
-        await update.message.reply_text(
-            f"🔍 Analizando <b>{symbol}</b>...\n\n"
-            f"⏳ Por favor espera...",
-            parse_mode='HTML'
-        )
+        if on_demand.cached(symbol)[0] is None:
+            await update.message.reply_text(
+                f"🔍 Analizando <b>{symbol}</b>...\n\n"
+                f"⏳ Por favor espera...",
+                parse_mode='HTML'
+            )
         
-        # TODO: Integrar análisis real aquí
-        await asyncio.sleep(2)
+        result = await on_demand.analyze(symbol, user_id)
         
-        await update.message.reply_text(
-            f"📊 <b>Análisis de {symbol}</b>\n\n"
-            f"⚠️ El modelo de IA está en entrenamiento.\n"
-            f"Las señales automáticas llegarán pronto.",
-            parse_mode='HTML',
-            reply_markup=get_main_menu()
-        )
+        if result['status'] == 'ok':
+            await update.message.reply_text(
+                SignalGenerator.generate_analysis_report(result['analysis'], result['age']),
+                parse_mode='HTML',
+                reply_markup=get_main_menu()
+            )
+        elif result['status'] == 'rate_limited':
+            await update.message.reply_text(
+                f"⏳ Demasiados análisis seguidos.\n\n"
+                f"Intenta de nuevo en <b>{result['retry_in']:.0f}s</b>.",
+                parse_mode='HTML'
+            )
+        else:
+            await update.message.reply_text(
+                f"❌ No se pudo analizar <b>{symbol}</b>.\n\n"
+                f"Verifica que exista en Binance Futures.",
+                parse_mode='HTML',
+                reply_markup=get_main_menu()
+            )
 
 
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -160,7 +171,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     # Verificar autorización
-    auth_info = is_user_authorized(user_id)
+    auth_info = await db.is_user_authorized(user_id)
     if not auth_info:
         await query.edit_message_text(
             "🔒 Tu acceso expiró.\n\n"
@@ -179,10 +190,9 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
     
     elif query.data == 'top_signals':
+        # Ranking en memoria (lo actualiza el escáner): sin llamadas a Binance
         await query.edit_message_text(
-            "📈 <b>Top Señales Recientes</b>\n\n"
-            "⏳ El modelo está en entrenamiento.\n"
-            "Las señales llegarán automáticamente.",
+            SignalGenerator.generate_top_board(analysis_cache.top()),
             parse_mode='HTML',
             reply_markup=get_main_menu()
         )
@@ -217,26 +227,21 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def send_signal_to_users(bot, message: str):
     """Envía una señal a todos los usuarios autorizados"""
-    cleanup_expired()
-    chat_ids = get_authorized_chat_ids()
+    chat_ids = await db.get_authorized_chat_ids()
     
     if not chat_ids:
         logger.warning("⚠️ No hay usuarios autorizados")
         return 0
     
-    sent = 0
-    for chat_id in chat_ids:
-        try:
-            await bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                parse_mode='HTML'
-            )
-            sent += 1
-        except Exception as e:
-            logger.error(f"❌ Error enviando a {chat_id}: {e}")
+    broadcaster = _broadcasters.get(id(bot))
+    if broadcaster is None:
+        broadcaster = TelegramBroadcaster(sender=make_bot_sender(bot))
+        _broadcasters[id(bot)] = broadcaster
+    
+    result = await broadcaster.broadcast(chat_ids, message)
+    sent = result['sent']
     
-    logger.info(f"📤 Señal enviada a {sent}/{len(chat_ids)} usuarios")
+    logger.info(f"📤 Señal enviada a {sent}/{len(chat_ids)} usuarios en {result['elapsed']:.1f}s")
     return sent
 
 
@@ -246,7 +251,12 @@ def main():
         logger.error("❌ TELEGRAM_BOT_TOKEN no configurado")
         return
     
-    app = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(Config.TELEGRAM_BOT_TOKEN)
+        .base_url(f"{Config.TELEGRAM_API_BASE}/bot")
+        .build()
+    )
     
     # Handlers
     app.add_handler(CommandHandler("start", start_command))
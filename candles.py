@@ -0,0 +1,249 @@
+"""
+Velas como arrays de numpy
+Evita el overhead de pandas en ventanas cortas (100-200 velas)
+"""
+import threading
+import time
+import numpy as np
+
+# Columnas que devuelve futures_klines (las que usamos)
+KLINE_COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time')
+
+# Peso de futures_klines según `limit` (límite superior exclusivo, peso)
+KLINE_WEIGHTS = ((100, 1), (500, 2), (1001, 5))
+
+# Duración de cada intervalo de Binance en ms
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000,
+}
+
+
+def klines_to_arrays(klines) -> dict:
+    """
+    Convierte la respuesta cruda de futures_klines a arrays de numpy
+
+    Returns:
+        dict con arrays: timestamp, open, high, low, close, volume, close_time
+        o None si no hay velas
+    """
+    if not klines:
+        return None
+
+    data = np.array([k[:7] for k in klines], dtype=float)
+
+    return {
+        'timestamp': data[:, 0].astype(np.int64),
+        'open': data[:, 1],
+        'high': data[:, 2],
+        'low': data[:, 3],
+        'close': data[:, 4],
+        'volume': data[:, 5],
+        'close_time': data[:, 6].astype(np.int64),
+    }
+
+
+def resample(candles: dict, interval: str) -> dict:
+    """
+    Velas de `interval` construidas con velas más cortas (p. ej. 4h desde 15m)
+
+    Los cubos se alinean como en Binance (múltiplos de la duración desde el
+    epoch UTC, válido hasta 1d). El primer cubo se descarta si le faltan
+    velas al inicio; el último puede ser la vela en curso, igual que en el
+    exchange. OHLC se copian (exactos) y el volumen se suma en decimal, así
+    que el resultado coincide con las velas del exchange.
+
+    Returns:
+        dict de arrays como klines_to_arrays (o None si no queda ninguna vela)
+    """
+    step = INTERVAL_MS[interval]
+    timestamps = candles['timestamp']
+    buckets = timestamps // step * step
+
+    start = 0
+    if timestamps[0] != buckets[0]:
+        start = int(np.searchsorted(buckets, buckets[0], side='right'))
+    if start >= len(timestamps):
+        return None
+
+    buckets = buckets[start:]
+    firsts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    lasts = np.r_[firsts[1:] - 1, len(buckets) - 1]
+
+    opens = candles['open'][start:]
+    closes = candles['close'][start:]
+    return {
+        'timestamp': buckets[firsts],
+        'open': opens[firsts],
+        'high': np.maximum.reduceat(candles['high'][start:], firsts),
+        'low': np.minimum.reduceat(candles['low'][start:], firsts),
+        'close': closes[lasts],
+        'volume': _decimal_sum(candles['volume'][start:], firsts),
+        'close_time': buckets[firsts] + step - 1,
+    }
+
+
+def _decimal_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Sumas por tramo como las haría el exchange en decimal
+
+    Las cantidades de Binance tienen a lo sumo 8 decimales: se suman como
+    enteros en la escala mínima que las representa y se dividen una sola
+    vez (división correctamente redondeada = mismo float que el string).
+    """
+    for decimals in range(9):
+        scaled = values * 10.0 ** decimals
+        units = np.rint(scaled)
+        if np.all(np.abs(scaled - units) <= 1e-12 * np.maximum(1.0, np.abs(scaled))):
+            break
+    else:
+        return np.add.reduceat(values, starts)
+
+    sums = np.add.reduceat(units.astype(np.int64), starts)
+    if len(sums) and np.abs(sums).max() >= 2 ** 53:
+        return np.add.reduceat(values, starts)  # no cabe exacto en float
+    return sums / 10.0 ** decimals
+
+
+def kline_weight(limit: int) -> int:
+    """Peso de una petición de velas en el límite de la API REST"""
+    for upper, weight in KLINE_WEIGHTS:
+        if limit < upper:
+            return weight
+    return 10
+
+
+def df_to_arrays(df) -> dict:
+    """Adaptador: extrae los arrays de un DataFrame de velas"""
+    candles = {}
+    for col in ('open', 'high', 'low', 'close', 'volume'):
+        candles[col] = df[col].to_numpy(dtype=float)
+    for col in ('timestamp', 'close_time'):
+        if col in df.columns and np.issubdtype(df[col].dtype, np.number):
+            candles[col] = df[col].to_numpy(dtype=np.int64)
+    return candles
+
+
+class CandleStore:
+    """
+    Últimas velas por (símbolo, intervalo)
+
+    La primera petición descarga la ventana completa; las siguientes solo
+    las velas que faltan desde la última vista más la vela en curso. El
+    contenido se puede volcar y restaurar (ver state_snapshot), así que
+    tras un reinicio solo se descarga el hueco.
+    """
+
+    def __init__(self, client, maxlen: int = 200, fresh_seconds: float = 5.0):
+        """
+        Args:
+            client: cliente de Binance
+            maxlen: velas que se guardan por serie
+            fresh_seconds: una serie descargada hace menos que esto se sirve
+                sin pedir la vela en curso otra vez (p. ej. tras el backfill)
+        """
+        self.client = client
+        self.maxlen = maxlen
+        self.fresh_seconds = fresh_seconds
+        self._lock = threading.Lock()
+
+        # (symbol, interval) -> arrays de velas (la última es la vela en curso)
+        self._buffers = {}
+        self._fetched_at = {}  # (symbol, interval) -> time.monotonic()
+
+    def has(self, symbol: str, interval: str) -> bool:
+        return (symbol, interval) in self._buffers
+
+    def peek(self, symbol: str, interval: str) -> dict:
+        """Velas en memoria tal cual (sin peticiones) o None"""
+        with self._lock:
+            return self._buffers.get((symbol, interval))
+
+    def get(self, symbol: str, interval: str, limit: int, limiter=None) -> dict:
+        """
+        Últimas `limit` velas (misma forma que klines_to_arrays)
+
+        Args:
+            limiter: WeightLimiter opcional (se descuenta el peso de cada petición)
+
+        Returns:
+            dict de arrays o None si no hay velas
+        """
+        key = (symbol, interval)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            fetched_at = self._fetched_at.get(key)
+
+        if (buffer is not None and len(buffer['timestamp']) >= limit
+                and fetched_at is not None and time.monotonic() - fetched_at < self.fresh_seconds):
+            return {col: values[-limit:] for col, values in buffer.items()}
+
+        fetch = self._missing(buffer, interval, limit)
+        fresh = self._fetch(symbol, interval, fetch, limiter)
+        if fresh is None:
+            return None
+
+        if fetch < limit:
+            first = fresh['timestamp'][0]
+            if first > buffer['timestamp'][-1]:
+                # Hueco (p. ej. reloj local desfasado): ventana completa
+                fresh = self._fetch(symbol, interval, limit, limiter)
+                if fresh is None:
+                    return None
+            else:
+                keep = buffer['timestamp'] < first
+                fresh = {
+                    col: np.concatenate((buffer[col][keep], fresh[col]))
+                    for col in KLINE_COLUMNS
+                }
+
+        size = max(limit, self.maxlen)
+        fresh = {col: values[-size:] for col, values in fresh.items()}
+        with self._lock:
+            self._buffers[key] = fresh
+            self._fetched_at[key] = time.monotonic()
+
+        return {col: values[-limit:] for col, values in fresh.items()}
+
+    def _fetch(self, symbol: str, interval: str, limit: int, limiter) -> dict:
+        if limiter:
+            limiter.acquire(kline_weight(limit))
+        klines = self.client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+        return klines_to_arrays(klines)
+
+    @staticmethod
+    def _missing(buffer: dict, interval: str, limit: int) -> int:
+        """Velas a descargar: las nuevas + la última del buffer (pudo cerrarse)"""
+        step = INTERVAL_MS.get(interval)
+        if buffer is None or step is None or len(buffer['timestamp']) < limit:
+            return limit
+
+        current_open = int(time.time() * 1000) // step * step
+        new_bars = max(0, (current_open - int(buffer['timestamp'][-1])) // step)
+        return min(limit, new_bars + 1)
+
+    def export_state(self) -> dict:
+        """(symbol, interval) -> matriz (velas x KLINE_COLUMNS)"""
+        with self._lock:
+            buffers = dict(self._buffers)
+        return {
+            key: np.column_stack([buffer[col] for col in KLINE_COLUMNS]).astype(float)
+            for key, buffer in buffers.items()
+        }
+
+    def load_state(self, state: dict):
+        """Restaura lo volcado por export_state"""
+        buffers = {}
+        for key, matrix in state.items():
+            if len(matrix) == 0:
+                continue
+            buffer = {col: matrix[:, i] for i, col in enumerate(KLINE_COLUMNS)}
+            for col in ('timestamp', 'close_time'):
+                buffer[col] = buffer[col].astype(np.int64)
+            buffers[key] = buffer
+        with self._lock:
+            self._buffers.update(buffers)
+
+    def __len__(self):
+        return len(self._buffers)
@@ -17,6 +17,22 @@ class Config:
     # Telegram
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
     TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+    TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))     # msgs/s en total
+    TELEGRAM_PER_CHAT_RATE = float(os.getenv('TELEGRAM_PER_CHAT_RATE', 1))  # msgs/s por chat
+    TELEGRAM_CONCURRENCY = int(os.getenv('TELEGRAM_CONCURRENCY', 50))       # peticiones en vuelo
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 4))
+    
+    # Hilos para llamadas bloqueantes desde el bot (SQLite)
+    DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', 4))
+    
+    # Análisis bajo demanda desde el bot
+    ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', 120))  # segundos que vale un análisis
+    ANALYSIS_EXECUTOR_WORKERS = int(os.getenv('ANALYSIS_EXECUTOR_WORKERS', 2))
+    ANALYZE_USER_LIMIT = int(os.getenv('ANALYZE_USER_LIMIT', 5))     # análisis nuevos por usuario
+    ANALYZE_USER_WINDOW = int(os.getenv('ANALYZE_USER_WINDOW', 60))  # en esta ventana (s)
+    TOP_SIGNALS_COUNT = int(os.getenv('TOP_SIGNALS_COUNT', 10))        # filas del ranking
+    TOP_SIGNALS_MAX_AGE = int(os.getenv('TOP_SIGNALS_MAX_AGE', 900))   # análisis más viejos no entran
     
     # Configuración de análisis
     MIN_VOLUME_24H = int(os.getenv('MIN_VOLUME_24H', 5000000))  # $5M
@@ -27,6 +43,57 @@ class Config:
     TIMEFRAME_LONG = os.getenv('TIMEFRAME_LONG', '4h')
     TIMEFRAME_MEDIUM = os.getenv('TIMEFRAME_MEDIUM', '1h')
     TIMEFRAME_SHORT = os.getenv('TIMEFRAME_SHORT', '15m')
+    # Tendencia 4H/1H/15m de cada barrido como razón extra de las señales (opcional:
+    # una petición de velas de 15m por símbolo y barrido)
+    MTF_CONFIRMATION = os.getenv('MTF_CONFIRMATION', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Stream de velas por websocket (estadísticas de volumen en tiempo real)
+    STREAM_ENABLED = os.getenv('STREAM_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Niveles de prioridad de escaneo
+    TIERS_ENABLED = os.getenv('TIERS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    TIER_WARM_EVERY = int(os.getenv('TIER_WARM_EVERY', 2))   # ciclos entre análisis WARM
+    TIER_COLD_EVERY = int(os.getenv('TIER_COLD_EVERY', 4))   # ciclos entre análisis COLD
+    TIER_SCORE_MARGIN = int(os.getenv('TIER_SCORE_MARGIN', 15))  # puntos bajo el umbral = HOT
+    
+    # Backfill de velas al arrancar (símbolos sin historial en memoria)
+    BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', 8))  # descargas en paralelo
+    BACKFILL_WEIGHT_PER_MINUTE = int(os.getenv('BACKFILL_WEIGHT_PER_MINUTE', 1800))  # de 2400 por IP
+    
+    # Snapshot del estado en memoria (arranque en caliente tras reiniciar)
+    SNAPSHOT_ENABLED = os.getenv('SNAPSHOT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SNAPSHOT_INTERVAL_SECONDS = int(os.getenv('SNAPSHOT_INTERVAL_SECONDS', 300))
+    SNAPSHOT_MAX_AGE_HOURS = int(os.getenv('SNAPSHOT_MAX_AGE_HOURS', 24))  # más viejo = arranque en frío
+    
+    # Despacho de señales (cola fuera del loop de escaneo)
+    DISPATCH_QUEUE_SIZE = int(os.getenv('DISPATCH_QUEUE_SIZE', 100))
+    DISPATCH_PACING_SECONDS = float(os.getenv('DISPATCH_PACING_SECONDS', 1.0))
+    DISPATCH_BATCH_SIZE = int(os.getenv('DISPATCH_BATCH_SIZE', 10))  # señales por lectura del outbox
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))  # intentos por (señal, chat)
+    OUTBOX_MAX_AGE_MINUTES = int(os.getenv('OUTBOX_MAX_AGE_MINUTES', 30))  # después se descarta
+    
+    # Escaneo repartido (coordinador + workers)
+    SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', 0))  # procesos worker locales (0 = sin repartir)
+    SHARD_COORDINATOR = os.getenv('SHARD_COORDINATOR', 'false').lower() in ('1', 'true', 'yes')
+    SHARD_BIND = os.getenv('SHARD_BIND', '127.0.0.1:50070')
+    SHARD_AUTHKEY = os.getenv('SHARD_AUTHKEY', '')
+    SHARD_HEARTBEAT_SECONDS = int(os.getenv('SHARD_HEARTBEAT_SECONDS', 5))
+    SHARD_BATCH_TIMEOUT = int(os.getenv('SHARD_BATCH_TIMEOUT', 300))
+    
+    # Disparadores por eventos (re-análisis inmediato)
+    TRIGGER_VELOCITY_PCT = float(os.getenv('TRIGGER_VELOCITY_PCT', 1.5))  # % de movimiento
+    TRIGGER_VELOCITY_WINDOW = int(os.getenv('TRIGGER_VELOCITY_WINDOW', 60))  # en estos segundos
+    TRIGGER_OI_JUMP_PCT = float(os.getenv('TRIGGER_OI_JUMP_PCT', 3.0))
+    TRIGGER_OI_POLL_SECONDS = int(os.getenv('TRIGGER_OI_POLL_SECONDS', 60))  # sondeo de OI (0 = solo en el barrido)
+    TRIGGER_COOLDOWN_SECONDS = int(os.getenv('TRIGGER_COOLDOWN_SECONDS', 300))
+    
+    # Perfil de volumen (resoluciones en niveles, la primera es la principal)
+    VOLUME_PROFILE_BINS = tuple(
+        int(b) for b in os.getenv('VOLUME_PROFILE_BINS', '20,50').split(',') if b.strip()
+    )
+    
+    # Umbrales de interpretación (funding, OI, L/S, volumen); vacío = rules.json
+    RULES_FILE = os.getenv('RULES_FILE', '')
     
     # Confirmación
     MIN_CANDLES_CONFIRMATION = int(os.getenv('MIN_CANDLES_CONFIRMATION', 3))
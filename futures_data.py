@@ -3,8 +3,9 @@ Datos exclusivos de Binance Futures
 Funding Rate, Open Interest, Long/Short Ratio
 """
 import logging
-from binance.client import Client
 from config import Config
+from binance_client import get_client
+from rule_tables import rules
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +14,10 @@ class FuturesAnalyzer:
     """Analiza métricas exclusivas de Futures"""
     
     def __init__(self):
-        self.client = Client(Config.BINANCE_API_KEY, Config.BINANCE_SECRET_KEY)
+        self.client = get_client()
+        
+        # Callbacks fn(symbol, open_interest) con cada muestra de OI
+        self.oi_listeners = []
     
     def get_funding_rate(self, symbol: str) -> dict:
         """
@@ -34,27 +38,8 @@ class FuturesAnalyzer:
             
             rate = float(funding[0]['fundingRate']) * 100  # Convertir a porcentaje
             
-            # Interpretar
-            if rate > 0.1:
-                interpretation = "Funding MUY ALTO - Exceso de longs"
-                signal = "BEARISH"
-                confidence = 70
-            elif rate > 0.05:
-                interpretation = "Funding alto - Mayoría long"
-                signal = "BEARISH"
-                confidence = 55
-            elif rate < -0.1:
-                interpretation = "Funding MUY NEGATIVO - Exceso de shorts"
-                signal = "BULLISH"
-                confidence = 70
-            elif rate < -0.05:
-                interpretation = "Funding negativo - Mayoría short"
-                signal = "BULLISH"
-                confidence = 55
-            else:
-                interpretation = "Funding neutral"
-                signal = "NEUTRAL"
-                confidence = 0
+            # Interpretar (tabla funding_rate de rules.json)
+            interpretation, signal, confidence = rules.funding.lookup(rate)
             
             return {
                 'rate': rate,
@@ -84,6 +69,7 @@ class FuturesAnalyzer:
             # OI actual
             oi_data = self.client.futures_open_interest(symbol=symbol)
             current_oi = float(oi_data['openInterest'])
+            self._publish_open_interest(symbol, current_oi)
             
             # OI histórico para calcular cambio (últimas 24h)
             oi_hist = self.client.futures_open_interest_hist(
@@ -98,27 +84,8 @@ class FuturesAnalyzer:
             else:
                 oi_change = 0
             
-            # Interpretar
-            if oi_change > 10:
-                interpretation = "OI subiendo fuerte (+{:.1f}%) - Nueva actividad".format(oi_change)
-                signal = "STRONG_TREND"
-                confidence = 65
-            elif oi_change > 5:
-                interpretation = "OI subiendo (+{:.1f}%) - Interés creciente".format(oi_change)
-                signal = "TREND"
-                confidence = 50
-            elif oi_change < -10:
-                interpretation = "OI cayendo fuerte ({:.1f}%) - Posiciones cerrándose".format(oi_change)
-                signal = "WEAK"
-                confidence = 60
-            elif oi_change < -5:
-                interpretation = "OI cayendo ({:.1f}%) - Pérdida de interés".format(oi_change)
-                signal = "WEAK"
-                confidence = 45
-            else:
-                interpretation = "OI estable ({:.1f}%)".format(oi_change)
-                signal = "NEUTRAL"
-                confidence = 0
+            # Interpretar (tabla open_interest_change de rules.json)
+            interpretation, signal, confidence = rules.open_interest.lookup(oi_change)
             
             return {
                 'open_interest': current_oi,
@@ -134,6 +101,31 @@ class FuturesAnalyzer:
                 logger.debug(f"Open interest no disponible: {e}")
             return None
     
+    def sample_open_interest(self, symbol: str) -> float:
+        """
+        Solo el Open Interest actual (peso 1, sin histórico), avisando a
+        los listeners: lo usa el sondeo de OI entre barridos
+        
+        Returns:
+            open interest o None
+        """
+        try:
+            oi_data = self.client.futures_open_interest(symbol=symbol)
+            current_oi = float(oi_data['openInterest'])
+        except Exception as e:
+            logger.debug(f"Open interest no disponible: {e}")
+            return None
+        
+        self._publish_open_interest(symbol, current_oi)
+        return current_oi
+    
+    def _publish_open_interest(self, symbol: str, open_interest: float):
+        for listener in self.oi_listeners:
+            try:
+                listener(symbol, open_interest)
+            except Exception as e:
+                logger.error(f"Error en listener de OI: {e}")
+    
     def get_long_short_ratio(self, symbol: str) -> dict:
         """
         Obtiene el ratio Long/Short de las cuentas top
@@ -159,27 +151,10 @@ class FuturesAnalyzer:
             long_pct = float(ratio_data[0]['longAccount']) * 100
             short_pct = float(ratio_data[0]['shortAccount']) * 100
             
-            # Interpretar
-            if ratio > 2.5:
-                interpretation = f"Extremo LONG ({long_pct:.0f}%) - Riesgo de caída"
-                signal = "BEARISH"
-                confidence = 75
-            elif ratio > 1.5:
-                interpretation = f"Mayoría LONG ({long_pct:.0f}%)"
-                signal = "BEARISH"
-                confidence = 55
-            elif ratio < 0.4:
-                interpretation = f"Extremo SHORT ({short_pct:.0f}%) - Riesgo de subida"
-                signal = "BULLISH"
-                confidence = 75
-            elif ratio < 0.67:
-                interpretation = f"Mayoría SHORT ({short_pct:.0f}%)"
-                signal = "BULLISH"
-                confidence = 55
-            else:
-                interpretation = f"Equilibrado (L:{long_pct:.0f}%/S:{short_pct:.0f}%)"
-                signal = "NEUTRAL"
-                confidence = 0
+            # Interpretar (tabla long_short_ratio de rules.json)
+            interpretation, signal, confidence = rules.long_short.lookup(
+                ratio, long_pct=long_pct, short_pct=short_pct
+            )
             
             return {
                 'ratio': ratio,
@@ -232,15 +207,9 @@ class FuturesAnalyzer:
             reasons.append(f"📊 OI: {oi['interpretation']}")
         
         # Consolidar
-        if bullish_score > bearish_score and bullish_score >= 60:
-            signal = 'LONG'
-            confidence = min(bullish_score, 90)
-        elif bearish_score > bullish_score and bearish_score >= 60:
-            signal = 'SHORT'
-            confidence = min(bearish_score, 90)
-        else:
-            signal = None
-            confidence = 0
+        longs, shorts, confidence = rules.consolidate_futures(bullish_score, bearish_score)
+        signal = 'LONG' if longs else 'SHORT' if shorts else None
+        confidence = int(confidence)
         
         return {
             'funding': funding,
@@ -4,6 +4,8 @@ Sistema de gestión de keys de acceso
 import sqlite3
 import secrets
 import string
+import threading
+import heapq
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
@@ -12,7 +14,6 @@ logger = logging.getLogger(__name__)
 
 # Directorio de datos
 DATA_DIR = Path(__file__).parent / 'data'
-DATA_DIR.mkdir(exist_ok=True)
 DB_PATH = DATA_DIR / 'access_keys.db'
 
 # Duraciones disponibles (en horas)
@@ -27,16 +28,49 @@ DURATIONS = {
 }
 
 
+# Una conexión persistente por hilo (sqlite3 no comparte conexiones entre hilos)
+_local = threading.local()
+
+# Las tablas se crean al primer uso, no al importar el módulo
+_db_ready = False
+_db_lock = threading.Lock()
+
+
 def get_db_connection():
-    """Obtiene conexión a la base de datos"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """
+    Obtiene la conexión a la base de datos del hilo actual
+
+    Se reutiliza en cada llamada (no cerrarla): WAL para que las lecturas
+    no esperen a las escrituras y caché de sentencias preparadas.
+    """
+    if not _db_ready:
+        _ensure_db()
+    return _thread_connection()
+
+
+def _ensure_db():
+    global _db_ready
+    with _db_lock:
+        if not _db_ready:
+            init_db()
+            _db_ready = True
+
+
+def _thread_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _local.conn = conn
     return conn
 
 
 def init_db():
     """Inicializa las tablas de la base de datos"""
-    conn = get_db_connection()
+    DATA_DIR.mkdir(exist_ok=True)
+    conn = _thread_connection()
     cursor = conn.cursor()
     
     # Tabla de keys
@@ -66,8 +100,18 @@ def init_db():
         )
     ''')
     
+    # Índices (user_id y key ya tienen el suyo por UNIQUE)
+    # expires_at + chat_id cubre get_authorized_chat_ids sin leer la tabla
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_authorized_users_expires
+        ON authorized_users(expires_at, chat_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_access_keys_status
+        ON access_keys(status)
+    ''')
+    
     conn.commit()
-    conn.close()
     logger.info("✅ Base de datos de keys inicializada")
 
 
@@ -105,7 +149,6 @@ def generate_key(duration_option: int) -> tuple:
     ''', (key, duration_hours))
     
     conn.commit()
-    conn.close()
     
     logger.info(f"✅ Key generada: {key} ({duration_label})")
     return key, duration_label, duration_hours
@@ -131,7 +174,6 @@ def validate_key(key: str) -> dict:
     ''', (key,))
     
     row = cursor.fetchone()
-    conn.close()
     
     if row:
         return {
@@ -191,7 +233,7 @@ def activate_key(key: str, user_id: int, chat_id: int, username: str = None) ->
         ''', (user_id, chat_id, username, key_info['id'], expires_at))
         
         conn.commit()
-        conn.close()
+        subscribers.add(user_id, chat_id, expires_at)
         
         logger.info(f"✅ Key activada para usuario {user_id} hasta {expires_at}")
         
@@ -202,14 +244,13 @@ def activate_key(key: str, user_id: int, chat_id: int, username: str = None) ->
     
     except Exception as e:
         conn.rollback()
-        conn.close()
         logger.error(f"❌ Error activando key: {e}")
         return None
 
 
 def is_user_authorized(user_id: int) -> dict:
     """
-    Verifica si un usuario tiene acceso activo
+    Verifica si un usuario tiene acceso activo (índice en memoria)
     
     Args:
         user_id: ID del usuario de Telegram
@@ -217,20 +258,9 @@ def is_user_authorized(user_id: int) -> dict:
     Returns:
         Dict con info si autorizado, None si no
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT expires_at
-        FROM authorized_users
-        WHERE user_id = ? AND expires_at > datetime('now')
-    ''', (user_id,))
-    
-    row = cursor.fetchone()
-    conn.close()
+    expires_at = subscribers.expires_at(user_id)
     
-    if row:
-        expires_at = datetime.fromisoformat(row['expires_at'])
+    if expires_at:
         remaining = expires_at - datetime.now()
         return {
             'expires_at': expires_at,
@@ -239,26 +269,14 @@ def is_user_authorized(user_id: int) -> dict:
     return None
 
 
-def get_authorized_chat_ids() -> list:
+def get_authorized_chat_ids() -> tuple:
     """
-    Obtiene lista de chat_ids con acceso activo
+    Obtiene los chat_ids con acceso activo (índice en memoria)
     
     Returns:
-        Lista de chat_ids autorizados
+        Tupla de chat_ids autorizados
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT chat_id
-        FROM authorized_users
-        WHERE expires_at > datetime('now')
-    ''')
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return [row['chat_id'] for row in rows]
+    return subscribers.chat_ids()
 
 
 def cleanup_expired():
@@ -266,20 +284,20 @@ def cleanup_expired():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Marcar keys expiradas
+    # Marcar keys expiradas (idx_authorized_users_expires acota el rango)
+    # expires_at se guarda con datetime.now() (hora local): mismo reloj aquí
     cursor.execute('''
         UPDATE access_keys
         SET status = 'expired'
         WHERE status = 'active'
         AND id IN (
             SELECT key_id FROM authorized_users
-            WHERE expires_at <= datetime('now')
+            WHERE expires_at <= ?
         )
-    ''')
+    ''', (datetime.now(),))
     
     affected = cursor.rowcount
     conn.commit()
-    conn.close()
     
     if affected > 0:
         logger.info(f"🧹 {affected} keys marcadas como expiradas")
@@ -287,6 +305,165 @@ def cleanup_expired():
     return affected
 
 
+class SubscriberIndex:
+    """
+    Usuarios con acceso activo, en memoria
+
+    Se carga una vez de la base de datos y se actualiza en activate_key.
+    Las expiraciones salen de un min-heap por expires_at (con datetime.now(),
+    el mismo reloj con el que se guardan). Un hilo en segundo plano
+    persiste las expiraciones (cleanup_expired) en cada vuelta y, si otro
+    proceso escribió en la base de datos (PRAGMA data_version), recarga la
+    tabla entera: altas, bajas, revocaciones y cambios de expires_at.
+    """
+
+    def __init__(self, refresh_seconds: int = 30):
+        self.refresh_seconds = refresh_seconds
+        self._users = {}     # user_id -> (chat_id, expires_at)
+        self._heap = []      # (expires_at, user_id); entradas viejas se ignoran
+        self._chat_ids = None
+        self._added = {}     # altas de activate_key durante una recarga
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def loaded(self) -> bool:
+        """True una vez cargado: las lecturas ya no tocan la base de datos"""
+        return self._loaded
+
+    def preload(self):
+        """Carga el índice por adelantado (p. ej. al arrancar, en otro hilo)"""
+        with self._lock:
+            self._ensure_loaded()
+
+    def expires_at(self, user_id: int) -> datetime:
+        with self._lock:
+            self._ensure_loaded()
+            self._expire()
+            entry = self._users.get(user_id)
+            return entry[1] if entry else None
+
+    def chat_ids(self) -> tuple:
+        with self._lock:
+            self._ensure_loaded()
+            self._expire()
+            if self._chat_ids is None:
+                self._chat_ids = tuple(chat_id for chat_id, _ in self._users.values())
+            return self._chat_ids
+
+    def stop(self):
+        """Detiene el hilo de refresco (p. ej. un índice sobre otra base de datos)"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+    
+    def add(self, user_id: int, chat_id: int, expires_at: datetime):
+        with self._lock:
+            if not self._loaded:
+                return  # se leerá al cargar
+            self._set(user_id, chat_id, expires_at)
+            self._added[user_id] = (chat_id, expires_at)
+        self._wake.set()
+
+    def _set(self, user_id, chat_id, expires_at):
+        # Los ya vencidos no entran; cleanup_expired los marca en la próxima vuelta
+        if expires_at <= datetime.now():
+            return
+        self._users[user_id] = (chat_id, expires_at)
+        heapq.heappush(self._heap, (expires_at, user_id))
+        self._chat_ids = None
+
+    def _expire(self) -> int:
+        """Saca del índice los usuarios vencidos; devuelve cuántos"""
+        now = datetime.now()
+        expired = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, user_id = heapq.heappop(self._heap)
+            entry = self._users.get(user_id)
+            if entry and entry[1] == expires_at:
+                del self._users[user_id]
+                self._chat_ids = None
+                expired += 1
+        return expired
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._apply(self._read_rows())
+        self._loaded = True
+        logger.info(f"👥 Índice de suscriptores cargado: {len(self._users)} activos")
+
+        self._thread = threading.Thread(target=self._run, name="SubscriberIndex", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _read_rows() -> list:
+        """Toda la tabla authorized_users: (user_id, chat_id, expires_at)"""
+        cursor = get_db_connection().cursor()
+        cursor.row_factory = None
+        rows = cursor.execute('SELECT user_id, chat_id, expires_at FROM authorized_users').fetchall()
+        return [(user_id, chat_id, datetime.fromisoformat(expires_at)) for user_id, chat_id, expires_at in rows]
+
+    def _apply(self, rows: list):
+        """Reemplaza el índice por `rows` (con el lock tomado)"""
+        self._users = {}
+        self._heap = []
+        self._chat_ids = None
+        for user_id, chat_id, expires_at in rows:
+            self._set(user_id, chat_id, expires_at)
+
+        # Altas de este proceso que la lectura pudo no ver todavía
+        for user_id, (chat_id, expires_at) in self._added.items():
+            self._set(user_id, chat_id, expires_at)
+        self._added = {}
+
+    @staticmethod
+    def _data_version() -> int:
+        """Cambia cuando otra conexión confirma escrituras en la base de datos"""
+        return get_db_connection().execute('PRAGMA data_version').fetchone()[0]
+
+    def _run(self):
+        """Persiste expiraciones y recarga si la base de datos cambió fuera"""
+        version = None
+        while not self._stopped.is_set():
+            # La base de datos se lee fuera del lock: las consultas del bot no esperan
+            try:
+                cleanup_expired()
+                current = self._data_version()
+                if current != version:
+                    with self._lock:
+                        self._added = {}
+                    rows = self._read_rows()
+                    with self._lock:
+                        self._apply(rows)
+                    version = current
+            except Exception as e:
+                logger.error(f"❌ Error actualizando suscriptores: {e}")
+
+            with self._lock:
+                self._expire()
+                timeout = self.refresh_seconds
+                if self._heap:
+                    until_next = (self._heap[0][0] - datetime.now()).total_seconds()
+                    timeout = max(0.0, min(timeout, until_next))
+
+            self._wake.wait(timeout)
+            self._wake.clear()
+        
+        # La conexión de este hilo no la cierra nadie más
+        conn = getattr(_local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            _local.conn = None
+
+
+subscribers = SubscriberIndex()
+
+
 def get_all_keys() -> list:
     """Obtiene todas las keys (para administración)"""
     conn = get_db_connection()
@@ -299,10 +476,5 @@ def get_all_keys() -> list:
     ''')
     
     rows = cursor.fetchall()
-    conn.close()
     
     return [dict(row) for row in rows]
-
-
-# Inicializar DB al importar el módulo
-init_db()
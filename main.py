@@ -1,13 +1,14 @@
 #!/usr/bin/env python
 """
 Scalping Engine V2 - Punto de entrada unificado
-Ejecuta el bot de Telegram y el scanner en un solo proceso
+Bot de Telegram y scanner en un solo proceso y un solo event loop:
+- El bot (python-telegram-bot) es dueño del loop y del pool HTTP
+- El scanner corre como tarea del loop; su trabajo bloqueante va a un executor
+- Las señales salen por el cliente del bot
 """
-import sys
-import threading
 import asyncio
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Configurar logging
 logging.basicConfig(
@@ -16,68 +17,145 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Segundos que se espera al scanner al apagar (el outbox guarda lo pendiente)
+SHUTDOWN_TIMEOUT = 30
+
+
+class ScannerService:
+    """Scanner como tarea del event loop del bot"""
+
+    def __init__(self):
+        self.scanner = None
+        self.task = None
+        self.preload_task = None
+        self._stopping = False
+        # Barridos y esperas de disparos (bloqueantes): un hilo dedicado
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scanner")
+
+    async def start(self, app):
+        """post_init: arranca el scanner sin retrasar el bot"""
+        self.task = asyncio.create_task(self._run(app.bot))
+        # La base de keys se abre mientras el scanner hace sus primeras llamadas
+        self.preload_task = asyncio.create_task(self._preload_subscribers())
+
+    async def stop(self, app):
+        """post_stop: detiene el scanner antes de cerrar el cliente del bot"""
+        if self.preload_task is not None and not self.preload_task.done():
+            self.preload_task.cancel()
+            try:
+                await self.preload_task
+            except asyncio.CancelledError:
+                pass
+
+        if self.task is None:
+            return
+
+        self._stopping = True
+        if self.scanner:
+            self.scanner.stop()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(self.task), timeout=SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ El scanner no terminó a tiempo")
+            self.task.cancel()
+
+        self.executor.shutdown(wait=False)
+
+    async def _preload_subscribers(self):
+        import async_db
+
+        try:
+            await async_db.run_blocking(async_db.keys_manager.subscribers.preload)
+        except Exception as e:
+            logger.error(f"❌ Error cargando suscriptores: {e}")
+
+    @staticmethod
+    def _build_scanner():
+        # El import (numpy, binance...) también va fuera del loop
+        from scanner import CryptoScanner
+        return CryptoScanner()
+
+    async def _run(self, bot):
+        logger.info("📊 Iniciando Scanner...")
+        loop = asyncio.get_running_loop()
+
+        try:
+            # La inicialización hace llamadas a Binance: fuera del loop
+            self.scanner = await loop.run_in_executor(self.executor, self._build_scanner)
+            if self._stopping:
+                return
+
+            # Señales por el cliente del bot
+            self.scanner.notifier.use_bot(bot, loop)
+
+            await self.scanner.run(self.executor)
+        except Exception as e:
+            logger.error(f"❌ Error en el scanner: {e}")
+
 
 def run_scanner():
-    """Ejecuta el scanner de criptomonedas"""
+    """Ejecuta solo el scanner (sin bot de Telegram)"""
     from scanner import CryptoScanner
-    
+
     logger.info("📊 Iniciando Scanner...")
-    time.sleep(3)  # Esperar a que el bot inicie primero
-    
     scanner = CryptoScanner()
     scanner.start()
 
 
 def run_telegram_bot():
-    """Ejecuta el bot de Telegram"""
+    """Ejecuta el bot de Telegram con el scanner en el mismo loop"""
     from telegram import Update
     from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
     from config import Config
     from bot_telegram import start_command, handle_message, handle_callback
-    
+
     logger.info("🤖 Iniciando Bot de Telegram...")
-    
-    if not Config.TELEGRAM_BOT_TOKEN:
-        logger.error("❌ TELEGRAM_BOT_TOKEN no configurado")
-        return
-    
-    # Crear aplicación
-    app = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
-    
+
+    service = ScannerService()
+
+    # Crear aplicación (pool HTTP del bot dimensionado para el envío de señales)
+    app = (
+        Application.builder()
+        .token(Config.TELEGRAM_BOT_TOKEN)
+        .base_url(f"{Config.TELEGRAM_API_BASE}/bot")
+        .connection_pool_size(Config.TELEGRAM_CONCURRENCY)
+        .pool_timeout(30)
+        .post_init(service.start)
+        .post_stop(service.stop)
+        .build()
+    )
+
     # Agregar handlers
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("menu", start_command))
     app.add_handler(CallbackQueryHandler(handle_callback))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    
+
     logger.info("✅ Bot de Telegram listo")
-    
-    # Correr el bot
+
+    # Correr el bot (Ctrl+C / SIGTERM detienen bot y scanner en orden)
     app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 def main():
     """Función principal - ejecuta ambos servicios"""
+    from config import Config
+
     print("""
     ╔══════════════════════════════════════════════════════╗
     ║     SCALPING ENGINE V2 + TELEGRAM BOT                ║
     ║     Sistema Unificado de Señales                     ║
     ╚══════════════════════════════════════════════════════╝
     """)
-    
-    # Crear hilos
-    scanner_thread = threading.Thread(target=run_scanner, name="Scanner", daemon=True)
-    bot_thread = threading.Thread(target=run_telegram_bot, name="TelegramBot")
-    
+
     try:
-        # Iniciar el scanner en segundo plano
-        scanner_thread.start()
-        logger.info("✅ Thread del Scanner iniciado")
-        
-        # El bot de Telegram corre en el hilo principal
-        # (telegram-python-bot requiere el hilo principal para señales)
-        run_telegram_bot()
-        
+        if Config.TELEGRAM_BOT_TOKEN:
+            run_telegram_bot()
+        else:
+            logger.warning("⚠️ TELEGRAM_BOT_TOKEN no configurado: solo scanner (señales por consola)")
+            run_scanner()
+
     except KeyboardInterrupt:
         logger.info("\n⛔ Deteniendo servicios...")
     except Exception as e:
@@ -0,0 +1,123 @@
+"""
+Stream de velas de Binance Futures por websocket
+Reparte cada tick de vela a los listeners registrados
+"""
+import threading
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class KlineStream:
+    """Suscripción multiplexada a <symbol>@kline_<interval>"""
+
+    # Límite de streams por conexión combinada de Futures
+    MAX_STREAMS_PER_SOCKET = 200
+
+    def __init__(self, intervals=('15m', '1h')):
+        self.intervals = tuple(intervals)
+
+        # Callbacks fn(symbol, interval, kline)
+        self.listeners = []
+
+        self._twm = None
+        self._symbols = set()
+        self._sockets = {}  # nombre de la conexión -> símbolos que lleva
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def subscribe(self, symbols):
+        """Suscribe los símbolos que aún no estén en el stream"""
+        with self._lock:
+            new_symbols = sorted(set(symbols) - self._symbols)
+            if not new_symbols:
+                return
+
+            if self._twm is None:
+                from binance import ThreadedWebsocketManager  # import pesado, solo si hay stream
+                self._twm = ThreadedWebsocketManager(Config.BINANCE_API_KEY, Config.BINANCE_SECRET_KEY)
+                self._twm.start()
+
+            self._open(new_symbols)
+            self._symbols.update(new_symbols)
+            logger.info(f"📡 Stream de velas: +{len(new_symbols)} símbolos ({len(self._symbols)} total)")
+
+    def unsubscribe(self, symbols):
+        """
+        Quita símbolos del stream: las conexiones que los llevaban se
+        cierran y el resto de sus símbolos se vuelve a abrir
+        """
+        with self._lock:
+            gone = set(symbols) & self._symbols
+            if not gone or self._twm is None:
+                return
+
+            reopen = []
+            for name, members in list(self._sockets.items()):
+                if members & gone:
+                    self._twm.stop_socket(name)
+                    del self._sockets[name]
+                    reopen.extend(members - gone)
+
+            self._symbols -= gone
+            if reopen:
+                self._open(sorted(reopen))
+            logger.info(f"📡 Stream de velas: -{len(gone)} símbolos ({len(self._symbols)} total)")
+
+    @property
+    def symbols(self) -> set:
+        with self._lock:
+            return set(self._symbols)
+
+    def _open(self, symbols: list):
+        """Abre conexiones combinadas para `symbols` (todos sus intervalos en la misma)"""
+        per_socket = max(1, self.MAX_STREAMS_PER_SOCKET // len(self.intervals))
+        for i in range(0, len(symbols), per_socket):
+            chunk = symbols[i:i + per_socket]
+            streams = [
+                f"{symbol.lower()}@kline_{interval}"
+                for symbol in chunk
+                for interval in self.intervals
+            ]
+            name = self._twm.start_futures_multiplex_socket(callback=self._handle_message, streams=streams)
+            self._sockets[name] = set(chunk)
+
+    def stop(self):
+        """Cierra todas las conexiones"""
+        with self._lock:
+            if self._twm is not None:
+                self._twm.stop()
+            self._twm = None
+            self._sockets = {}
+            self._symbols = set()
+
+    def _handle_message(self, msg):
+        data = msg.get('data', msg)
+
+        if data.get('e') == 'error':
+            logger.warning(f"⚠️ Error en stream de velas: {data.get('m')}")
+            return
+
+        if data.get('e') != 'kline':
+            return
+
+        k = data['k']
+        kline = {
+            'timestamp': int(k['t']),
+            'open': float(k['o']),
+            'high': float(k['h']),
+            'low': float(k['l']),
+            'close': float(k['c']),
+            'volume': float(k['v']),
+            'close_time': int(k['T']),
+            'closed': bool(k['x']),
+        }
+
+        for listener in self.listeners:
+            try:
+                listener(data['s'], k['i'], kline)
+            except Exception as e:
+                logger.error(f"Error en listener de velas: {e}")
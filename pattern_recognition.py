@@ -3,79 +3,219 @@ Reconocimiento de Patrones de Precio
 Detecta triángulos, cuñas, canales, doble techo/suelo, etc.
 """
 import numpy as np
-import pandas as pd
-from scipy.signal import argrelextrema
 import logging
+from candles import df_to_arrays
+from rolling_regression import linear_fit, rolling_regression
+from swing_points import SwingPoints, argrelextrema
 
 logger = logging.getLogger(__name__)
 
 
+# Patrones de velas: nombre -> patrón que se reporta (orden de evaluación)
+CANDLE_PATTERNS = {
+    'ENGULFING_BULLISH': {
+        'type': 'ENGULFING_BULLISH',
+        'direction': 'BULLISH',
+        'confidence': 80,
+        'description': 'Envolvente alcista - posible reversión al alza'
+    },
+    'ENGULFING_BEARISH': {
+        'type': 'ENGULFING_BEARISH',
+        'direction': 'BEARISH',
+        'confidence': 80,
+        'description': 'Envolvente bajista - posible reversión a la baja'
+    },
+    'HAMMER': {
+        'type': 'HAMMER',
+        'direction': 'BULLISH',
+        'confidence': 75,
+        'description': 'Martillo - señal de reversión alcista'
+    },
+    'SHOOTING_STAR': {
+        'type': 'SHOOTING_STAR',
+        'direction': 'BEARISH',
+        'confidence': 75,
+        'description': 'Estrella fugaz - señal de reversión bajista'
+    },
+    'DOJI': {
+        'type': 'DOJI',
+        'direction': 'NEUTRAL',
+        'confidence': 60,
+        'description': 'Doji - indecisión, posible cambio de tendencia'
+    },
+}
+
+
+def candle_patterns(opens, highs, lows, closes) -> dict:
+    """
+    Patrones de velas de cada vela de un historial (para entrenamiento y
+    backtests; el análisis en vivo lee el último elemento)
+    
+    Args:
+        opens, highs, lows, closes: arrays 1D (velas) o 2D (símbolos x velas)
+    
+    Returns:
+        dict nombre de CANDLE_PATTERNS -> array booleano de la misma forma
+        (los envolventes miran la vela anterior: False en la primera)
+    """
+    opens, highs, lows, closes = (np.asarray(a, dtype=float) for a in (opens, highs, lows, closes))
+    
+    body = np.abs(closes - opens)
+    candle_range = highs - lows
+    green = closes > opens
+    red = closes < opens
+    
+    # === ENGULFING ===
+    # Vela de un color seguida de otra del contrario que la "envuelve"
+    # (cada vela contra la anterior; la primera no tiene anterior)
+    prev_open, prev_close = opens[..., :-1], closes[..., :-1]
+    cur_open, cur_close = opens[..., 1:], closes[..., 1:]
+    engulfing_bullish = np.zeros(opens.shape, dtype=bool)
+    engulfing_bearish = np.zeros(opens.shape, dtype=bool)
+    engulfing_bullish[..., 1:] = (red[..., :-1] & green[..., 1:]
+                                  & (cur_open < prev_close) & (cur_close > prev_open))
+    engulfing_bearish[..., 1:] = (green[..., :-1] & red[..., 1:]
+                                  & (cur_open > prev_close) & (cur_close < prev_open))
+    
+    # === HAMMER / SHOOTING STAR ===
+    # Cuerpo pequeño en un extremo, sombra larga en el otro
+    ranged = candle_range > 0
+    lower_shadow = np.minimum(opens, closes) - lows
+    upper_shadow = highs - np.maximum(opens, closes)
+    small_body = body < candle_range * 0.3
+    hammer = (ranged & (lower_shadow > body * 2) & (upper_shadow < body * 0.5) & small_body)
+    shooting_star = (ranged & (upper_shadow > body * 2) & (lower_shadow < body * 0.5) & small_body)
+    
+    # === DOJI ===
+    # Cuerpo muy pequeño (apertura ≈ cierre)
+    body_ratio = np.divide(body, candle_range, out=np.ones(body.shape), where=ranged)
+    doji = body_ratio < 0.1
+    
+    return {
+        'ENGULFING_BULLISH': engulfing_bullish,
+        'ENGULFING_BEARISH': engulfing_bearish,
+        'HAMMER': hammer,
+        'SHOOTING_STAR': shooting_star,
+        'DOJI': doji,
+    }
+
+
 class PatternRecognizer:
     """Detecta patrones técnicos en datos de precio"""
     
     def __init__(self):
         self.patterns_found = []
+        
+        # Pivotes incrementales por símbolo (ver find_patterns)
+        self.swings = SwingPoints()
     
-    def find_all_patterns(self, df: pd.DataFrame) -> list:
+    def find_all_patterns(self, df) -> list:
         """
         Busca todos los patrones en un DataFrame de velas
+        (adaptador sobre find_patterns)
         
         Args:
             df: DataFrame con columnas: open, high, low, close, volume
         
+        Returns:
+            Lista de patrones encontrados con su tipo y confianza
+        """
+        return self.find_patterns(df_to_arrays(df))
+    
+    def find_patterns(self, candles: dict, symbol: str = None) -> list:
+        """
+        Busca todos los patrones sobre arrays de numpy (camino rápido)
+        
+        Args:
+            candles: dict con arrays open, high, low, close, volume
+                (y timestamp; la última vela es la vela en curso)
+            symbol: si se indica, los pivotes salen del detector
+                incremental del símbolo en vez de recalcularse
+        
         Returns:
             Lista de patrones encontrados con su tipo y confianza
         """
         patterns = []
         
-        if len(df) < 50:
+        if len(candles['close']) < 50:
             return patterns
         
+        opens = candles['open']
+        highs = candles['high']
+        lows = candles['low']
+        closes = candles['close']
+        
         # Encontrar soportes y resistencias
-        support, resistance = self._find_support_resistance(df)
+        support, resistance = self._find_support_resistance(
+            highs, lows, self._swing_points(candles, 5, 0, symbol)
+        )
         
         # Detectar patrones de precio
-        patterns.extend(self._detect_triangle(df))
-        patterns.extend(self._detect_double_top_bottom(df, support, resistance))
-        patterns.extend(self._detect_channel(df))
+        patterns.extend(self._detect_triangle(highs, lows))
+        recent = self._swing_points(candles, 3, max(0, len(closes) - 30), symbol)
+        patterns.extend(self._detect_double_top_bottom(highs, lows, closes, support, resistance, recent))
+        patterns.extend(self._detect_channel(closes))
         
         # Detectar patrones de velas
-        patterns.extend(self._detect_candle_patterns(df))
+        patterns.extend(self._detect_candle_patterns(opens, highs, lows, closes))
         
         return patterns
     
-    def _find_support_resistance(self, df: pd.DataFrame, order=5):
-        """Encuentra niveles de soporte y resistencia"""
-        highs = df['high'].values
-        lows = df['low'].values
+    @staticmethod
+    def regression_features(candles: dict, window: int = 20) -> dict:
+        """
+        Pendientes y R² de triángulo/canal para cada vela del historial
+        (features para entrenamiento, ver ai_feature_calculator; la última
+        fila coincide con lo que ven _detect_triangle y _detect_channel)
         
-        # Encontrar máximos y mínimos locales
-        local_max_idx = argrelextrema(highs, np.greater, order=order)[0]
-        local_min_idx = argrelextrema(lows, np.less, order=order)[0]
+        Returns:
+            dict de arrays de len(close): high_slope, low_slope,
+            close_slope, close_r2 (NaN en las primeras window-1 velas)
+        """
+        high_slope = rolling_regression(candles['high'], window)[0]
+        low_slope = rolling_regression(candles['low'], window)[0]
+        close_slope, _, close_r2 = rolling_regression(candles['close'], window)
+        return {
+            'high_slope': high_slope,
+            'low_slope': low_slope,
+            'close_slope': close_slope,
+            'close_r2': close_r2,
+        }
+    
+    def _swing_points(self, candles: dict, order: int, start: int, symbol: str = None) -> tuple:
+        """
+        Máximos locales de highs y mínimos de lows de candles[start:]
+        (índices relativos a start, iguales a los de argrelextrema)
+        """
+        if symbol and 'timestamp' in candles:
+            return self.swings.pivots(symbol, candles, order, start)
+        return (argrelextrema(candles['high'][start:], np.greater, order=order),
+                argrelextrema(candles['low'][start:], np.less, order=order))
+    
+    def _find_support_resistance(self, highs: np.ndarray, lows: np.ndarray, swing_points: tuple):
+        """Encuentra niveles de soporte y resistencia"""
+        # Máximos y mínimos locales (order=5 sobre toda la ventana)
+        local_max_idx, local_min_idx = swing_points
         
         resistance_levels = highs[local_max_idx] if len(local_max_idx) > 0 else []
         support_levels = lows[local_min_idx] if len(local_min_idx) > 0 else []
         
         return support_levels, resistance_levels
     
-    def _detect_triangle(self, df: pd.DataFrame) -> list:
+    def _detect_triangle(self, highs: np.ndarray, lows: np.ndarray) -> list:
         """Detecta patrones de triángulo (ascendente, descendente, simétrico)"""
         patterns = []
         
-        if len(df) < 20:
+        if len(highs) < 20:
             return patterns
         
         # Usar últimas 20 velas
-        recent = df.tail(20)
-        highs = recent['high'].values
-        lows = recent['low'].values
+        highs = highs[-20:]
+        lows = lows[-20:]
         
-        # Calcular pendientes de máximos y mínimos
-        x = np.arange(len(highs))
-        
-        # Regresión lineal de máxitos
-        high_slope = np.polyfit(x, highs, 1)[0]
-        low_slope = np.polyfit(x, lows, 1)[0]
+        # Pendientes de máximos y mínimos (regresión lineal en forma cerrada)
+        high_slope = linear_fit(highs)[0]
+        low_slope = linear_fit(lows)[0]
         
         # Triángulo ascendente: mínimos subiendo, máximos planos
         if low_slope > 0.001 and abs(high_slope) < 0.001:
@@ -106,20 +246,22 @@ class PatternRecognizer:
         
         return patterns
     
-    def _detect_double_top_bottom(self, df: pd.DataFrame, support, resistance) -> list:
+    def _detect_double_top_bottom(self, highs: np.ndarray, lows: np.ndarray,
+                                  closes: np.ndarray, support, resistance, swing_points: tuple) -> list:
         """Detecta doble techo y doble suelo"""
         patterns = []
         
-        if len(df) < 30:
+        if len(highs) < 30:
             return patterns
         
-        recent = df.tail(30)
-        highs = recent['high'].values
-        lows = recent['low'].values
-        current_price = recent['close'].iloc[-1]
+        highs = highs[-30:]
+        lows = lows[-30:]
+        current_price = closes[-1]
+        
+        # Máximos y mínimos locales de las últimas 30 velas (order=3)
+        local_max_idx, local_min_idx = swing_points
         
         # Buscar doble techo (dos máximos similares)
-        local_max_idx = argrelextrema(highs, np.greater, order=3)[0]
         if len(local_max_idx) >= 2:
             last_two_highs = highs[local_max_idx[-2:]]
             if abs(last_two_highs[0] - last_two_highs[1]) / last_two_highs[0] < 0.02:
@@ -131,7 +273,6 @@ class PatternRecognizer:
                 })
         
         # Buscar doble suelo (dos mínimos similares)
-        local_min_idx = argrelextrema(lows, np.less, order=3)[0]
         if len(local_min_idx) >= 2:
             last_two_lows = lows[local_min_idx[-2:]]
             if abs(last_two_lows[0] - last_two_lows[1]) / last_two_lows[0] < 0.02:
@@ -144,25 +285,15 @@ class PatternRecognizer:
         
         return patterns
     
-    def _detect_channel(self, df: pd.DataFrame) -> list:
+    def _detect_channel(self, closes: np.ndarray) -> list:
         """Detecta canales de precio (alcista, bajista, lateral)"""
         patterns = []
         
-        if len(df) < 20:
+        if len(closes) < 20:
             return patterns
         
-        recent = df.tail(20)
-        closes = recent['close'].values
-        x = np.arange(len(closes))
-        
-        # Calcular pendiente
-        slope, intercept = np.polyfit(x, closes, 1)
-        
-        # Calcular R² para ver qué tan bien sigue el canal
-        predicted = slope * x + intercept
-        ss_res = np.sum((closes - predicted) ** 2)
-        ss_tot = np.sum((closes - np.mean(closes)) ** 2)
-        r_squared = 1 - (ss_res / ss_tot) if ss_tot > 0 else 0
+        # Pendiente y R² (qué tan bien sigue el canal) de las mismas sumas
+        slope, _, r_squared = linear_fit(closes[-20:])
         
         if r_squared > 0.7:  # Canal bien definido
             if slope > 0.001:
@@ -189,92 +320,19 @@ class PatternRecognizer:
         
         return patterns
     
-    def _detect_candle_patterns(self, df: pd.DataFrame) -> list:
-        """Detecta patrones de velas japonesas"""
+    def _detect_candle_patterns(self, opens: np.ndarray, highs: np.ndarray,
+                                lows: np.ndarray, closes: np.ndarray) -> list:
+        """Detecta patrones de velas japonesas en la última vela"""
         patterns = []
         
-        if len(df) < 5:
+        if len(closes) < 5:
             return patterns
         
-        # Últimas 3 velas
-        c1 = df.iloc[-3]  # Hace 2 velas
-        c2 = df.iloc[-2]  # Vela anterior
-        c3 = df.iloc[-1]  # Última vela
-        
-        # Tamaño del cuerpo
-        body_c2 = abs(c2['close'] - c2['open'])
-        body_c3 = abs(c3['close'] - c3['open'])
-        
-        # Rango total
-        range_c2 = c2['high'] - c2['low']
-        range_c3 = c3['high'] - c3['low']
-        
-        # === ENGULFING ALCISTA ===
-        # Vela roja seguida de vela verde que la "envuelve"
-        if (c2['close'] < c2['open'] and  # c2 roja
-            c3['close'] > c3['open'] and  # c3 verde
-            c3['open'] < c2['close'] and  # c3 abre debajo del cierre de c2
-            c3['close'] > c2['open']):    # c3 cierra arriba de apertura de c2
-            patterns.append({
-                'type': 'ENGULFING_BULLISH',
-                'direction': 'BULLISH',
-                'confidence': 80,
-                'description': 'Envolvente alcista - posible reversión al alza'
-            })
-        
-        # === ENGULFING BAJISTA ===
-        if (c2['close'] > c2['open'] and  # c2 verde
-            c3['close'] < c3['open'] and  # c3 roja
-            c3['open'] > c2['close'] and  # c3 abre arriba del cierre de c2
-            c3['close'] < c2['open']):    # c3 cierra debajo de apertura de c2
-            patterns.append({
-                'type': 'ENGULFING_BEARISH',
-                'direction': 'BEARISH',
-                'confidence': 80,
-                'description': 'Envolvente bajista - posible reversión a la baja'
-            })
-        
-        # === HAMMER (Martillo) ===
-        # Cuerpo pequeño arriba, sombra inferior larga
-        if range_c3 > 0:
-            lower_shadow = min(c3['open'], c3['close']) - c3['low']
-            upper_shadow = c3['high'] - max(c3['open'], c3['close'])
-            
-            if (lower_shadow > body_c3 * 2 and 
-                upper_shadow < body_c3 * 0.5 and
-                body_c3 < range_c3 * 0.3):
-                patterns.append({
-                    'type': 'HAMMER',
-                    'direction': 'BULLISH',
-                    'confidence': 75,
-                    'description': 'Martillo - señal de reversión alcista'
-                })
-        
-        # === SHOOTING STAR (Estrella fugaz) ===
-        # Cuerpo pequeño abajo, sombra superior larga
-        if range_c3 > 0:
-            lower_shadow = min(c3['open'], c3['close']) - c3['low']
-            upper_shadow = c3['high'] - max(c3['open'], c3['close'])
-            
-            if (upper_shadow > body_c3 * 2 and 
-                lower_shadow < body_c3 * 0.5 and
-                body_c3 < range_c3 * 0.3):
-                patterns.append({
-                    'type': 'SHOOTING_STAR',
-                    'direction': 'BEARISH',
-                    'confidence': 75,
-                    'description': 'Estrella fugaz - señal de reversión bajista'
-                })
-        
-        # === DOJI ===
-        # Cuerpo muy pequeño (apertura ≈ cierre)
-        if range_c3 > 0 and body_c3 / range_c3 < 0.1:
-            patterns.append({
-                'type': 'DOJI',
-                'direction': 'NEUTRAL',
-                'confidence': 60,
-                'description': 'Doji - indecisión, posible cambio de tendencia'
-            })
+        # Mismo detector que sobre el historial, con las 2 últimas velas
+        flags = candle_patterns(opens[-2:], highs[-2:], lows[-2:], closes[-2:])
+        for name, pattern in CANDLE_PATTERNS.items():
+            if flags[name][-1]:
+                patterns.append(dict(pattern))
         
         return patterns
     
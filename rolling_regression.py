@@ -0,0 +1,99 @@
+"""
+Regresión lineal en ventana deslizante
+Pendiente, ordenada y R² a partir de Σy, Σxy y Σy² (x = 0..n-1 dentro de
+la ventana, así Σx y Σx² son constantes): una ventana suelta (linear_fit,
+triángulo/canal en vivo) o, con sumas acumuladas, todas las ventanas de un
+historial completo (features por vela para entrenamiento y backtests)
+
+Los valores se centran restando un offset antes de sumar: con precios
+grandes Σy² y (Σy)² casi se cancelan y sin centrar se pierde el R².
+"""
+import numpy as np
+
+# Ventanas por bloque en rolling_regression: acota el tamaño de las sumas
+# acumuladas (y su error de redondeo) en historiales largos
+BLOCK = 2048
+
+
+def _fit(n: int, sy, sxy, syy):
+    """
+    Pendiente, ordenada (sobre los valores centrados) y R² desde las sumas
+
+    Acepta escalares o arrays. R² = correlación² (igual a 1 - SSres/SStot
+    en mínimos cuadrados con ordenada); 0 si la ventana es plana.
+    """
+    sx = n * (n - 1) / 2
+    sxx = (n - 1) * n * (2 * n - 1) / 6
+    var_x = n * sxx - sx * sx
+    cov = n * sxy - sx * sy
+    var_y = n * syy - sy * sy
+
+    slope = cov / var_x
+    intercept = (sy - slope * sx) / n
+
+    flat = var_y <= 1e-12 * n * syy
+    if np.ndim(flat) == 0:
+        # Una sola ventana: sin np.where (es la mayor parte del coste)
+        r2 = 0.0 if flat else min(1.0, max(0.0, cov * cov / (var_x * var_y)))
+        return slope, intercept, r2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(flat, 0.0, cov * cov / (var_x * np.where(flat, 1.0, var_y)))
+    return slope, intercept, np.clip(r2, 0.0, 1.0)
+
+
+def linear_fit(y: np.ndarray) -> tuple:
+    """
+    Regresión de una ventana (sustituto de np.polyfit(x, y, 1) + R²)
+
+    Returns:
+        (slope, intercept, r_squared) como floats
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    offset = y.mean()
+    d = y - offset
+    slope, intercept, r2 = _fit(n, d.sum(), np.arange(n) @ d, d @ d)
+    return float(slope), float(intercept) + offset, float(r2)
+
+
+def rolling_regression(y: np.ndarray, window: int) -> tuple:
+    """
+    Regresión de cada ventana de `window` valores a lo largo de `y`
+
+    Returns:
+        (slope, intercept, r_squared): arrays de len(y) alineados con la
+        última vela de cada ventana (NaN en las primeras window-1); la
+        ordenada es el valor ajustado en la primera vela de la ventana
+    """
+    y = np.asarray(y, dtype=float)
+    total = len(y)
+    out = np.full((3, total), np.nan)
+    starts = total - window + 1
+    if window < 2 or starts <= 0:
+        return out[0], out[1], out[2]
+
+    for first in range(0, starts, BLOCK):
+        last = min(first + BLOCK, starts)  # ventanas que empiezan en [first, last)
+        segment = y[first:last + window - 1]
+        offset = segment.mean()
+        d = segment - offset
+
+        # Sumas acumuladas con índice local del bloque
+        sum_y = np.concatenate(([0.0], np.cumsum(d)))
+        sum_iy = np.concatenate(([0.0], np.cumsum(np.arange(len(d)) * d)))
+        sum_yy = np.concatenate(([0.0], np.cumsum(d * d)))
+
+        s = np.arange(last - first)
+        e = s + window
+        sy = sum_y[e] - sum_y[s]
+        sxy = (sum_iy[e] - sum_iy[s]) - s * sy  # x relativo al inicio de la ventana
+        syy = sum_yy[e] - sum_yy[s]
+
+        slope, intercept, r2 = _fit(window, sy, sxy, syy)
+        rows = slice(first + window - 1, last + window - 1)
+        out[0, rows] = slope
+        out[1, rows] = intercept + offset
+        out[2, rows] = r2
+
+    return out[0], out[1], out[2]
+
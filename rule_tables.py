@@ -0,0 +1,120 @@
+"""
+Escaleras de interpretación como datos
+Umbrales, señales, confianzas y textos en rules.json (ajustables sin tocar
+código); cada valor se resuelve con bisect sobre los breakpoints
+"""
+import bisect
+import json
+import numpy as np
+from pathlib import Path
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+RULES_PATH = Path(__file__).parent / 'rules.json'
+
+
+class RuleTable:
+    """
+    Escalera de umbrales: breakpoints ordenados que parten la recta en
+    bandas, cada banda con señal, confianza y texto
+
+    Cada breakpoint es [op, valor]: se pasa a la banda siguiente si
+    `x op valor` (">=" o ">"). Los ">" se convierten con np.nextafter al
+    siguiente float, así todos son ">=" y basta bisect_right.
+    Los NaN van a la banda `default` (el else de la escalera original).
+    Los textos sin campos se devuelven ya hechos; solo se formatean las
+    plantillas ({value}, {long_pct:.0f}...).
+    """
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.bands = spec['bands']
+        self.default = spec.get('default', 0)
+
+        edges = []
+        for op, value in spec['breakpoints']:
+            if op == '>':
+                value = float(np.nextafter(float(value), np.inf))
+            elif op != '>=':
+                raise ValueError(f"{name}: operador no soportado {op!r}")
+            edges.append(float(value))
+
+        if len(self.bands) != len(edges) + 1:
+            raise ValueError(f"{name}: {len(edges)} breakpoints necesitan {len(edges) + 1} bandas")
+        if any(b < a for a, b in zip(edges, edges[1:])):
+            raise ValueError(f"{name}: breakpoints desordenados")
+
+        self._edges = edges
+        # Por banda: (texto, señal, confianza) ya hecho si el texto no tiene campos,
+        # si no None y lookup formatea la plantilla
+        self._static = [
+            None if '{' in band['text'] else (band['text'], band['signal'], band['confidence'])
+            for band in self.bands
+        ]
+
+    def lookup(self, value: float, **fields) -> tuple:
+        """
+        Un valor: (interpretación, señal, confianza)
+
+        Args:
+            fields: campos extra para el texto de la banda (p. ej. long_pct)
+        """
+        index = bisect.bisect_right(self._edges, value) if value == value else self.default
+        resolved = self._static[index]
+        if resolved is not None:
+            return resolved
+
+        band = self.bands[index]
+        fields['value'] = value
+        return band['text'].format_map(fields), band['signal'], band['confidence']
+
+
+class Rules:
+    """Tablas y parámetros de consolidación cargados de rules.json"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or Config.RULES_FILE or RULES_PATH)
+        with open(self.path, encoding='utf-8') as f:
+            spec = json.load(f)
+
+        self.funding = RuleTable('funding_rate', spec['funding_rate'])
+        self.open_interest = RuleTable('open_interest_change', spec['open_interest_change'])
+        self.long_short = RuleTable('long_short_ratio', spec['long_short_ratio'])
+        self.volume = RuleTable('volume_ratio', spec['volume_ratio'])
+
+        futures = spec['futures_consolidation']
+        self.futures_min_score = futures['min_score']
+        self.futures_max_confidence = futures['max_confidence']
+
+        final = spec['signal_consolidation']
+        self.signal_base = final['base']
+        self.signal_divisor = final['divisor']
+        self.signal_max_confidence = final['max_confidence']
+
+    def consolidate_futures(self, bullish, bearish):
+        """
+        Señal de Futures a partir de los scores de cada lado (escalares o arrays)
+
+        Returns:
+            (longs, shorts, confidence): máscaras booleanas y confianza
+        """
+        bullish = np.asarray(bullish)
+        bearish = np.asarray(bearish)
+        longs = (bullish > bearish) & (bullish >= self.futures_min_score)
+        shorts = (bearish > bullish) & (bearish >= self.futures_min_score)
+        confidence = np.where(longs, np.minimum(bullish, self.futures_max_confidence),
+                              np.where(shorts, np.minimum(bearish, self.futures_max_confidence), 0))
+        return longs, shorts, confidence
+
+    def signal_confidence(self, total_score):
+        """Confianza final (normalizada, con tope) de un score o un array de scores"""
+        total_score = np.asarray(total_score)
+        confidence = np.minimum(self.signal_max_confidence,
+                                np.trunc(total_score / self.signal_divisor) + self.signal_base)
+        return np.where(total_score > 0, confidence, 0).astype(int)
+
+
+# Cargadas una vez (reiniciar para aplicar cambios en rules.json)
+rules = Rules()
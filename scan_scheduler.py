@@ -0,0 +1,128 @@
+"""
+Planificador de escaneo por niveles de prioridad
+Los símbolos líquidos, volátiles o cerca del umbral se analizan cada ciclo;
+el resto cada N ciclos
+"""
+import zlib
+import numpy as np
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+HOT = 'HOT'
+WARM = 'WARM'
+COLD = 'COLD'
+
+
+class TierScheduler:
+    """Asigna un nivel a cada símbolo y decide cuáles tocan en cada ciclo"""
+
+    # Percentil de actividad (liquidez + volatilidad) para cada nivel
+    HOT_ACTIVITY = 0.8
+    WARM_ACTIVITY = 0.4
+
+    def __init__(self, min_confidence: int = 70):
+        self.min_confidence = min_confidence
+        self.score_margin = Config.TIER_SCORE_MARGIN
+        self.every = {
+            HOT: 1,
+            WARM: max(1, Config.TIER_WARM_EVERY),
+            COLD: max(1, Config.TIER_COLD_EVERY),
+        }
+
+        self.cycle = 0
+        self.tiers = {}         # symbol -> nivel actual
+        self.last_scores = {}   # symbol -> confianza del último análisis
+        self._market = {}       # symbol -> (quote_volume, |cambio 24h %|)
+
+    def update_market(self, tickers: list):
+        """Liquidez y volatilidad desde futures_ticker (ya descargado)"""
+        for t in tickers:
+            try:
+                self._market[t['symbol']] = (
+                    float(t['quoteVolume']),
+                    abs(float(t.get('priceChangePercent', 0))),
+                )
+            except (KeyError, ValueError):
+                continue
+
+    def record(self, analysis: dict):
+        """Guarda qué tan cerca quedó el símbolo del umbral de señal"""
+        score = analysis['confidence']
+        if analysis.get('signal'):
+            score = max(score, self.min_confidence)
+        self.last_scores[analysis['symbol']] = score
+
+    def export_state(self) -> dict:
+        return {'cycle': self.cycle, 'last_scores': dict(self.last_scores)}
+
+    def load_state(self, state: dict):
+        """Restaura ciclo y últimas confianzas (los niveles se recalculan en plan)"""
+        self.cycle = state.get('cycle', self.cycle)
+        self.last_scores.update(state.get('last_scores', {}))
+
+    def plan(self, symbols: list) -> list:
+        """
+        Reasigna niveles y devuelve los símbolos que tocan este ciclo
+        (primero los HOT)
+        """
+        self.cycle += 1
+        new_tiers = self._assign(symbols)
+
+        changes = [s for s, tier in new_tiers.items() if self.tiers.get(s) not in (None, tier)]
+        for symbol in changes:
+            logger.debug(f"🔀 {symbol}: {self.tiers[symbol]} → {new_tiers[symbol]}")
+        self.tiers = new_tiers
+
+        due = [s for s in symbols if self._is_due(s, new_tiers[s])]
+        order = {HOT: 0, WARM: 1, COLD: 2}
+        due.sort(key=lambda s: order[new_tiers[s]])
+
+        counts = {tier: 0 for tier in (HOT, WARM, COLD)}
+        for tier in new_tiers.values():
+            counts[tier] += 1
+        logger.info(
+            f"🔥 Niveles: {counts[HOT]} hot / {counts[WARM]} warm (cada {self.every[WARM]}) / "
+            f"{counts[COLD]} cold (cada {self.every[COLD]}) - {len(changes)} cambios, "
+            f"{len(due)} a analizar en el ciclo {self.cycle}"
+        )
+        return due
+
+    def _assign(self, symbols: list) -> dict:
+        if not symbols:
+            return {}
+
+        market = np.array([self._market.get(s, (0.0, 0.0)) for s in symbols], dtype=float)
+
+        # Percentiles de liquidez y volatilidad dentro del universo
+        activity = (self._percentile(market[:, 0]) + self._percentile(market[:, 1])) / 2
+
+        tiers = {}
+        for symbol, act in zip(symbols, activity):
+            score = self.last_scores.get(symbol)
+            near_threshold = score is not None and score >= self.min_confidence - self.score_margin
+
+            if near_threshold or act >= self.HOT_ACTIVITY:
+                tiers[symbol] = HOT
+            elif act >= self.WARM_ACTIVITY or symbol not in self.last_scores:
+                # Sin historial: al menos WARM hasta tener un primer análisis
+                tiers[symbol] = WARM
+            else:
+                tiers[symbol] = COLD
+        return tiers
+
+    def _is_due(self, symbol: str, tier: str) -> bool:
+        every = self.every[tier]
+        if every == 1 or symbol not in self.last_scores:
+            return True
+        # Desfase estable por símbolo para repartir los COLD entre ciclos
+        offset = zlib.crc32(symbol.encode()) % every
+        return (self.cycle + offset) % every == 0
+
+    @staticmethod
+    def _percentile(values: np.ndarray) -> np.ndarray:
+        if len(values) <= 1:
+            return np.ones(len(values))
+        ranks = np.argsort(np.argsort(values, kind='stable'), kind='stable')
+        return ranks / (len(values) - 1)
@@ -3,11 +3,17 @@ Escáner principal con IA avanzada
 Analiza todas las criptomonedas de Futures en tiempo real
 """
 import time
+import asyncio
+import threading
 import logging
 from ai_analyzer import AIAnalyzer
 from signal_generator import SignalGenerator
 from telegram_notifier import TelegramNotifier
 from signal_tracker import SignalTracker
+from triggers import TriggerQueue, SpikeTrigger, LatencyStats, OpenInterestPoller
+from shard_coordinator import ScanCoordinator
+from signal_dispatcher import SignalDispatcher
+from state_snapshot import StateSnapshot
 from config import Config
 
 # Configurar logging
@@ -18,6 +24,27 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def print_analysis(analysis: dict):
+    """Muestra un análisis por consola"""
+    print(f"\n{'='*60}")
+    print(f"📊 ANÁLISIS DE {analysis['symbol']}")
+    print(f"{'='*60}")
+    print(f"💰 Precio: ${analysis['price']:,.4f}")
+    print(f"📈 Señal: {analysis['signal'] or 'NINGUNA'}")
+    print(f"📊 Confianza: {analysis['confidence']}%")
+    
+    if analysis['reasons']:
+        print(f"\n¿Por qué?")
+        for r in analysis['reasons']:
+            print(f"  {r}")
+    
+    print(f"{'='*60}\n")
+
+
+class ScanStopped(Exception):
+    """El barrido se interrumpe porque se pidió detener el escáner"""
+
+
 class CryptoScanner:
     def __init__(self):
         """Inicializa el escáner con IA"""
@@ -31,74 +58,255 @@ class CryptoScanner:
         self.notifier = TelegramNotifier()
         self.tracker = SignalTracker()
         
+        # Envío en segundo plano: el escaneo no espera a Telegram
+        self.dispatcher = SignalDispatcher(self.notifier)
+        
+        # Disparadores: símbolos a re-analizar por delante del barrido
+        self.triggers = TriggerQueue()
+        self.spike_trigger = SpikeTrigger(self.triggers)
+        self.trigger_latency = LatencyStats()
+        self.analyzer.volume_analyzer.stats.spike_listeners.append(self.spike_trigger.on_volume_spike)
+        self.analyzer.futures_analyzer.oi_listeners.append(self.spike_trigger.on_open_interest)
+        if self.analyzer.stream:
+            self.analyzer.stream.add_listener(self.spike_trigger.on_kline)
+        
+        # OI del universo entre barridos (si no, los saltos solo se ven al analizar)
+        self.oi_poller = None
+        if Config.TRIGGER_OI_POLL_SECONDS > 0:
+            self.oi_poller = OpenInterestPoller(self.analyzer.futures_analyzer, lambda: self.analyzer.universe)
+        
+        # Escaneo repartido: los workers analizan, aquí se envía y se aplica cooldown
+        self.coordinator = None
+        if Config.SCAN_WORKERS > 0 or Config.SHARD_COORDINATOR:
+            self.coordinator = ScanCoordinator(
+                local_workers=Config.SCAN_WORKERS,
+                fallback=self.analyzer.analyze_symbol
+            )
+        
+        # Estado en memoria en disco: al reiniciar solo se descarga el hueco
+        self.snapshot = StateSnapshot() if Config.SNAPSHOT_ENABLED else None
+        self._last_snapshot = time.monotonic()
+        
+        self._stop = threading.Event()
+        
         logger.info("✅ Escáner con IA inicializado correctamente")
     
     def start(self):
-        """Inicia el escaneo continuo con IA"""
-        logger.info("🔍 Iniciando escaneo con IA...")
-        
-        # Mostrar estadísticas
-        stats = self.tracker.get_stats()
-        logger.info(f"📈 Señales enviadas: {stats['total']} (LONG: {stats['longs']}, SHORT: {stats['shorts']})")
+        """Inicia el escaneo continuo con IA (bloqueante, modo independiente)"""
+        self._startup()
         
         # Loop principal
         scan_count = 0
-        while True:
+        while not self._stop.is_set():
             try:
                 scan_count += 1
-                logger.info(f"\n{'='*60}")
-                logger.info(f"🔄 Escaneo #{scan_count} con IA")
-                logger.info(f"{'='*60}")
-                
-                # Escanear todos los pares con IA
-                signals = self.analyzer.scan_all_pairs()
-                
-                signals_sent = 0
-                for analysis in signals:
-                    symbol = analysis['symbol']
-                    
-                    # Verificar cooldown
-                    if not self.tracker.can_send_signal(symbol):
-                        continue
-                    
-                    # Solo señales con buena confianza
-                    if analysis['confidence'] >= 70:
-                        logger.info(f"🎯 SEÑAL: {symbol} {analysis['signal']} ({analysis['confidence']}%)")
-                        
-                        # Generar mensaje
-                        message = SignalGenerator.generate_message(analysis)
-                        
-                        # Enviar
-                        self.notifier.send_signal_sync(message)
-                        
-                        # Registrar
-                        self.tracker.register_signal(
-                            symbol,
-                            analysis['signal'],
-                            analysis['price']
-                        )
-                        
-                        signals_sent += 1
-                        
-                        # Pausa entre señales
-                        time.sleep(1)
-                
-                logger.info(f"\n✅ Escaneo #{scan_count} completado")
-                logger.info(f"🎯 Señales enviadas: {signals_sent}")
-                logger.info(f"⏰ Próximo escaneo en {Config.SCAN_INTERVAL_SECONDS}s...\n")
-                
-                time.sleep(Config.SCAN_INTERVAL_SECONDS)
+                self.scan_once(scan_count)
+                self._wait_for_next_scan(Config.SCAN_INTERVAL_SECONDS)
                 
             except KeyboardInterrupt:
                 logger.info("\n\n⛔ Deteniendo escáner...")
                 break
+            except ScanStopped:
+                break
             except Exception as e:
                 logger.error(f"❌ Error en el loop: {e}")
                 logger.info("⏰ Reintentando en 10 segundos...")
-                time.sleep(10)
+                self._stop.wait(10)
+        
+        self.shutdown()
+    
+    async def run(self, executor=None):
+        """
+        Escaneo continuo dentro de un event loop compartido (ver main.py)
+        
+        Los barridos y las esperas de disparos (bloqueantes: red y numpy)
+        corren en `executor`; el loop queda libre para el bot.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self._startup)
+        
+        scan_count = 0
+        try:
+            while not self._stop.is_set():
+                scan_count += 1
+                try:
+                    await loop.run_in_executor(executor, self.scan_once, scan_count)
+                    await loop.run_in_executor(executor, self._wait_for_next_scan, Config.SCAN_INTERVAL_SECONDS)
+                except ScanStopped:
+                    break
+                except Exception as e:
+                    logger.error(f"❌ Error en el loop: {e}")
+                    logger.info("⏰ Reintentando en 10 segundos...")
+                    await loop.run_in_executor(executor, self._stop.wait, 10)
+        finally:
+            await loop.run_in_executor(executor, self.shutdown)
+    
+    def stop(self):
+        """Pide al loop de escaneo que termine (el barrido en curso se corta)"""
+        self._stop.set()
+    
+    def _startup(self):
+        logger.info("🔍 Iniciando escaneo con IA...")
+        
+        # Mostrar estadísticas
+        stats = self.tracker.get_stats()
+        logger.info(f"📈 Señales enviadas: {stats['total']} (LONG: {stats['longs']}, SHORT: {stats['shorts']})")
+        
+        if self.snapshot:
+            self.snapshot.restore(self)
+        
+        self.dispatcher.start()
+        
+        if self.oi_poller:
+            self.oi_poller.start()
+        
+        # Aquí y no en __init__: con run() corre en el executor y el bot ya atiende.
+        # Los que no lleguen a tiempo entran en cualquier barrido (scan reparte
+        # entre los unidos y sin ninguno analiza aquí)
+        if self.coordinator and Config.SCAN_WORKERS > 0:
+            joined = self.coordinator.wait_for_workers(Config.SCAN_WORKERS)
+            logger.info(f"🧭 {joined}/{Config.SCAN_WORKERS} workers locales listos")
+    
+    def scan_once(self, scan_count: int):
+        """Un barrido completo: análisis, señales y resumen"""
+        logger.info(f"\n{'='*60}")
+        logger.info(f"🔄 Escaneo #{scan_count} con IA")
+        logger.info(f"{'='*60}")
+        
+        # Escanear todos los pares con IA (atendiendo disparos entre símbolos)
+        if self.coordinator:
+            signals = self._scan_sharded()
+        else:
+            signals = self.analyzer.scan_all_pairs(between=self._process_triggers)
+        
+        signals_sent = 0
+        for analysis in signals:
+            if self._handle_analysis(analysis):
+                signals_sent += 1
+        
+        logger.info(f"\n✅ Escaneo #{scan_count} completado")
+        logger.info(f"🎯 Señales encoladas: {signals_sent} ({self.dispatcher.pending()} pendientes de envío)")
+        
+        latency = self.trigger_latency.summary()
+        if latency:
+            logger.info(
+                f"⚡ Disparo→señal: p50 {latency['p50']:.0f} ms, "
+                f"p95 {latency['p95']:.0f} ms ({latency['count']} señales)"
+            )
+        
+        if self.snapshot and time.monotonic() - self._last_snapshot >= Config.SNAPSHOT_INTERVAL_SECONDS:
+            self._save_snapshot()
+        
+        logger.info(f"⏰ Próximo escaneo en {Config.SCAN_INTERVAL_SECONDS}s...\n")
+    
+    def shutdown(self):
+        """Detiene workers, stream y despachador (lo pendiente queda en el outbox)"""
+        if self.coordinator:
+            self.coordinator.stop()
+        
+        if self.oi_poller:
+            self.oi_poller.stop()
+        
+        if self.analyzer.stream:
+            self.analyzer.stream.stop()
+        
+        self.dispatcher.stop()
+        
+        if self.snapshot:
+            self._save_snapshot()
         
         logger.info("👋 Escáner detenido")
     
+    def _save_snapshot(self):
+        self._last_snapshot = time.monotonic()
+        try:
+            self.snapshot.save(self)
+        except Exception as e:
+            logger.error(f"❌ Error guardando snapshot: {e}")
+    
+    def _scan_sharded(self) -> list:
+        """Barrido repartido entre workers; devuelve las señales ordenadas"""
+        pairs = self.analyzer.get_scan_pairs()
+        # Las señales MTF se calculan aquí (en lote) y viajan con las tareas
+        trends = self.analyzer.update_trends(pairs)
+        analyses = self.coordinator.scan(pairs, between=self._process_triggers, trends=trends)
+        
+        signals = []
+        for analysis in analyses:
+            self.analyzer.record(analysis)
+            if analysis['signal']:
+                signals.append(analysis)
+        
+        signals.sort(key=lambda x: x['confidence'], reverse=True)
+        logger.info(f"🎯 Encontradas {len(signals)} señales ({len(analyses)}/{len(pairs)} analizados)")
+        return signals
+    
+    def _handle_analysis(self, analysis: dict) -> bool:
+        """Encola y registra la señal si pasa cooldown y confianza"""
+        symbol = analysis['symbol']
+        
+        # Verificar cooldown
+        if not self.tracker.can_send_signal(symbol):
+            return False
+        
+        # Solo señales con buena confianza
+        if analysis['confidence'] < 70:
+            return False
+        
+        logger.info(f"🎯 SEÑAL: {symbol} {analysis['signal']} ({analysis['confidence']}%)")
+        
+        # Generar mensaje
+        message = SignalGenerator.generate_message(analysis)
+        
+        # Guardar en el outbox (el despachador hace el envío, la pausa y los reintentos)
+        self.dispatcher.submit(symbol, message)
+        
+        # Registrar
+        self.tracker.register_signal(
+            symbol,
+            analysis['signal'],
+            analysis['price']
+        )
+        
+        return True
+    
+    def _wait_for_next_scan(self, seconds: float):
+        """Espera al siguiente barrido atendiendo los disparos que lleguen"""
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            entry = self.triggers.pop(timeout=min(remaining, 1.0))
+            if entry:
+                self._run_trigger(entry)
+    
+    def _process_triggers(self):
+        """Atiende todos los disparos pendientes sin bloquear"""
+        if self._stop.is_set():
+            raise ScanStopped()
+        while True:
+            entry = self.triggers.pop(timeout=0)
+            if entry is None:
+                return
+            self._run_trigger(entry)
+    
+    def _run_trigger(self, entry: dict):
+        """Análisis completo inmediato de un símbolo disparado"""
+        symbol = entry['symbol']
+        try:
+            analysis = self.analyzer.analyze_symbol(symbol)
+            self.analyzer.record(analysis)
+            latency_ms = (time.monotonic() - entry['triggered_at']) * 1000
+            
+            if analysis and analysis['signal'] and self._handle_analysis(analysis):
+                self.trigger_latency.add(latency_ms)
+                logger.info(f"⚡ {symbol} ({entry['reason']}) → señal en {latency_ms:.0f} ms")
+            else:
+                logger.info(f"⚡ {symbol} ({entry['reason']}) → sin señal ({latency_ms:.0f} ms)")
+        except Exception as e:
+            logger.error(f"❌ Error en disparo de {symbol}: {e}")
+    
     def scan_single(self, symbol: str):
         """Analiza un solo símbolo"""
         logger.info(f"🔍 Analizando {symbol} con IA...")
@@ -109,19 +317,5 @@ class CryptoScanner:
             logger.error(f"❌ No se pudo analizar {symbol}")
             return None
         
-        # Mostrar resultado
-        print(f"\n{'='*60}")
-        print(f"📊 ANÁLISIS DE {symbol}")
-        print(f"{'='*60}")
-        print(f"💰 Precio: ${analysis['price']:,.4f}")
-        print(f"📈 Señal: {analysis['signal'] or 'NINGUNA'}")
-        print(f"📊 Confianza: {analysis['confidence']}%")
-        
-        if analysis['reasons']:
-            print(f"\n¿Por qué?")
-            for r in analysis['reasons']:
-                print(f"  {r}")
-        
-        print(f"{'='*60}\n")
-        
+        print_analysis(analysis)
         return analysis
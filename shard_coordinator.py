@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+"""
+Escaneo repartido entre varios procesos o máquinas
+El coordinador reparte los símbolos con hashing consistente, recoge los
+análisis y deja el envío de señales y el cooldown en un solo lugar
+
+Los workers analizan con los mismos datos que un barrido local: las
+señales multi-timeframe (MTF_CONFIRMATION) se calculan en lote en el
+coordinador y viajan con cada tarea; el perfil de volumen lo calcula cada
+worker sobre las mismas 200 velas de 1h (igual resultado que el lote local,
+sin su ahorro).
+
+Modo local (un solo equipo): SCAN_WORKERS=N arranca N procesos worker.
+Modo multi-nodo: en cada máquina worker
+    python shard_coordinator.py worker HOST:PUERTO [nombre]
+con SHARD_AUTHKEY igual al del coordinador.
+"""
+import sys
+import time
+import bisect
+import hashlib
+import queue
+import secrets
+import socket
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing.managers import BaseManager
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ConsistentHashRing:
+    """Anillo de hashing consistente con nodos virtuales"""
+
+    def __init__(self, replicas: int = 100):
+        self.replicas = replicas
+        self._keys = []
+        self._nodes = {}  # hash -> nodo
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+    @property
+    def nodes(self) -> set:
+        return set(self._nodes.values())
+
+    def add(self, node: str):
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if h not in self._nodes:
+                bisect.insort(self._keys, h)
+            self._nodes[h] = node
+
+    def remove(self, node: str):
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            if self._nodes.get(h) == node:
+                del self._nodes[h]
+                self._keys.remove(h)
+
+    def get(self, key: str) -> str:
+        """Nodo responsable de la clave (None si el anillo está vacío)"""
+        if not self._keys:
+            return None
+        idx = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._nodes[self._keys[idx]]
+
+    def assign(self, keys: list) -> dict:
+        """Reparte claves: nodo -> [claves]"""
+        assignment = {}
+        for key in keys:
+            assignment.setdefault(self.get(key), []).append(key)
+        return assignment
+
+
+# === Colas compartidas (viven en el proceso servidor del manager) ===
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def _get_queue(name: str):
+    with _queues_lock:
+        if name not in _queues:
+            _queues[name] = queue.Queue()
+        return _queues[name]
+
+
+class ShardManager(BaseManager):
+    pass
+
+
+ShardManager.register('get_queue', callable=_get_queue)
+
+
+def _parse_address(address: str) -> tuple:
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def _default_analyzer():
+    # Sin stream ni niveles: el coordinador planifica y guarda los resultados
+    from ai_analyzer import AIAnalyzer
+    return AIAnalyzer(stream=False, tiers=False)
+
+
+def _poll(tasks) -> dict:
+    try:
+        return tasks.get_nowait()
+    except queue.Empty:
+        return None
+
+
+def run_worker(address: str, authkey: bytes, worker_id: str = None, analyzer_factory=None):
+    """
+    Bucle de un worker: recibe lotes de símbolos y devuelve sus análisis
+
+    Args:
+        address: HOST:PUERTO del coordinador
+        authkey: clave compartida con el coordinador
+        worker_id: nombre único del worker
+        analyzer_factory: crea el analizador (por defecto AIAnalyzer)
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{multiprocessing.current_process().pid}"
+
+    manager = ShardManager(address=_parse_address(address), authkey=authkey)
+    manager.connect()
+    tasks = manager.get_queue(f"tasks:{worker_id}")
+    results = manager.get_queue('results')
+
+    analyzer = (analyzer_factory or _default_analyzer)()
+    results.put({'type': 'join', 'worker': worker_id})
+    logger.info(f"👷 Worker {worker_id} conectado a {address}")
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(Config.SHARD_HEARTBEAT_SECONDS):
+            results.put({'type': 'heartbeat', 'worker': worker_id})
+
+    threading.Thread(target=heartbeat, name="Heartbeat", daemon=True).start()
+
+    queued = deque()
+    try:
+        while True:
+            task = queued.popleft() if queued else tasks.get()
+            if task['type'] == 'stop':
+                break
+            if task['type'] != 'scan':
+                continue
+
+            # Señales MTF del coordinador: mismo contexto que en un barrido local
+            if task.get('trends'):
+                analyzer.trends.update(task['trends'])
+            symbols = deque(task['symbols'])
+            while symbols:
+                # Entre símbolo y símbolo: otro lote, cancel o stop dejan este a medias
+                incoming = _poll(tasks)
+                if incoming is not None:
+                    if incoming['type'] == 'scan' and incoming['batch'] == task['batch']:
+                        symbols.extend(incoming['symbols'])  # reasignados del mismo lote
+                        if incoming.get('trends'):
+                            analyzer.trends.update(incoming['trends'])
+                        continue
+                    queued.append(incoming)
+                    logger.info(f"⏭️ Lote #{task['batch']} abandonado ({len(symbols)} símbolos sin analizar)")
+                    break
+
+                symbol = symbols.popleft()
+                try:
+                    analysis = analyzer.analyze_symbol(symbol)
+                except Exception as e:
+                    logger.error(f"Error analizando {symbol}: {e}")
+                    analysis = None
+
+                results.put({
+                    'type': 'analysis',
+                    'worker': worker_id,
+                    'batch': task['batch'],
+                    'symbol': symbol,
+                    'analysis': analysis,
+                })
+    finally:
+        stop.set()
+        results.put({'type': 'leave', 'worker': worker_id})
+        logger.info(f"👋 Worker {worker_id} desconectado")
+
+
+class ScanCoordinator:
+    """
+    Reparte los símbolos entre workers y junta los análisis
+
+    Los workers entran (mensaje join) y salen (leave o sin heartbeat) en
+    cualquier momento; el anillo se reequilibra y los símbolos pendientes
+    de un worker caído se reasignan dentro del mismo lote.
+    """
+
+    def __init__(self, local_workers: int = 0, address: str = None, authkey: bytes = None,
+                 analyzer_factory=None, fallback=None):
+        """
+        Args:
+            local_workers: procesos worker a lanzar en esta máquina
+            address: HOST:PUERTO donde escuchar (Config.SHARD_BIND por defecto)
+            authkey: clave compartida (aleatoria si no hay SHARD_AUTHKEY)
+            analyzer_factory: fábrica de analizador para los workers locales
+            fallback: fn(symbol) para analizar aquí si no hay workers vivos
+        """
+        self.address = address or Config.SHARD_BIND
+        if authkey is None:
+            authkey = Config.SHARD_AUTHKEY.encode() if Config.SHARD_AUTHKEY else secrets.token_bytes(16)
+        self.authkey = authkey
+        self.fallback = fallback
+        self.worker_timeout = Config.SHARD_HEARTBEAT_SECONDS * 3
+
+        self.ring = ConsistentHashRing()
+        self.last_seen = {}  # worker -> time.monotonic()
+        self._batch = 0
+        self._trends = {}  # del lote en curso (también para reasignaciones)
+
+        self.manager = ShardManager(address=_parse_address(self.address), authkey=self.authkey)
+        self.manager.start()
+        self.results = self.manager.get_queue('results')
+        logger.info(f"🧭 Coordinador escuchando en {self.address}")
+
+        self.processes = []
+        ctx = multiprocessing.get_context('spawn')
+        for i in range(local_workers):
+            process = ctx.Process(
+                target=run_worker,
+                args=(self.address, self.authkey, f"local-{i}", analyzer_factory),
+                name=f"ScanWorker-{i}",
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def wait_for_workers(self, count: int, timeout: float = 60) -> int:
+        """Espera a que se unan `count` workers (devuelve cuántos hay)"""
+        deadline = time.monotonic() + timeout
+        while len(self.ring.nodes) < count and time.monotonic() < deadline:
+            self._handle(self._next_message(0.5), None, None)
+        return len(self.ring.nodes)
+
+    def scan(self, symbols: list, between=None, trends: dict = None) -> list:
+        """
+        Analiza los símbolos repartidos entre los workers
+
+        Args:
+            symbols: símbolos a analizar
+            between: callback sin argumentos llamado mientras se espera
+            trends: symbol -> señal MTF calculada en el coordinador
+                (AIAnalyzer.update_trends); viaja con cada tarea
+
+        Returns:
+            Lista de análisis (los símbolos fallidos no aparecen)
+        """
+        self._drain_control_messages()
+
+        if not self.ring.nodes:
+            if self.fallback:
+                logger.warning("⚠️ Sin workers activos, analizando en el coordinador")
+                return [a for a in (self.fallback(s) for s in symbols) if a]
+            return []
+
+        self._batch += 1
+        batch = self._batch
+        self._trends = trends or {}
+        pending = {}  # symbol -> worker
+        self._dispatch(batch, symbols, pending)
+
+        analyses = []
+        deadline = time.monotonic() + Config.SHARD_BATCH_TIMEOUT
+        try:
+            while pending and time.monotonic() < deadline:
+                msg = self._next_message(1.0)
+                analysis = self._handle(msg, batch, pending)
+                if analysis:
+                    analyses.append(analysis)
+                if between:
+                    between()
+
+                self._expire_workers(batch, pending)
+                if not self.ring.nodes and pending:
+                    logger.error(f"❌ Todos los workers cayeron: {len(pending)} símbolos sin analizar")
+                    break
+        finally:
+            # Lote abandonado (timeout o barrido cortado): que el siguiente no lo herede
+            if pending:
+                self._drain_tasks(cancel=True)
+
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} símbolos sin respuesta en el lote #{batch}")
+
+        return analyses
+
+    def stop(self):
+        """Detiene los workers y el manager"""
+        # Lo que quede encolado no se analiza: el stop es lo siguiente que ven
+        self._drain_tasks()
+        for worker in list(self.ring.nodes):
+            self.manager.get_queue(f"tasks:{worker}").put({'type': 'stop'})
+        for process in self.processes:
+            process.join(timeout=5)
+        self.manager.shutdown()
+
+    def _dispatch(self, batch: int, symbols: list, pending: dict):
+        for worker, assigned in self.ring.assign(symbols).items():
+            self.manager.get_queue(f"tasks:{worker}").put({
+                'type': 'scan',
+                'batch': batch,
+                'symbols': assigned,
+                'trends': {s: self._trends[s] for s in assigned if s in self._trends},
+            })
+            for symbol in assigned:
+                pending[symbol] = worker
+        logger.info(f"🧭 Lote #{batch}: {len(symbols)} símbolos en {len(self.ring.nodes)} workers")
+
+    def _drain_tasks(self, cancel: bool = False):
+        """
+        Vacía las colas de tareas de los workers (lotes ya abandonados)
+
+        Args:
+            cancel: además avisa a cada worker para que deje el lote que
+                tenga a medias
+        """
+        dropped = 0
+        for worker in list(self.ring.nodes):
+            tasks = self.manager.get_queue(f"tasks:{worker}")
+            while True:
+                task = _poll(tasks)
+                if task is None:
+                    break
+                dropped += len(task.get('symbols', ()))
+            if cancel:
+                tasks.put({'type': 'cancel'})
+        if dropped:
+            logger.info(f"🧹 {dropped} símbolos descartados de las colas de los workers")
+
+    def _next_message(self, timeout: float) -> dict:
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _drain_control_messages(self):
+        while True:
+            msg = self._next_message(0)
+            if msg is None:
+                break
+            self._handle(msg, None, None)
+        self._expire_workers(None, None)
+
+    def _handle(self, msg: dict, batch, pending) -> dict:
+        """Procesa un mensaje; devuelve el análisis si es del lote actual"""
+        if msg is None:
+            return None
+
+        worker = msg['worker']
+
+        if msg['type'] == 'leave':
+            self._remove_worker(worker, batch, pending)
+            return None
+
+        if worker not in self.ring.nodes:
+            self.ring.add(worker)
+            logger.info(f"➕ Worker {worker} unido ({len(self.ring.nodes)} activos)")
+        self.last_seen[worker] = time.monotonic()
+
+        if msg['type'] == 'analysis' and pending is not None and msg['batch'] == batch:
+            if pending.pop(msg['symbol'], None) is not None:
+                return msg['analysis']
+        return None
+
+    def _expire_workers(self, batch, pending):
+        now = time.monotonic()
+        for worker in list(self.ring.nodes):
+            if now - self.last_seen.get(worker, now) > self.worker_timeout:
+                logger.warning(f"⚠️ Worker {worker} sin heartbeat")
+                self._remove_worker(worker, batch, pending)
+
+    def _remove_worker(self, worker: str, batch, pending):
+        if worker not in self.ring.nodes:
+            return
+        self.ring.remove(worker)
+        self.last_seen.pop(worker, None)
+        logger.info(f"➖ Worker {worker} fuera ({len(self.ring.nodes)} activos)")
+
+        # Reasignar lo que tenía pendiente en este lote
+        if pending:
+            orphans = [s for s, w in pending.items() if w == worker]
+            if orphans and self.ring.nodes:
+                self._dispatch(batch, orphans, pending)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if len(sys.argv) < 3 or sys.argv[1] != 'worker':
+        print("❌ Uso: python shard_coordinator.py worker HOST:PUERTO [nombre]")
+        sys.exit(1)
+
+    if not Config.SHARD_AUTHKEY:
+        print("❌ Configura SHARD_AUTHKEY (la misma que el coordinador)")
+        sys.exit(1)
+
+    run_worker(sys.argv[2], Config.SHARD_AUTHKEY.encode(), sys.argv[3] if len(sys.argv) > 3 else None)
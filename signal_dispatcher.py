@@ -0,0 +1,120 @@
+"""
+Despacho de señales fuera del loop de escaneo
+El escáner deja la señal en el outbox persistente y sigue; un hilo aparte
+vacía el outbox por lotes, con pausa entre señales y reintentos
+"""
+import threading
+import time
+import logging
+from config import Config
+from signal_outbox import SignalOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class SignalDispatcher:
+    """Outbox de señales con un hilo de envío"""
+
+    def __init__(self, notifier, maxsize: int = None, outbox: SignalOutbox = None):
+        self.notifier = notifier
+        self.outbox = outbox or SignalOutbox()
+        self.maxsize = maxsize or Config.DISPATCH_QUEUE_SIZE
+        self.pacing = Config.DISPATCH_PACING_SECONDS
+        self.batch_size = Config.DISPATCH_BATCH_SIZE
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="SignalDispatcher", daemon=True)
+        self._thread.start()
+
+        pending = self.outbox.pending_signals()
+        if pending:
+            logger.info(f"📮 Despachador de señales iniciado ({pending} pendientes del outbox)")
+        else:
+            logger.info("📮 Despachador de señales iniciado")
+
+    def stop(self, timeout: float = 10):
+        """
+        Detiene el hilo tras enviar lo que ya toca (hasta `timeout`);
+        lo que quede sigue en el outbox para el próximo arranque
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def pending(self) -> int:
+        return self.outbox.pending_signals()
+
+    def submit(self, symbol: str, message: str) -> bool:
+        """
+        Guarda la señal en el outbox (una entrega por chat) sin esperar el envío
+
+        Si hay más de `maxsize` señales pendientes se descartan las más
+        antiguas: una señal vieja vale menos que una nueva.
+        """
+        chat_ids = self.notifier.get_chat_ids()
+        if not chat_ids:
+            logger.warning(f"⚠️ {symbol}: no hay usuarios autorizados")
+            return False
+
+        self.outbox.enqueue(symbol, message, chat_ids)
+        for dropped in self.outbox.drop_oldest(self.maxsize):
+            logger.warning(f"⚠️ Outbox lleno, descartada {dropped}")
+
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                batch = self.outbox.next_batch(self.batch_size)
+            except Exception as e:
+                logger.error(f"❌ Error leyendo el outbox: {e}")
+                batch = []
+
+            if not batch:
+                if self._stop.is_set():
+                    return
+                # Reintentos programados: se revisa al menos cada segundo
+                self._wake.wait(1.0)
+                continue
+
+            for item in batch:
+                self._deliver(item)
+
+                # Pausa entre señales
+                if self.pacing > 0 and not self._stop.is_set():
+                    time.sleep(self.pacing)
+
+    def _deliver(self, item: dict):
+        symbol = item['symbol']
+        chat_ids = item['chat_ids']
+
+        try:
+            result = self.notifier.send_to_chats(chat_ids, item['message'])
+        except Exception as e:
+            logger.error(f"❌ Error despachando {symbol}: {e}")
+            result = {
+                'delivered': [],
+                'errors': {chat_id: {'error': str(e), 'retryable': True} for chat_id in chat_ids},
+            }
+
+        self.outbox.mark_delivered(item['id'], result['delivered'])
+        self.outbox.mark_failed(item['id'], result['errors'])
+
+        wait_ms = (time.time() - item['created_at']) * 1000
+        if result['errors']:
+            logger.warning(
+                f"⚠️ {symbol}: {len(result['delivered'])}/{len(chat_ids)} entregas "
+                f"({len(result['errors'])} fallidas, {wait_ms:.0f} ms desde la señal)"
+            )
+        else:
+            logger.info(f"📤 {symbol} despachada a {len(chat_ids)} chats ({wait_ms:.0f} ms desde la señal)")
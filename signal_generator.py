@@ -70,6 +70,78 @@ class SignalGenerator:
 
         return message
     
+    @staticmethod
+    def generate_analysis_report(analysis, age_seconds=0):
+        """
+        Resumen de un análisis completo pedido desde el bot
+        (si hay señal, el mensaje de señal completo)
+        """
+        if age_seconds >= 60:
+            age_text = f"\n\n🕐 Análisis de hace {age_seconds / 60:.0f} min"
+        elif age_seconds >= 1:
+            age_text = f"\n\n🕐 Análisis de hace {age_seconds:.0f}s"
+        else:
+            age_text = ""
+        
+        if analysis['signal']:
+            return SignalGenerator.generate_message(analysis) + age_text
+        
+        price = analysis['price']
+        price_fmt = f"${price:,.4f}" if price >= 1 else f"${price:.8f}"
+        
+        bullish = analysis.get('bullish_score', 0)
+        bearish = analysis.get('bearish_score', 0)
+        if bullish > bearish:
+            bias = "📈 Sesgo alcista"
+        elif bearish > bullish:
+            bias = "📉 Sesgo bajista"
+        else:
+            bias = "➡️ Sin sesgo claro"
+        
+        reasons = analysis.get('reasons', [])
+        reasons_text = "\n".join([f"  • {r}" for r in reasons]) if reasons else "  • Sin factores destacados"
+        
+        message = f"""📊 <b>Análisis de {analysis['symbol']}</b>
+
+💰 <b>Precio:</b> {price_fmt}
+{bias} (alcista {bullish} / bajista {bearish})
+📊 <b>Confianza:</b> {analysis['confidence']:.0f}%
+
+<b>Factores:</b>
+{reasons_text}
+
+⏳ Sin señal por ahora: la confianza no alcanza el mínimo."""
+
+        return message + age_text
+    
+    @staticmethod
+    def generate_top_board(entries):
+        """
+        Ranking "Top Señales" a partir de [(análisis, antigüedad en s)]
+        """
+        if not entries:
+            return ("📈 <b>Top Señales</b>\n\n"
+                    "⏳ Todavía no hay análisis recientes.\n"
+                    "El escáner está recorriendo el mercado.")
+        
+        lines = []
+        for i, (analysis, age) in enumerate(entries, 1):
+            if analysis['signal'] == 'LONG':
+                icon = "📈"
+            elif analysis['signal'] == 'SHORT':
+                icon = "📉"
+            else:
+                icon = "➖"
+            
+            label = analysis['signal'] or "sin señal"
+            age_text = f"{age / 60:.0f} min" if age >= 60 else f"{age:.0f}s"
+            lines.append(
+                f"{i}. {icon} <b>{analysis['symbol']}</b> {label} "
+                f"{analysis['confidence']:.0f}% · hace {age_text}"
+            )
+        
+        return "📈 <b>Top Señales</b>\n\n" + "\n".join(lines)
+    
     @staticmethod
     def generate_simple_analysis(symbol, data):
         """
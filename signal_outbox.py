@@ -0,0 +1,201 @@
+"""
+Outbox persistente de señales (SQLite)
+Una fila por (señal, chat): lo no entregado sobrevive a reinicios y caídas
+de Telegram y se reintenta (entrega al menos una vez)
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Junto a data/access_keys.db
+DATA_DIR = Path(__file__).parent / 'data'
+DB_PATH = DATA_DIR / 'signal_outbox.db'
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+FAILED = 'failed'      # error permanente o sin intentos
+EXPIRED = 'expired'    # demasiado vieja para enviarla
+DROPPED = 'dropped'    # descartada por exceso de señales pendientes
+
+
+class SignalOutbox:
+    """Cola durable de entregas pendientes"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DB_PATH
+        self.max_attempts = Config.OUTBOX_MAX_ATTEMPTS
+        self.max_age = Config.OUTBOX_MAX_AGE_MINUTES * 60
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        """Conexión del hilo actual (se abre una vez por hilo y se reutiliza)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=64)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        Path(self.db_path).parent.mkdir(exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS signals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                message TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS deliveries (
+                signal_id INTEGER NOT NULL,
+                chat_id NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                delivered_at REAL,
+                PRIMARY KEY (signal_id, chat_id),
+                FOREIGN KEY (signal_id) REFERENCES signals(id)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries(status, next_attempt_at)')
+        conn.commit()
+
+    def enqueue(self, symbol: str, message: str, chat_ids: list) -> int:
+        """Guarda la señal y una entrega pendiente por chat; devuelve el id"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO signals (symbol, message, created_at) VALUES (?, ?, ?)',
+                (symbol, message, now)
+            )
+            signal_id = cursor.lastrowid
+            conn.executemany(
+                'INSERT OR IGNORE INTO deliveries (signal_id, chat_id, next_attempt_at) VALUES (?, ?, ?)',
+                [(signal_id, chat_id, now) for chat_id in chat_ids]
+            )
+        return signal_id
+
+    def next_batch(self, limit: int = 10) -> list:
+        """
+        Señales con entregas vencidas (las más antiguas primero)
+
+        Returns:
+            Lista de dicts con id, symbol, message, created_at y chat_ids
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            # Una señal de scalping vieja ya no sirve
+            expired = conn.execute('''
+                UPDATE deliveries SET status = ?
+                WHERE status = ? AND signal_id IN (SELECT id FROM signals WHERE created_at < ?)
+            ''', (EXPIRED, PENDING, now - self.max_age)).rowcount
+            if expired:
+                logger.warning(f"⚠️ Outbox: {expired} entregas caducadas")
+
+            rows = conn.execute('''
+                SELECT s.id, s.symbol, s.message, s.created_at, d.chat_id
+                FROM deliveries d JOIN signals s ON s.id = d.signal_id
+                WHERE d.signal_id IN (
+                    SELECT DISTINCT signal_id FROM deliveries
+                    WHERE status = ? AND next_attempt_at <= ?
+                    ORDER BY signal_id LIMIT ?
+                )
+                AND d.status = ? AND d.next_attempt_at <= ?
+                ORDER BY s.id
+            ''', (PENDING, now, limit, PENDING, now)).fetchall()
+
+        batch = {}
+        for row in rows:
+            item = batch.setdefault(row['id'], {
+                'id': row['id'],
+                'symbol': row['symbol'],
+                'message': row['message'],
+                'created_at': row['created_at'],
+                'chat_ids': [],
+            })
+            item['chat_ids'].append(row['chat_id'])
+        return list(batch.values())
+
+    def mark_delivered(self, signal_id: int, chat_ids: list):
+        if not chat_ids:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'UPDATE deliveries SET status = ?, delivered_at = ?, attempts = attempts + 1 '
+                'WHERE signal_id = ? AND chat_id = ?',
+                [(DELIVERED, now, signal_id, chat_id) for chat_id in chat_ids]
+            )
+
+    def mark_failed(self, signal_id: int, errors: dict):
+        """
+        Registra fallos: los transitorios se reprograman con backoff, los
+        permanentes (o sin intentos restantes) quedan como failed
+
+        Args:
+            errors: {chat_id: {'error', 'retryable'}}
+        """
+        if not errors:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            for chat_id, error in errors.items():
+                row = conn.execute(
+                    'SELECT attempts FROM deliveries WHERE signal_id = ? AND chat_id = ?',
+                    (signal_id, chat_id)
+                ).fetchone()
+                if row is None:
+                    continue
+
+                attempts = row['attempts'] + 1
+                retry = error.get('retryable') and attempts < self.max_attempts
+                conn.execute('''
+                    UPDATE deliveries
+                    SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?
+                    WHERE signal_id = ? AND chat_id = ?
+                ''', (
+                    PENDING if retry else FAILED,
+                    attempts,
+                    now + min(5 * 2 ** (attempts - 1), 300),
+                    error.get('error'),
+                    signal_id,
+                    chat_id,
+                ))
+
+    def drop_oldest(self, keep: int) -> list:
+        """Deja como máximo `keep` señales pendientes; devuelve los símbolos descartados"""
+        conn = self._connect()
+        with conn:
+            rows = conn.execute('''
+                SELECT s.id, s.symbol FROM signals s
+                WHERE s.id IN (SELECT DISTINCT signal_id FROM deliveries WHERE status = ?)
+                ORDER BY s.id DESC LIMIT -1 OFFSET ?
+            ''', (PENDING, keep)).fetchall()
+            conn.executemany(
+                'UPDATE deliveries SET status = ? WHERE signal_id = ? AND status = ?',
+                [(DROPPED, row['id'], PENDING) for row in rows]
+            )
+        return [row['symbol'] for row in rows]
+
+    def pending_signals(self) -> int:
+        """Señales con al menos una entrega pendiente"""
+        conn = self._connect()
+        count = conn.execute(
+            'SELECT COUNT(DISTINCT signal_id) FROM deliveries WHERE status = ?', (PENDING,)
+        ).fetchone()[0]
+        return count
@@ -1,73 +1,142 @@
 """
 Sistema de tracking de señales para evitar duplicados
+Historial completo en SQLite (solo inserciones) + índice de cooldown en memoria
 """
 import json
 import os
-from datetime import datetime, timedelta
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
 from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+DATA_DIR = Path(__file__).parent / 'data'
+DB_PATH = DATA_DIR / 'signals_history.db'
+
+
 class SignalTracker:
-    def __init__(self, db_file='signals_history.json'):
+    def __init__(self, db_path=None, legacy_json='signals_history.json'):
         """Inicializa el tracker de señales"""
-        self.db_file = db_file
-        self.signals = self._load_signals()
-    
-    def _load_signals(self):
-        """Carga el historial de señales desde disco"""
-        if os.path.exists(self.db_file):
-            try:
-                with open(self.db_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"Error cargando señales: {e}")
-                return {}
-        return {}
-    
-    def _save_signals(self):
-        """Guarda el historial de señales a disco"""
+        self.db_path = db_path or DB_PATH
+        self.cooldown = Config.SIGNAL_COOLDOWN_HOURS * 3600
+        self._lock = threading.Lock()
+
+        Path(self.db_path).parent.mkdir(exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_db()
+        self._migrate_json(legacy_json)
+
+        # symbol -> epoch en que termina su cooldown
+        self.cooldown_until = self._load_cooldowns()
+
+    def _init_db(self):
+        """Crea la tabla del historial"""
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS signals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                signal TEXT NOT NULL,
+                price REAL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_signals_symbol ON signals(symbol, created_at)')
+        self.conn.commit()
+
+    def _migrate_json(self, legacy_json):
+        """Importa el historial JSON antiguo (una vez) y lo renombra"""
+        if not legacy_json or not os.path.exists(legacy_json):
+            return
+
         try:
-            with open(self.db_file, 'w') as f:
-                json.dump(self.signals, f, indent=2)
+            with open(legacy_json, 'r') as f:
+                signals = json.load(f)
+
+            rows = [
+                (symbol, s['signal'], s['price'], datetime.fromisoformat(s['timestamp']).timestamp())
+                for symbol, s in signals.items()
+            ]
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO signals (symbol, signal, price, created_at) VALUES (?, ?, ?, ?)',
+                    sorted(rows, key=lambda r: r[3])
+                )
+            os.replace(legacy_json, f"{legacy_json}.migrated")
+            logger.info(f"📦 {len(rows)} señales migradas desde {legacy_json}")
         except Exception as e:
-            logger.error(f"Error guardando señales: {e}")
-    
+            logger.error(f"Error migrando señales: {e}")
+
+    def _load_cooldowns(self):
+        """Cooldowns aún vigentes a partir del historial"""
+        rows = self.conn.execute(
+            'SELECT symbol, MAX(created_at) FROM signals WHERE created_at > ? GROUP BY symbol',
+            (time.time() - self.cooldown,)
+        ).fetchall()
+        return {symbol: last + self.cooldown for symbol, last in rows}
+
     def can_send_signal(self, symbol):
         """
         Verifica si se puede enviar una señal para este símbolo
         (no se ha enviado una en las últimas X horas)
         """
-        if symbol not in self.signals:
-            return True
-        
-        last_signal_time = datetime.fromisoformat(self.signals[symbol]['timestamp'])
-        cooldown = timedelta(hours=Config.SIGNAL_COOLDOWN_HOURS)
-        
-        if datetime.now() - last_signal_time > cooldown:
-            return True
-        
-        return False
-    
+        return time.time() >= self.cooldown_until.get(symbol, 0)
+
     def register_signal(self, symbol, signal_type, price):
         """Registra una señal enviada"""
-        self.signals[symbol] = {
-            'timestamp': datetime.now().isoformat(),
-            'signal': signal_type,
-            'price': price
-        }
-        self._save_signals()
+        now = time.time()
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        'INSERT INTO signals (symbol, signal, price, created_at) VALUES (?, ?, ?, ?)',
+                        (symbol, signal_type, price, now)
+                    )
+            except Exception as e:
+                logger.error(f"Error guardando señal: {e}")
+            self.cooldown_until[symbol] = now + self.cooldown
         logger.info(f"📝 Señal registrada: {symbol} {signal_type} @ ${price}")
-    
+
     def get_stats(self):
         """Obtiene estadísticas de señales enviadas"""
-        total = len(self.signals)
-        longs = sum(1 for s in self.signals.values() if s['signal'] == 'LONG')
-        shorts = sum(1 for s in self.signals.values() if s['signal'] == 'SHORT')
-        
+        with self._lock:
+            total, longs, shorts = self.conn.execute('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(signal = 'LONG'), 0),
+                       COALESCE(SUM(signal = 'SHORT'), 0)
+                FROM signals
+            ''').fetchone()
+
         return {
             'total': total,
             'longs': longs,
             'shorts': shorts
         }
+
+    def get_history(self, symbol=None, limit=100):
+        """Últimas señales (de un símbolo o de todos), más recientes primero"""
+        query = 'SELECT symbol, signal, price, created_at FROM signals'
+        params = []
+        if symbol:
+            query += ' WHERE symbol = ?'
+            params.append(symbol)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        return [
+            {
+                'symbol': s,
+                'signal': sig,
+                'price': price,
+                'timestamp': datetime.fromtimestamp(ts).isoformat()
+            }
+            for s, sig, price, ts in rows
+        ]
@@ -0,0 +1,167 @@
+"""
+Snapshot del estado en memoria del escáner
+Velas, ventanas de volumen, series de OI, niveles y caché de análisis en un
+.npz (arrays planos, sin pickle) para arrancar en caliente tras un reinicio:
+al volver solo se descargan las velas que faltan desde que se escribió
+"""
+import io
+import json
+import os
+import time
+import numpy as np
+from pathlib import Path
+from config import Config
+from analysis_service import analysis_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / 'data'
+SNAPSHOT_PATH = DATA_DIR / 'scanner_state.npz'
+
+# Cambiar si cambia el formato: un snapshot de otra versión se ignora
+SNAPSHOT_VERSION = 1
+
+
+class StateSnapshot:
+    """Guarda y restaura el estado de un CryptoScanner"""
+
+    def __init__(self, path=None):
+        self.path = Path(path or SNAPSHOT_PATH)
+        self.max_age = Config.SNAPSHOT_MAX_AGE_HOURS * 3600
+
+    def save(self, scanner) -> int:
+        """
+        Escribe el snapshot (archivo temporal + rename: nunca queda a medias)
+
+        Returns:
+            Tamaño en bytes
+        """
+        started = time.perf_counter()
+        analyzer = scanner.analyzer
+        arrays = {
+            'version': np.array(SNAPSHOT_VERSION),
+            'saved_at': np.array(time.time()),
+        }
+
+        candles = analyzer.candles.export_state()
+        arrays.update(_pack('candles', {_key(k): m for k, m in candles.items()}))
+
+        volume = analyzer.volume_analyzer.stats.export_state()
+        arrays.update(_pack('volume', {_key(k): np.asarray(row, dtype=float) for k, row in volume.items()}))
+
+        oi = scanner.spike_trigger.export_oi()
+        arrays.update(_pack('oi', {s: np.asarray(samples, dtype=float) for s, samples in oi.items()}))
+
+        extra = {'analyses': analysis_cache.export_state()}
+        if analyzer.scheduler:
+            extra['scheduler'] = analyzer.scheduler.export_state()
+        blob = json.dumps(extra, default=_json_default).encode()
+        arrays['extra'] = np.frombuffer(blob, dtype=np.uint8)
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+
+        self.path.parent.mkdir(exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(buffer.getbuffer())
+        os.replace(tmp, self.path)
+
+        size = buffer.getbuffer().nbytes
+        logger.info(
+            f"💾 Snapshot guardado: {len(candles)} series de velas, {len(oi)} de OI, "
+            f"{size / 1024:.0f} KB en {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return size
+
+    def restore(self, scanner) -> bool:
+        """
+        Carga el snapshot si existe, es de esta versión y no es demasiado viejo
+
+        Returns:
+            True si se restauró
+        """
+        if not self.path.exists():
+            return False
+
+        started = time.perf_counter()
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if int(data['version']) != SNAPSHOT_VERSION:
+                    logger.info("💾 Snapshot de otra versión: se ignora")
+                    return False
+
+                age = time.time() - float(data['saved_at'])
+                if age > self.max_age:
+                    logger.info(f"💾 Snapshot de hace {age / 3600:.1f} h: se ignora")
+                    return False
+
+                candles = {_split_key(k): m for k, m in _unpack('candles', data).items()}
+                volume = {_split_key(k): row for k, row in _unpack('volume', data).items()}
+                oi = {
+                    s: [(float(t), float(v)) for t, v in samples]
+                    for s, samples in _unpack('oi', data).items()
+                }
+                extra = json.loads(data['extra'].tobytes())
+        except Exception as e:
+            logger.warning(f"⚠️ Snapshot ilegible, arranque en frío: {e}")
+            return False
+
+        analyzer = scanner.analyzer
+        analyzer.candles.load_state(candles)
+        analyzer.volume_analyzer.stats.load_state(volume)
+        scanner.spike_trigger.load_oi(oi)
+        analysis_cache.load_state(extra.get('analyses', []))
+        if analyzer.scheduler and 'scheduler' in extra:
+            analyzer.scheduler.load_state(extra['scheduler'])
+
+        logger.info(
+            f"💾 Snapshot de hace {age:.0f}s restaurado: {len(candles)} series de velas, "
+            f"{len(oi)} de OI en {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return True
+
+
+def _key(key: tuple) -> str:
+    return '|'.join(key)
+
+
+def _split_key(key: str) -> tuple:
+    return tuple(key.split('|'))
+
+
+def _pack(prefix: str, series: dict) -> dict:
+    """
+    Serie por clave -> tres arrays: claves, largos y datos concatenados
+    (un solo bloque por tipo en vez de miles de entradas en el .npz)
+    """
+    keys = list(series)
+    matrices = [series[k] for k in keys]
+    if matrices:
+        data = np.concatenate(matrices)
+    else:
+        data = np.empty(0)
+    return {
+        f'{prefix}_keys': np.array(keys, dtype=str),
+        f'{prefix}_lengths': np.array([len(m) for m in matrices], dtype=np.int64),
+        f'{prefix}_data': data,
+    }
+
+
+def _unpack(prefix: str, data) -> dict:
+    keys = data[f'{prefix}_keys']
+    lengths = data[f'{prefix}_lengths']
+    if len(keys) == 0:
+        return {}
+    parts = np.split(data[f'{prefix}_data'], np.cumsum(lengths)[:-1])
+    return {str(k): part for k, part in zip(keys, parts)}
+
+
+def _json_default(value):
+    """numpy dentro de los análisis (patrones, niveles...)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} no serializable")
@@ -0,0 +1,310 @@
+"""
+Estadísticas de volumen en streaming
+Media, varianza y z-score por símbolo/intervalo actualizados en O(1)
+por vela cerrada (Welford sobre ventana deslizante)
+"""
+import threading
+import time
+from collections import deque
+import logging
+from candles import INTERVAL_MS
+
+logger = logging.getLogger(__name__)
+
+
+class RollingStats:
+    """
+    Media y varianza de una ventana deslizante con actualizaciones de Welford
+
+    Al llenarse la ventana cada valor nuevo reemplaza al más antiguo con una
+    sola actualización, sin volver a recorrer la ventana.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self._m2 = 0.0  # Suma de cuadrados de las desviaciones
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) >= self.window
+
+    def push(self, x: float):
+        """Añade un valor (y descarta el más antiguo si la ventana está llena)"""
+        x = float(x)
+
+        if len(self.values) < self.window:
+            self.values.append(x)
+            delta = x - self.mean
+            self.mean += delta / len(self.values)
+            self._m2 += delta * (x - self.mean)
+            return
+
+        old = self.values.popleft()
+        self.values.append(x)
+        old_mean = self.mean
+        self.mean += (x - old) / self.window
+        self._m2 += (x - old) * (x - self.mean + old - old_mean)
+        if self._m2 < 0:
+            self._m2 = 0.0  # Redondeo cuando la ventana es casi constante
+
+    @property
+    def variance(self) -> float:
+        """Varianza poblacional (igual que np.var / np.std por defecto)"""
+        if not self.values:
+            return 0.0
+        return self._m2 / len(self.values)
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    def zscore(self, x: float) -> float:
+        std = self.std
+        return (x - self.mean) / std if std > 0 else 0
+
+
+class VolumeStatsTracker:
+    """
+    Estadísticas de volumen por (símbolo, intervalo)
+
+    Las velas cerradas entran una sola vez en la ventana (sync desde REST o
+    on_kline desde el stream). La vela en curso solo se compara contra la
+    ventana, así que la detección de spikes se puede evaluar en cada tick.
+    """
+
+    # Velas cerradas en la ventana por intervalo (igual que el análisis REST)
+    WINDOWS = {'1h': 99, '15m': 49}
+
+    def __init__(self, spike_threshold: float = 3.0, max_age: float = 30.0):
+        self.spike_threshold = spike_threshold
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        # (symbol, interval) -> RollingStats
+        self._stats = {}
+
+        # (symbol, interval) -> último estado conocido
+        self._last_closed_ts = {}
+        self._last_closed_close = {}
+        self._live = {}
+
+        # (symbol, interval) -> último spike detectado en tick
+        self.spikes = {}
+
+        # Callbacks fn(symbol, interval, spike) al detectar un spike nuevo
+        self.spike_listeners = []
+
+    def _get_stats(self, key) -> RollingStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = RollingStats(self.WINDOWS.get(key[1], 99))
+            self._stats[key] = stats
+        return stats
+
+    def sync(self, symbol: str, interval: str, candles: dict):
+        """
+        Incorpora velas ya descargadas (la última es la vela en curso)
+
+        Solo las velas cerradas posteriores a la última vista entran en la
+        ventana, así que llamar en cada ciclo cuesta O(velas nuevas).
+        """
+        timestamps = candles['timestamp']
+        volumes = candles['volume']
+        closes = candles['close']
+        key = (symbol, interval)
+
+        with self._lock:
+            stats = self._get_stats(key)
+            last_ts = self._last_closed_ts.get(key, -1)
+
+            for i in range(max(0, len(timestamps) - 1 - stats.window), len(timestamps) - 1):
+                if timestamps[i] > last_ts:
+                    stats.push(volumes[i])
+                    self._last_closed_ts[key] = int(timestamps[i])
+                    self._last_closed_close[key] = float(closes[i])
+
+            # El stream puede ir por delante de la respuesta REST
+            live = self._live.get(key)
+            if live is None or int(timestamps[-1]) >= live['timestamp']:
+                self._live[key] = {
+                    'timestamp': int(timestamps[-1]),
+                    'volume': float(volumes[-1]),
+                    'close': float(closes[-1]),
+                    'updated_at': time.time(),
+                }
+
+    def on_kline(self, symbol: str, interval: str, kline: dict):
+        """
+        Actualización desde el stream (cada tick de la vela en curso)
+
+        Args:
+            kline: dict con timestamp, close, volume y closed
+        """
+        key = (symbol, interval)
+        spike = None
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None or not stats.full:
+                return  # Sin historial suficiente todavía
+
+            # Se perdió algún cierre (reconexión, mensaje perdido): la ventana
+            # ya no son las últimas N velas, hasta el próximo sync REST
+            last_ts = self._last_closed_ts.get(key, -1)
+            step = INTERVAL_MS.get(interval)
+            expected = last_ts + step if step else None
+            if expected is not None and kline['timestamp'] > expected:
+                self._mark_cold(key)
+                logger.info(f"📉 {symbol} {interval}: hueco en el stream, estadísticas en frío hasta el próximo sync")
+                return
+
+            if kline['closed']:
+                if kline['timestamp'] > last_ts:
+                    stats.push(kline['volume'])
+                    self._last_closed_ts[key] = kline['timestamp']
+                    self._last_closed_close[key] = kline['close']
+                self._live.pop(key, None)
+                return
+
+            self._live[key] = {
+                'timestamp': kline['timestamp'],
+                'volume': kline['volume'],
+                'close': kline['close'],
+                'updated_at': time.time(),
+            }
+
+            spike = self._evaluate_spike(key)
+            previous = self.spikes.get(key)
+            self.spikes[key] = spike
+
+            # Notificar solo el primer spike de cada vela
+            if not spike['detected'] or (previous and previous['detected']
+                                         and previous['timestamp'] == spike['timestamp']):
+                spike = None
+
+        if spike:
+            for listener in self.spike_listeners:
+                try:
+                    listener(symbol, interval, spike)
+                except Exception as e:
+                    logger.error(f"Error en listener de spike: {e}")
+
+    def _mark_cold(self, key):
+        """Descarta la ventana de `key` (is_warm False: el análisis vuelve a REST)"""
+        self._stats.pop(key, None)
+        self._last_closed_ts.pop(key, None)
+        self._last_closed_close.pop(key, None)
+        self._live.pop(key, None)
+        self.spikes.pop(key, None)
+
+    def export_state(self) -> dict:
+        """(symbol, interval) -> [ts última cerrada, su cierre, volúmenes de la ventana...]"""
+        with self._lock:
+            return {
+                key: [float(self._last_closed_ts[key]), float(self._last_closed_close.get(key, 0.0)),
+                      *stats.values]
+                for key, stats in self._stats.items() if key in self._last_closed_ts
+            }
+
+    def load_state(self, state: dict):
+        """
+        Restaura las ventanas volcadas por export_state
+
+        Sin vela en curso: is_warm sigue en False hasta el próximo sync o
+        tick del stream, y entonces solo entran las velas posteriores.
+        """
+        with self._lock:
+            for key, row in state.items():
+                stats = RollingStats(self.WINDOWS.get(key[1], 99))
+                for volume in row[2:]:
+                    stats.push(volume)
+                self._stats[key] = stats
+                self._last_closed_ts[key] = int(row[0])
+                self._last_closed_close[key] = float(row[1])
+
+    def is_warm(self, symbol: str, interval: str) -> bool:
+        """
+        Hay ventana completa y una vela en curso reciente
+
+        Sin stream la vela en curso solo se refresca con sync(), así que tras
+        max_age segundos se considera vieja y hay que volver a descargar.
+        """
+        key = (symbol, interval)
+        stats = self._stats.get(key)
+        live = self._live.get(key)
+        return bool(stats and stats.full and live and key in self._last_closed_close
+                    and time.time() - live['updated_at'] <= self.max_age)
+
+    def volume_snapshot(self, symbol: str, interval: str) -> dict:
+        """
+        Métricas de la vela en curso contra la ventana
+
+        Returns:
+            dict con current_volume, average_volume, std_volume, volume_ratio,
+            z_score, price_change o None si no está caliente
+        """
+        key = (symbol, interval)
+        with self._lock:
+            if not self.is_warm(symbol, interval):
+                return None
+            return self._snapshot(key)
+
+    def spike(self, symbol: str, interval: str) -> dict:
+        """Evalúa el spike de la vela en curso (mismo formato que detect_spike)"""
+        key = (symbol, interval)
+        with self._lock:
+            if not self.is_warm(symbol, interval):
+                return None
+            return self._evaluate_spike(key)
+
+    def _snapshot(self, key) -> dict:
+        stats = self._stats[key]
+        live = self._live[key]
+        prev_close = self._last_closed_close[key]
+
+        current_vol = live['volume']
+        avg_vol = stats.mean
+        std_vol = stats.std
+
+        return {
+            'timestamp': live['timestamp'],
+            'current_volume': current_vol,
+            'average_volume': avg_vol,
+            'std_volume': std_vol,
+            'volume_ratio': current_vol / avg_vol if avg_vol > 0 else 1,
+            'z_score': (current_vol - avg_vol) / std_vol if std_vol > 0 else 0,
+            'price_change': (live['close'] - prev_close) / prev_close * 100 if prev_close else 0,
+        }
+
+    def _evaluate_spike(self, key) -> dict:
+        snapshot = self._snapshot(key)
+        ratio = snapshot['volume_ratio']
+        price_change = snapshot['price_change']
+        threshold = self.spike_threshold
+
+        if ratio < threshold:
+            return {'detected': False, 'timestamp': snapshot['timestamp']}
+
+        if price_change > 0:
+            direction = "BULLISH"
+            description = f"Spike de volumen ({ratio:.1f}x) con precio SUBIENDO"
+        else:
+            direction = "BEARISH"
+            description = f"Spike de volumen ({ratio:.1f}x) con precio BAJANDO"
+
+        return {
+            'detected': True,
+            'timestamp': snapshot['timestamp'],
+            'ratio': ratio,
+            'threshold': threshold,
+            'z_score': snapshot['z_score'],
+            'direction': direction,
+            'price_change': price_change,
+            'description': description,
+            'confidence': min(70 + (ratio - threshold) * 10, 95)
+        }
@@ -0,0 +1,226 @@
+"""
+Pivotes (swing highs / lows) incrementales por símbolo
+Cada vela cerrada entra una sola vez; un pivote se confirma cuando ya
+pasaron `order` velas a su derecha y se guarda en una lista acotada. Los
+soportes/resistencias y el doble techo/suelo consultan esa lista en vez de
+volver a pasar argrelextrema por toda la ventana en cada ciclo.
+
+Los pivotes de una ventana son exactamente los de
+argrelextrema(..., mode='clip') sobre ella: el interior sale de la lista y
+solo los bordes (menos de `order` velas, donde el clip recorta vecinos o
+entra la vela en curso) se evalúan al consultar.
+"""
+import threading
+from collections import deque
+import numpy as np
+
+# Pivotes recordados por lado (una ventana de 100 velas con order=3 tiene
+# como mucho ~15); si se quedan cortos se recalcula con argrelextrema
+MAX_PIVOTS = 64
+
+
+def argrelextrema(data: np.ndarray, comparator, order: int = 1) -> np.ndarray:
+    """
+    Índices de extremos relativos, igual que scipy.signal.argrelextrema
+    (bordes con mode='clip') pero sin importar scipy (~1 s al arrancar)
+
+    Returns:
+        Array de índices (no tupla)
+    """
+    n = len(data)
+    idx = np.arange(n)
+    result = np.ones(n, dtype=bool)
+    for shift in range(1, order + 1):
+        result &= comparator(data, data[np.minimum(idx + shift, n - 1)])
+        result &= comparator(data, data[np.maximum(idx - shift, 0)])
+        if not result.any():
+            break
+    return np.nonzero(result)[0]
+
+
+class PivotDetector:
+    """Máximos de highs y mínimos de lows confirmados de un símbolo, para un `order`"""
+
+    def __init__(self, order: int, maxlen: int = MAX_PIVOTS):
+        self.order = order
+        self.maxlen = maxlen
+        self.reset()
+
+    def reset(self):
+        # (high, low) de las últimas 2·order+1 velas cerradas: la del centro es la candidata
+        self._buffer = deque(maxlen=2 * self.order + 1)
+        self.highs = deque(maxlen=self.maxlen)  # (nº de vela, high)
+        self.lows = deque(maxlen=self.maxlen)   # (nº de vela, low)
+        self.count = 0  # velas cerradas vistas desde el último reset
+        self.first_ts = None
+        self.last_ts = None
+        self._settled_key = None
+        self._settled = None
+
+    def push(self, timestamp: int, high: float, low: float):
+        """Incorpora una vela cerrada (O(order))"""
+        buffer = self._buffer
+        buffer.append((high, low))
+        if self.first_ts is None:
+            self.first_ts = timestamp
+        self.last_ts = timestamp
+        self.count += 1
+
+        if len(buffer) < buffer.maxlen:
+            return
+        seq = self.count - 1 - self.order
+        h, l = buffer[self.order]
+        others = [bar for k, bar in enumerate(buffer) if k != self.order]
+        if all(h > bar[0] for bar in others):
+            self.highs.append((seq, h))
+        if all(l < bar[1] for bar in others):
+            self.lows.append((seq, l))
+
+    def rebuild(self, timestamps, highs, lows, closed: int):
+        """Reconstruye desde las `closed` primeras velas de una ventana (de golpe)"""
+        self.reset()
+        order = self.order
+        if closed == 0:
+            return
+        inner = slice(order, closed - order)  # velas con vecindario completo
+        for idx, values, side in ((argrelextrema(highs[:closed], np.greater, order), highs, self.highs),
+                                  (argrelextrema(lows[:closed], np.less, order), lows, self.lows)):
+            idx = idx[(idx >= inner.start) & (idx < inner.stop)]
+            side.extend(zip(idx.tolist(), values[idx].tolist()))
+        start = max(0, closed - self._buffer.maxlen)
+        self._buffer.extend(zip(highs[start:closed].tolist(), lows[start:closed].tolist()))
+        self.count = closed
+        self.first_ts = int(timestamps[0])
+        self.last_ts = int(timestamps[closed - 1])
+
+    def sync(self, timestamps, highs, lows):
+        """
+        Incorpora las velas cerradas nuevas de una ventana (la última es la
+        vela en curso). Si la ventana no enlaza con lo ya visto (hueco o
+        símbolo nuevo) se reconstruye desde ella.
+        """
+        closed = len(timestamps) - 1
+        if self.last_ts is None:
+            self.rebuild(timestamps, highs, lows, closed)
+            return
+        first_new = int(np.searchsorted(timestamps[:closed], self.last_ts, side='right'))
+        if first_new == 0 or timestamps[first_new - 1] != self.last_ts:
+            self.rebuild(timestamps, highs, lows, closed)
+            return
+        for i in range(first_new, closed):
+            self.push(int(timestamps[i]), float(highs[i]), float(lows[i]))
+
+    def pivots(self, timestamps, highs, lows, start: int = 0) -> tuple:
+        """
+        Pivotes de la ventana [start:], relativos a start (como
+        argrelextrema sobre highs[start:] / lows[start:])
+
+        Lo que solo depende de velas cerradas (borde izquierdo + interior)
+        se guarda mientras no entre otra vela; en cada llamada solo se
+        evalúa el borde derecho (order+1 velas, con la vela en curso).
+
+        Returns:
+            (índices de máximos, índices de mínimos)
+        """
+        n = len(timestamps)
+        order = self.order
+        closed = n - 1
+        inner_lo = start + order          # interior: vecindario completo
+        inner_hi = closed - 1 - order     # y solo velas cerradas
+
+        if not (self.first_ts is not None
+                and inner_lo <= inner_hi
+                and timestamps[start] >= self.first_ts
+                and self.last_ts == timestamps[closed - 1]):
+            return (argrelextrema(highs[start:], np.greater, order),
+                    argrelextrema(lows[start:], np.less, order))
+
+        key = (int(timestamps[start]), n - start, self.last_ts)
+        if self._settled_key != key:
+            self._settled_key = key
+            self._settled = (
+                self._settled_side(self.highs, highs, start, inner_lo, inner_hi, closed, _greater),
+                self._settled_side(self.lows, lows, start, inner_lo, inner_hi, closed, _less),
+            )
+
+        tail_from = inner_hi + 1 - order
+        result = []
+        for settled, values, better in zip(self._settled, (highs, lows), (_greater, _less)):
+            tail = values[tail_from:].tolist()
+            edge = _clip_extrema(tail, better, order, range(order, len(tail)), 0)
+            result.append(np.array(settled + [tail_from + j - start for j in edge], dtype=np.intp))
+        return tuple(result)
+
+    def _settled_side(self, side, values, start, inner_lo, inner_hi, closed, better) -> list:
+        """Pivotes (relativos a start) del borde izquierdo y del interior de la ventana"""
+        if len(side) == side.maxlen and side[0][0] > self._seq_at(inner_lo, closed):
+            # La lista acotada ya no llega al inicio del interior
+            found = _clip_extrema(values[start:inner_hi + 1 + self.order].tolist(), better, self.order,
+                                  range(0, inner_hi + 1 - start), 0)
+            return found
+
+        head = values[start:inner_lo + self.order + 1].tolist()
+        found = _clip_extrema(head, better, self.order, range(0, inner_lo - start), 0)
+
+        first_seq = self._seq_at(inner_lo, closed)
+        last_seq = self._seq_at(inner_hi, closed)
+        offset = inner_lo - first_seq - start
+        found.extend(seq + offset for seq, _ in side if first_seq <= seq <= last_seq)
+        return found
+
+    def _seq_at(self, index, closed) -> int:
+        """Número de vela del stream de la posición `index` de una ventana sincronizada"""
+        return self.count - closed + index
+
+
+def _greater(a, b):
+    return a > b
+
+
+def _less(a, b):
+    return a < b
+
+
+def _clip_extrema(values: list, better, order: int, candidates, start: int) -> list:
+    """
+    Qué candidatos son extremos estrictos con vecinos recortados a
+    [start, len(values)) (la semántica de argrelextrema mode='clip': el
+    primero y el último nunca lo son)
+    """
+    last = len(values) - 1
+    found = []
+    for j in candidates:
+        if j <= start or j >= last:
+            continue
+        center = values[j]
+        if all(better(center, v) for v in values[max(j - order, start):j]) and \
+                all(better(center, v) for v in values[j + 1:min(j + order, last) + 1]):
+            found.append(j)
+    return found
+
+
+class SwingPoints:
+    """PivotDetector por (símbolo, order)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._detectors = {}
+
+    def pivots(self, symbol: str, candles: dict, order: int, start: int = 0) -> tuple:
+        """
+        Sincroniza con las velas (la última es la vela en curso) y devuelve
+        los pivotes de candles[start:] (ver PivotDetector.pivots)
+        """
+        timestamps = candles['timestamp']
+        highs = candles['high']
+        lows = candles['low']
+        with self._lock:
+            detector = self._detectors.get((symbol, order))
+            if detector is None:
+                detector = PivotDetector(order)
+                self._detectors[(symbol, order)] = detector
+            detector.sync(timestamps, highs, lows)
+            return detector.pivots(timestamps, highs, lows, start)
+
+    def __len__(self):
+        return len(self._detectors)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""
+Envío concurrente de mensajes de Telegram respetando los límites de la API
+- Token bucket global (~30 msgs/s) + límite por chat
+- Respeta retry_after en 429 y reintenta fallos transitorios
+- Una sola sesión HTTP con pool de conexiones
+"""
+import asyncio
+import threading
+import time
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket asíncrono: `rate` tokens/s con ráfaga de `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TelegramBroadcaster:
+    """
+    Reparte un mensaje a muchos chats en paralelo
+
+    El envío real lo hace `sender` (por defecto POST a sendMessage con
+    aiohttp). Un sender recibe (chat_id, text, parse_mode) y devuelve un dict
+    {'ok', 'retry_after', 'retryable', 'error'}.
+    """
+
+    def __init__(self, token: str = None, api_base: str = None, sender=None,
+                 global_rate: float = None, per_chat_rate: float = None, loop=None):
+        self.token = token or Config.TELEGRAM_BOT_TOKEN
+        self.api_base = api_base or Config.TELEGRAM_API_BASE
+        self.sender = sender or self._post_message
+        self.global_rate = global_rate or Config.TELEGRAM_GLOBAL_RATE
+        self.per_chat_interval = 1 / (per_chat_rate or Config.TELEGRAM_PER_CHAT_RATE)
+        self.max_retries = Config.TELEGRAM_MAX_RETRIES
+        self.concurrency = Config.TELEGRAM_CONCURRENCY
+
+        self._session = None
+        self._bucket = None
+        self._semaphore = None
+        self._paused_until = 0.0
+        self._chat_next = {}  # chat_id -> próximo envío permitido (monotonic)
+
+        # Loop para el uso desde código síncrono: el indicado (p. ej. el del
+        # bot) o uno propio en un hilo
+        self._loop = loop
+        self._loop_lock = threading.Lock()
+
+    async def broadcast(self, chat_ids: list, text: str, parse_mode: str = 'HTML',
+                        progress: dict = None) -> dict:
+        """
+        Envía `text` a todos los chats
+
+        Args:
+            progress: dict donde ir dejando chat_id -> resultado según
+                termina cada envío (para saber qué se confirmó si se corta)
+
+        Returns:
+            dict con sent, failed, elapsed (segundos), delivered (chat_ids) y
+            errors ({chat_id: {'error', 'retryable'}})
+        """
+        if self._bucket is None:
+            self._bucket = TokenBucket(self.global_rate)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        progress = {} if progress is None else progress
+
+        async def send(chat_id):
+            progress[chat_id] = await self._send(chat_id, text, parse_mode)
+
+        started = time.monotonic()
+        await asyncio.gather(*(send(chat_id) for chat_id in chat_ids))
+        return self._summary(chat_ids, progress, started)
+
+    def broadcast_sync(self, chat_ids: list, text: str, parse_mode: str = 'HTML',
+                       timeout: float = 300) -> dict:
+        """
+        Versión síncrona (desde otro hilo): corre en el loop del broadcaster
+
+        Si vence `timeout` se cancela lo que falte: los chats ya confirmados
+        salen como entregados y el resto como error reintentable.
+        """
+        progress = {}
+        started = time.monotonic()
+        future = asyncio.run_coroutine_threadsafe(
+            self.broadcast(chat_ids, text, parse_mode, progress), self._get_loop()
+        )
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            result = self._summary(chat_ids, dict(progress), started)
+            logger.warning(f"⏳ Envío cortado a los {timeout:.0f}s: {result['sent']}/{len(chat_ids)} confirmados")
+            return result
+        except Exception:
+            # Loop detenido: no dejar el envío colgado
+            future.cancel()
+            raise
+
+    @staticmethod
+    def _summary(chat_ids: list, results: dict, started: float) -> dict:
+        """Resultado de broadcast; los chats sin respuesta cuentan como timeout"""
+        unanswered = {'ok': False, 'retryable': True, 'error': 'timeout'}
+        delivered = [chat_id for chat_id in chat_ids if results.get(chat_id, unanswered)['ok']]
+        errors = {}
+        for chat_id in chat_ids:
+            result = results.get(chat_id, unanswered)
+            if not result['ok']:
+                errors[chat_id] = {'error': result.get('error'), 'retryable': bool(result.get('retryable'))}
+
+        return {
+            'sent': len(delivered),
+            'failed': len(errors),
+            'elapsed': time.monotonic() - started,
+            'delivered': delivered,
+            'errors': errors,
+        }
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="TelegramBroadcaster", daemon=True).start()
+            return self._loop
+
+    async def _send(self, chat_id, text: str, parse_mode: str) -> dict:
+        result = {'ok': False, 'retryable': True, 'error': 'sin intentos'}
+        for attempt in range(1, self.max_retries + 1):
+            await self._wait_turn(chat_id)
+
+            async with self._semaphore:
+                result = await self.sender(chat_id, text, parse_mode)
+
+            if result['ok']:
+                return result
+
+            if result.get('retry_after'):
+                # Flood control: pausar todos los envíos el tiempo indicado
+                retry_after = float(result['retry_after'])
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                logger.warning(f"⏳ Telegram pide esperar {retry_after:.0f}s (chat {chat_id})")
+                continue
+
+            if not result.get('retryable') or attempt == self.max_retries:
+                logger.error(f"❌ Error enviando a {chat_id}: {result.get('error')}")
+                return result
+
+            await asyncio.sleep(min(2 ** (attempt - 1), 10))
+
+        return result
+
+    async def _wait_turn(self, chat_id):
+        """Pausa global por 429, límite por chat y token bucket global"""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        now = time.monotonic()
+        next_allowed = self._chat_next.get(chat_id, now)
+        self._chat_next[chat_id] = max(now, next_allowed) + self.per_chat_interval
+        if next_allowed > now:
+            await asyncio.sleep(next_allowed - now)
+
+        await self._bucket.acquire()
+
+    async def _post_message(self, chat_id, text: str, parse_mode: str) -> dict:
+        """Sender por defecto: POST /bot<token>/sendMessage"""
+        import aiohttp  # ~0.2 s de import: solo cuando se envía sin el bot de PTB
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10),
+                connector=aiohttp.TCPConnector(limit=self.concurrency)
+            )
+
+        url = f"{self.api_base}/bot{self.token}/sendMessage"
+        try:
+            async with self._session.post(url, json={
+                'chat_id': chat_id,
+                'text': text,
+                'parse_mode': parse_mode
+            }) as response:
+                try:
+                    payload = await response.json(content_type=None)
+                except ValueError:
+                    payload = {}
+
+                if response.status == 200 and payload.get('ok', True):
+                    return {'ok': True}
+
+                return {
+                    'ok': False,
+                    'retry_after': (payload.get('parameters') or {}).get('retry_after')
+                    if response.status == 429 else None,
+                    'retryable': response.status == 429 or response.status >= 500,
+                    'error': payload.get('description') or f"HTTP {response.status}",
+                }
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {'ok': False, 'retryable': True, 'error': str(e) or type(e).__name__}
+
+
+def make_bot_sender(bot):
+    """Sender que usa el cliente HTTP del bot de python-telegram-bot"""
+    from telegram.error import RetryAfter, NetworkError, TimedOut
+
+    async def sender(chat_id, text: str, parse_mode: str) -> dict:
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            return {'ok': True}
+        except RetryAfter as e:
+            return {'ok': False, 'retry_after': e.retry_after, 'retryable': True, 'error': str(e)}
+        except (TimedOut, NetworkError) as e:
+            return {'ok': False, 'retryable': True, 'error': str(e)}
+        except Exception as e:
+            return {'ok': False, 'retryable': False, 'error': str(e)}
+
+    return sender
+
+
+async def _load_test(n_chats: int, rate: float):
+    """Prueba de carga contra un servidor falso de la Bot API en localhost"""
+    from aiohttp import web
+    import random
+
+    received = {'count': 0, 'throttled': 0}
+
+    async def send_message(request):
+        await request.json()
+        await asyncio.sleep(random.uniform(0.02, 0.15))  # Latencia simulada
+        roll = random.random()
+        if roll < 0.01:
+            received['throttled'] += 1
+            return web.json_response(
+                {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                 'parameters': {'retry_after': 1}}, status=429)
+        if roll < 0.03:
+            return web.json_response({'ok': False, 'description': 'Bad Gateway'}, status=502)
+        received['count'] += 1
+        return web.json_response({'ok': True, 'result': {}})
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/sendMessage', send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    broadcaster = TelegramBroadcaster(token='TEST', api_base=f"http://127.0.0.1:{port}", global_rate=rate)
+    result = await broadcaster.broadcast(list(range(n_chats)), "🚀 prueba")
+    await broadcaster.close()
+    await runner.cleanup()
+
+    print(f"\n{'='*50}")
+    print(f"Chats: {n_chats} | Límite global: {rate:.0f} msg/s")
+    print(f"Enviados: {result['sent']} | Fallidos: {result['failed']} | 429 recibidos: {received['throttled']}")
+    print(f"Tiempo: {result['elapsed']:.2f}s ({result['sent'] / result['elapsed']:.1f} msg/s)")
+    print(f"{'='*50}")
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.WARNING)
+
+    # Uso: python telegram_broadcaster.py [chats] [msgs_por_segundo]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    msgs_per_second = float(sys.argv[2]) if len(sys.argv) > 2 else Config.TELEGRAM_GLOBAL_RATE
+    asyncio.run(_load_test(n, msgs_per_second))
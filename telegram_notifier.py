@@ -2,15 +2,18 @@
 Sistema de notificaciones por Telegram
 Envía señales a todos los usuarios autorizados
 """
-import requests
 from config import Config
+from telegram_broadcaster import TelegramBroadcaster, make_bot_sender
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Destino de las señales cuando no hay token de Telegram
+CONSOLE_CHAT = 'console'
+
 # Importar gestión de keys
 try:
-    from keys_manager import get_authorized_chat_ids, cleanup_expired
+    from keys_manager import get_authorized_chat_ids
     KEYS_ENABLED = True
 except ImportError:
     KEYS_ENABLED = False
@@ -22,7 +25,7 @@ class TelegramNotifier:
         """Inicializa el notificador de Telegram"""
         self.token = Config.TELEGRAM_BOT_TOKEN
         self.legacy_chat_id = Config.TELEGRAM_CHAT_ID
-        self.api_url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        self.broadcaster = TelegramBroadcaster(self.token)
         
         if self.token:
             logger.info("✅ Telegram notifier inicializado")
@@ -31,9 +34,31 @@ class TelegramNotifier:
         else:
             logger.warning("⚠️ Telegram no configurado")
     
-    def send_signal_sync(self, message):
+    def use_bot(self, bot, loop):
         """
-        Envía una señal a todos los usuarios autorizados (versión síncrona)
+        Envía a través del cliente HTTP del bot, en su event loop
+        (runtime unificado de main.py)
+        """
+        self.broadcaster = TelegramBroadcaster(sender=make_bot_sender(bot), loop=loop)
+        logger.info("🔗 Señales enviadas por el cliente del bot")
+    
+    def get_chat_ids(self) -> list:
+        """Chats que deben recibir las señales"""
+        if not self.token:
+            # Sin Telegram: un único destino, la consola
+            return [CONSOLE_CHAT]
+        
+        if KEYS_ENABLED:
+            return get_authorized_chat_ids()
+        
+        return [self.legacy_chat_id] if self.legacy_chat_id else []
+    
+    def send_to_chats(self, chat_ids, message) -> dict:
+        """
+        Envía el mensaje a los chats indicados
+        
+        Returns:
+            dict con delivered (chat_ids) y errors ({chat_id: {'error', 'retryable'}})
         """
         if not self.token:
             print("\n" + "="*50)
@@ -41,39 +66,21 @@ class TelegramNotifier:
             print("="*50)
             print(message)
             print("="*50 + "\n")
-            return True
-        
-        # Obtener lista de usuarios autorizados
-        if KEYS_ENABLED:
-            cleanup_expired()
-            chat_ids = get_authorized_chat_ids()
-            if not chat_ids:
-                logger.warning("⚠️ No hay usuarios autorizados")
-                return False
-        else:
-            chat_ids = [self.legacy_chat_id] if self.legacy_chat_id else []
+            return {'delivered': list(chat_ids), 'errors': {}}
         
-        sent_count = 0
+        return self.broadcaster.broadcast_sync(chat_ids, message)
+    
+    def send_signal_sync(self, message):
+        """
+        Envía una señal a todos los usuarios autorizados (versión síncrona)
+        """
+        chat_ids = self.get_chat_ids()
+        if not chat_ids:
+            logger.warning("⚠️ No hay usuarios autorizados")
+            return False
         
-        for chat_id in chat_ids:
-            try:
-                response = requests.post(
-                    self.api_url,
-                    json={
-                        'chat_id': chat_id,
-                        'text': message,
-                        'parse_mode': 'HTML'
-                    },
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    sent_count += 1
-                else:
-                    logger.error(f"❌ Error enviando a {chat_id}: {response.text}")
-                    
-            except Exception as e:
-                logger.error(f"❌ Error enviando a {chat_id}: {e}")
+        result = self.send_to_chats(chat_ids, message)
+        sent_count = len(result['delivered'])
         
         if sent_count > 0:
             logger.info(f"✅ Señal enviada a {sent_count}/{len(chat_ids)} usuarios")
@@ -1,8 +1,11 @@
 """
 Script de prueba para analizar una sola criptomoneda
+Solo crea el analizador (sin tracker, notificador ni dispatcher): responde
+en lo que tarda el análisis
 """
 import sys
-from scanner import CryptoScanner
+from ai_analyzer import AIAnalyzer
+from scanner import print_analysis
 
 def main():
     if len(sys.argv) < 2:
@@ -16,8 +19,13 @@ def main():
     
     print(f"\n🔍 Testeando análisis de {symbol}...\n")
     
-    scanner = CryptoScanner()
-    scanner.scan_single(symbol)
+    analysis = AIAnalyzer().analyze_symbol(symbol)
+    
+    if not analysis:
+        print(f"❌ No se pudo analizar {symbol}")
+        sys.exit(1)
+    
+    print_analysis(analysis)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,238 @@
+"""
+Disparadores por eventos del stream
+Encolan símbolos con actividad anormal (volumen, velocidad de precio, OI)
+para re-analizarlos de inmediato, por delante del barrido periódico
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerQueue:
+    """
+    Cola de prioridad de símbolos a re-analizar
+
+    Un símbolo solo aparece una vez: si se vuelve a disparar mientras
+    espera, se conserva la prioridad más alta y la hora del primer disparo.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._pending = {}  # symbol -> entry
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def push(self, symbol: str, priority: float, reason: str) -> bool:
+        """Encola (o sube de prioridad) un símbolo. Devuelve True si cambió algo"""
+        with self._cond:
+            entry = self._pending.get(symbol)
+            if entry and entry['priority'] >= priority:
+                return False
+
+            entry = {
+                'symbol': symbol,
+                'priority': priority,
+                'reason': reason,
+                'triggered_at': entry['triggered_at'] if entry else time.monotonic(),
+                'seq': next(self._seq),
+            }
+            self._pending[symbol] = entry
+            heapq.heappush(self._heap, (-priority, entry['seq'], symbol))
+            self._cond.notify()
+            return True
+
+    def pop(self, timeout: float = None) -> dict:
+        """
+        Saca el símbolo más prioritario
+
+        Args:
+            timeout: segundos a esperar (0 = no bloquear, None = sin límite)
+
+        Returns:
+            dict con symbol, priority, reason, triggered_at o None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                while self._heap:
+                    _, seq, symbol = heapq.heappop(self._heap)
+                    entry = self._pending.get(symbol)
+                    if entry and entry['seq'] == seq:
+                        del self._pending[symbol]
+                        return entry
+
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+
+class LatencyStats:
+    """Latencias disparo -> señal (últimas N muestras)"""
+
+    def __init__(self, maxlen: int = 1000):
+        self.samples = deque(maxlen=maxlen)
+
+    def add(self, ms: float):
+        self.samples.append(ms)
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return {
+            'count': len(ordered),
+            'p50': ordered[len(ordered) // 2],
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            'max': ordered[-1],
+        }
+
+
+class SpikeTrigger:
+    """
+    Vigila ticks del stream y métricas de Futures y encola los símbolos
+    con spikes de volumen, movimientos bruscos de precio o saltos de OI
+    """
+
+    def __init__(self, queue: TriggerQueue, interval: str = None):
+        self.queue = queue
+        self.interval = interval or Config.TIMEFRAME_SHORT
+        self.velocity_pct = Config.TRIGGER_VELOCITY_PCT
+        self.velocity_window = Config.TRIGGER_VELOCITY_WINDOW
+        self.oi_jump_pct = Config.TRIGGER_OI_JUMP_PCT
+        self.cooldown = Config.TRIGGER_COOLDOWN_SECONDS
+
+        self._lock = threading.Lock()
+
+        # symbol -> deque[(t, precio)] dentro de la ventana de velocidad
+        self._prices = {}
+
+        # symbol -> deque[(t, open_interest)]
+        self.oi_series = {}
+
+        # symbol -> último disparo (monotonic)
+        self._last_fired = {}
+
+    def on_volume_spike(self, symbol: str, interval: str, spike: dict):
+        """Listener de VolumeStatsTracker (un aviso por vela)"""
+        if interval != self.interval:
+            return
+        # Prioridad relativa al umbral del tracker, como velocidad y OI con los suyos
+        self._fire(symbol, spike['ratio'] / spike['threshold'], f"spike de volumen {spike['ratio']:.1f}x")
+
+    def on_kline(self, symbol: str, interval: str, kline: dict):
+        """Listener de KlineStream: velocidad de precio"""
+        if interval != self.interval:
+            return
+
+        now = time.monotonic()
+        price = kline['close']
+
+        with self._lock:
+            prices = self._prices.setdefault(symbol, deque())
+            prices.append((now, price))
+            while prices and now - prices[0][0] > self.velocity_window:
+                prices.popleft()
+            reference = prices[0][1]
+
+        if reference <= 0:
+            return
+
+        change = (price - reference) / reference * 100
+        if abs(change) >= self.velocity_pct:
+            self._fire(symbol, abs(change) / self.velocity_pct,
+                       f"precio {change:+.2f}% en {self.velocity_window}s")
+
+    def on_open_interest(self, symbol: str, open_interest: float):
+        """Nueva muestra de Open Interest (desde FuturesAnalyzer)"""
+        with self._lock:
+            series = self.oi_series.setdefault(symbol, deque(maxlen=288))
+            previous = series[-1][1] if series else None
+            series.append((time.time(), open_interest))
+
+        if not previous:
+            return
+
+        change = (open_interest - previous) / previous * 100
+        if abs(change) >= self.oi_jump_pct:
+            self._fire(symbol, abs(change) / self.oi_jump_pct, f"OI {change:+.1f}%")
+
+    def export_oi(self) -> dict:
+        """symbol -> [(t, open_interest), ...]"""
+        with self._lock:
+            return {symbol: list(series) for symbol, series in self.oi_series.items() if series}
+
+    def load_oi(self, series: dict):
+        """Restaura las series volcadas por export_oi"""
+        with self._lock:
+            for symbol, samples in series.items():
+                self.oi_series[symbol] = deque(samples, maxlen=288)
+
+    def _fire(self, symbol: str, priority: float, reason: str):
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_fired.get(symbol)
+            if last is not None and now - last < self.cooldown:
+                return
+            self._last_fired[symbol] = now
+
+        if self.queue.push(symbol, priority, reason):
+            logger.info(f"⚡ Disparo {symbol}: {reason}")
+
+
+class OpenInterestPoller:
+    """
+    Sondea el Open Interest del universo en su propio hilo, para que los
+    saltos de OI disparen entre barridos y no solo cuando un análisis
+    pide el OI del símbolo
+    """
+
+    def __init__(self, futures_analyzer, symbols, interval: float = None):
+        """
+        Args:
+            futures_analyzer: FuturesAnalyzer (sus oi_listeners reciben las muestras)
+            symbols: callable sin argumentos que devuelve los símbolos a vigilar
+            interval: segundos entre vueltas
+        """
+        self.futures_analyzer = futures_analyzer
+        self.symbols = symbols
+        self.interval = interval or Config.TRIGGER_OI_POLL_SECONDS
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="oi-poller", daemon=True)
+        self._thread.start()
+        logger.info(f"📈 Sondeo de OI cada {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            for symbol in list(self.symbols() or ()):
+                if self._stop.is_set():
+                    return
+                self.futures_analyzer.sample_open_interest(symbol)
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
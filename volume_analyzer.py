@@ -2,20 +2,32 @@
 Detector de Volumen Anormal
 Identifica actividad inusual que puede indicar movimiento grande
 """
-import pandas as pd
+import time
 import numpy as np
 import logging
-from binance.client import Client
 from config import Config
+from binance_client import get_client
+from candles import klines_to_arrays
+from streaming_stats import VolumeStatsTracker
+from rule_tables import rules
 
 logger = logging.getLogger(__name__)
 
+# Velas de 1h del perfil de volumen (con menos historial se usa lo que haya, mínimo 100)
+PROFILE_CANDLES = 200
+
 
 class VolumeAnalyzer:
     """Analiza patrones de volumen para detectar actividad de ballenas"""
     
     def __init__(self):
-        self.client = Client(Config.BINANCE_API_KEY, Config.BINANCE_SECRET_KEY)
+        self.client = get_client()
+        
+        # Caché de perfiles: (symbol, bins) -> (expira_ms, perfil sin precio, cierre)
+        self._profile_cache = {}
+        
+        # Media/desviación en streaming por símbolo e intervalo
+        self.stats = VolumeStatsTracker()
     
     def get_volume_analysis(self, symbol: str) -> dict:
         """
@@ -25,6 +37,11 @@ class VolumeAnalyzer:
             dict con análisis de volumen
         """
         try:
+            # Con estadísticas calientes (stream) no hace falta descargar
+            snapshot = self.stats.volume_snapshot(symbol, '1h')
+            if snapshot:
+                return self.interpret_volume(snapshot)
+            
             # Obtener últimas 100 velas de 1h para calcular promedio
             klines = self.client.futures_klines(
                 symbol=symbol,
@@ -35,41 +52,67 @@ class VolumeAnalyzer:
             if not klines or len(klines) < 50:
                 return None
             
-            # Extraer volúmenes
-            volumes = [float(k[5]) for k in klines]
+            candles = klines_to_arrays(klines)
+            self.stats.sync(symbol, '1h', candles)
+            return self.analyze_volume(candles['volume'])
+            
+        except Exception as e:
+            logger.error(f"Error analizando volumen: {e}")
+            return None
+    
+    def analyze_volume(self, volumes: np.ndarray) -> dict:
+        """
+        Volumen reciente vs promedio sobre un array de volúmenes
+        (la última posición es la vela actual)
+        
+        Returns:
+            dict con análisis de volumen
+        """
+        try:
+            if len(volumes) < 50:
+                return None
             
             # Calcular métricas
-            current_vol = volumes[-1]
+            current_vol = float(volumes[-1])
             avg_vol = np.mean(volumes[:-1])  # Promedio sin la vela actual
             std_vol = np.std(volumes[:-1])
             
-            # Ratio actual vs promedio
-            vol_ratio = current_vol / avg_vol if avg_vol > 0 else 1
-            
-            # Z-score para detectar anomalías
-            z_score = (current_vol - avg_vol) / std_vol if std_vol > 0 else 0
-            
-            # Interpretar
-            if vol_ratio >= 5:
-                interpretation = f"Volumen EXTREMO ({vol_ratio:.1f}x) - Ballenas activas"
-                signal = "STRONG_MOVE"
-                confidence = 85
-            elif vol_ratio >= 3:
-                interpretation = f"Volumen MUY ALTO ({vol_ratio:.1f}x) - Movimiento importante"
-                signal = "STRONG_MOVE"
-                confidence = 70
-            elif vol_ratio >= 2:
-                interpretation = f"Volumen ALTO ({vol_ratio:.1f}x) - Interés creciente"
-                signal = "MOVE"
-                confidence = 55
-            elif vol_ratio <= 0.3:
-                interpretation = f"Volumen MUY BAJO ({vol_ratio:.1f}x) - Calma antes de tormenta?"
-                signal = "CALM"
-                confidence = 40
-            else:
-                interpretation = f"Volumen normal ({vol_ratio:.1f}x)"
-                signal = "NORMAL"
-                confidence = 0
+            return self.interpret_volume({
+                'current_volume': current_vol,
+                'average_volume': avg_vol,
+                # Ratio actual vs promedio
+                'volume_ratio': current_vol / avg_vol if avg_vol > 0 else 1,
+                # Z-score para detectar anomalías
+                'z_score': (current_vol - avg_vol) / std_vol if std_vol > 0 else 0,
+            })
+            
+        except Exception as e:
+            logger.error(f"Error analizando volumen: {e}")
+            return None
+    
+    def analyze_volume_stream(self, symbol: str, interval: str = '1h') -> dict:
+        """Análisis de volumen en O(1) desde las estadísticas en streaming"""
+        snapshot = self.stats.volume_snapshot(symbol, interval)
+        return self.interpret_volume(snapshot) if snapshot else None
+    
+    def interpret_volume(self, snapshot: dict) -> dict:
+        """
+        Interpreta el ratio de volumen de la vela actual
+        
+        Args:
+            snapshot: dict con current_volume, average_volume, volume_ratio, z_score
+        
+        Returns:
+            dict con análisis de volumen
+        """
+        try:
+            current_vol = snapshot['current_volume']
+            avg_vol = snapshot['average_volume']
+            vol_ratio = snapshot['volume_ratio']
+            z_score = snapshot['z_score']
+            
+            # Interpretar (tabla volume_ratio de rules.json)
+            interpretation, signal, confidence = rules.volume.lookup(vol_ratio)
             
             return {
                 'current_volume': current_vol,
@@ -98,6 +141,12 @@ class VolumeAnalyzer:
             dict con información del spike si lo hay
         """
         try:
+            # Con el stream activo el spike se evalúa sin peticiones
+            if threshold == self.stats.spike_threshold:
+                spike = self.stats.spike(symbol, timeframe)
+                if spike:
+                    return spike
+            
             # Obtener últimas 50 velas
             klines = self.client.futures_klines(
                 symbol=symbol,
@@ -108,11 +157,26 @@ class VolumeAnalyzer:
             if not klines or len(klines) < 20:
                 return None
             
-            # Analizar
-            volumes = [float(k[5]) for k in klines]
-            prices_close = [float(k[4]) for k in klines]
+            candles = klines_to_arrays(klines)
+            self.stats.sync(symbol, timeframe, candles)
+            return self.detect_spike(candles['volume'], candles['close'], threshold)
+            
+        except Exception as e:
+            logger.error(f"Error detectando spike de volumen: {e}")
+            return None
+    
+    def detect_spike(self, volumes: np.ndarray, prices_close: np.ndarray, threshold=3.0) -> dict:
+        """
+        Detecta un pico de volumen en la última vela de los arrays
+        
+        Returns:
+            dict con información del spike si lo hay
+        """
+        try:
+            if len(volumes) < 20:
+                return None
             
-            current_vol = volumes[-1]
+            current_vol = float(volumes[-1])
             avg_vol = np.mean(volumes[:-1])
             ratio = current_vol / avg_vol if avg_vol > 0 else 1
             
@@ -149,72 +213,242 @@ class VolumeAnalyzer:
         Returns:
             dict con zonas de alto volumen
         """
-        try:
-            # Obtener últimas 200 velas de 1h
-            klines = self.client.futures_klines(
-                symbol=symbol,
-                interval='1h',
-                limit=200
-            )
-            
-            if not klines or len(klines) < 100:
-                return None
-            
-            # Crear DataFrame
-            df = pd.DataFrame(klines, columns=[
-                'timestamp', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_volume', 'trades', 'taker_buy_base',
-                'taker_buy_quote', 'ignore'
-            ])
-            
-            for col in ['high', 'low', 'close', 'volume']:
-                df[col] = df[col].astype(float)
-            
-            # Dividir rango de precio en niveles
-            price_min = df['low'].min()
-            price_max = df['high'].max()
-            n_levels = 20
-            
-            levels = np.linspace(price_min, price_max, n_levels + 1)
-            volume_at_level = []
-            
-            for i in range(len(levels) - 1):
-                low = levels[i]
-                high = levels[i + 1]
-                
-                # Volumen acumulado en este rango
-                mask = (df['low'] <= high) & (df['high'] >= low)
-                vol = df.loc[mask, 'volume'].sum()
-                
-                volume_at_level.append({
-                    'price_low': low,
-                    'price_high': high,
-                    'price_mid': (low + high) / 2,
-                    'volume': vol
-                })
-            
-            # Encontrar zonas de alto volumen (POC - Point of Control)
-            volume_at_level.sort(key=lambda x: x['volume'], reverse=True)
+        return self.get_volume_profiles([symbol]).get(symbol)
+    
+    def get_volume_profiles(self, symbols: list, bins: tuple = None, candles: dict = None) -> dict:
+        """
+        Perfil de volumen de muchos símbolos en un solo lote
+        
+        Cada resultado queda en caché hasta el cierre de la vela de 1h
+        actual, así que en un mismo ciclo de 1h solo se calcula una vez.
+        
+        Args:
+            candles: dict symbol -> velas de 1h ya descargadas (p. ej. del
+                CandleStore); se usan las últimas PROFILE_CANDLES. Los
+                símbolos que no estén o tengan menos se descargan (así el
+                perfil no depende de cuánto lleve el buffer llenándose)
+        
+        Returns:
+            dict symbol -> perfil (mismo formato que volume_profile)
+        """
+        bins = tuple(bins or Config.VOLUME_PROFILE_BINS)
+        candles = candles or {}
+        now_ms = time.time() * 1000
+        
+        results = {}
+        pending = {}
+        for symbol in symbols:
+            given = candles.get(symbol)
+            cached = self._profile_cache.get((symbol, bins))
+            if cached and cached[0] > now_ms:
+                price = float(given['close'][-1]) if given is not None else cached[2]
+                results[symbol] = self.locate_price(cached[1], price)
+                continue
             
-            high_volume_zones = volume_at_level[:3]  # Top 3 zonas
+            if given is not None and len(given['close']) >= PROFILE_CANDLES:
+                pending[symbol] = {col: values[-PROFILE_CANDLES:] for col, values in given.items()}
+                continue
             
-            current_price = float(df['close'].iloc[-1])
+            try:
+                # Obtener últimas 200 velas de 1h
+                klines = self.client.futures_klines(
+                    symbol=symbol,
+                    interval='1h',
+                    limit=PROFILE_CANDLES
+                )
+            except Exception as e:
+                logger.error(f"Error analizando perfil de volumen: {e}")
+                continue
             
-            # Determinar si estamos cerca de una zona de alto volumen
-            for zone in high_volume_zones:
-                if zone['price_low'] <= current_price <= zone['price_high']:
-                    return {
-                        'zones': high_volume_zones,
-                        'current_in_hvz': True,
-                        'interpretation': f"Precio en zona de alto volumen (${zone['price_mid']:.4f})"
-                    }
+            if not klines or len(klines) < 100:
+                continue
             
-            return {
-                'zones': high_volume_zones,
-                'current_in_hvz': False,
-                'interpretation': "Precio fuera de zonas de alto volumen"
+            pending[symbol] = klines_to_arrays(klines)
+        
+        if not pending:
+            return results
+        
+        # Apilar todos los símbolos (rellenando con NaN los más cortos)
+        names = list(pending)
+        n_bars = max(len(pending[s]['close']) for s in names)
+        stacked = {}
+        for col in ('high', 'low', 'volume'):
+            stacked[col] = np.full((len(names), n_bars), np.nan)
+            for row, symbol in enumerate(names):
+                values = pending[symbol][col]
+                stacked[col][row, n_bars - len(values):] = values
+        
+        batches = {
+            n_bins: compute_volume_profiles(stacked['high'], stacked['low'],
+                                            stacked['volume'], n_bins)
+            for n_bins in bins
+        }
+        
+        for row, symbol in enumerate(names):
+            arrays = pending[symbol]
+            profile = self._build_profile(batches, bins, row)
+            price = float(arrays['close'][-1])
+            # Válido hasta que cierre la vela de 1h en curso
+            self._profile_cache[(symbol, bins)] = (float(arrays['close_time'][-1]), profile, price)
+            results[symbol] = self.locate_price(profile, price)
+        
+        return results
+    
+    def volume_profile(self, highs: np.ndarray, lows: np.ndarray,
+                       closes: np.ndarray, volumes: np.ndarray, bins: tuple = None) -> dict:
+        """
+        Perfil de volumen sobre arrays de numpy
+        
+        Returns:
+            dict con zonas de alto volumen
+        """
+        try:
+            bins = tuple(bins or Config.VOLUME_PROFILE_BINS)
+            batches = {
+                n_bins: compute_volume_profiles(highs, lows, volumes, n_bins)
+                for n_bins in bins
             }
+            return self.locate_price(self._build_profile(batches, bins, 0), float(closes[-1]))
             
         except Exception as e:
             logger.error(f"Error analizando perfil de volumen: {e}")
             return None
+    
+    def _build_profile(self, batches: dict, bins: tuple, row: int) -> dict:
+        """Convierte la fila `row` de los lotes en el dict de resultado (sin precio)"""
+        profiles = {}
+        for n_bins in bins:
+            batch = batches[n_bins]
+            edges = batch['edges'][row]
+            va_low = batch['va_low'][row]
+            va_high = batch['va_high'][row]
+            poc = batch['poc'][row]
+            profiles[n_bins] = {
+                'price_low': edges[:-1],
+                'price_high': edges[1:],
+                'volume': batch['volume'][row],
+                'poc': float((edges[poc] + edges[poc + 1]) / 2),
+                'value_area_low': float(edges[va_low]),
+                'value_area_high': float(edges[va_high + 1]),
+            }
+        
+        # Las zonas y la interpretación salen de la resolución principal
+        main = profiles[bins[0]]
+        order = np.argsort(-main['volume'], kind='stable')
+        
+        # Encontrar zonas de alto volumen (POC - Point of Control)
+        high_volume_zones = []
+        for i in order[:3]:  # Top 3 zonas
+            low = float(main['price_low'][i])
+            high = float(main['price_high'][i])
+            high_volume_zones.append({
+                'price_low': low,
+                'price_high': high,
+                'price_mid': (low + high) / 2,
+                'volume': float(main['volume'][i])
+            })
+        
+        return {
+            'zones': high_volume_zones,
+            'poc': main['poc'],
+            'value_area_low': main['value_area_low'],
+            'value_area_high': main['value_area_high'],
+            'profiles': profiles,
+        }
+    
+    @staticmethod
+    def locate_price(profile: dict, current_price: float) -> dict:
+        """
+        Perfil + posición del precio actual (el perfil en caché vale toda
+        la hora, el precio no)
+        """
+        result = dict(profile)
+        result['current_in_hvz'] = False
+        result['interpretation'] = "Precio fuera de zonas de alto volumen"
+        result['in_value_area'] = profile['value_area_low'] <= current_price <= profile['value_area_high']
+        
+        # Determinar si estamos cerca de una zona de alto volumen
+        for zone in profile['zones']:
+            if zone['price_low'] <= current_price <= zone['price_high']:
+                result['current_in_hvz'] = True
+                result['interpretation'] = f"Precio en zona de alto volumen (${zone['price_mid']:.4f})"
+                break
+        
+        return result
+
+
+def compute_volume_profiles(highs, lows, volumes, n_bins: int = 20,
+                            value_area_pct: float = 0.70) -> dict:
+    """
+    Perfil de volumen vectorizado para un lote de símbolos
+    
+    Cada vela reparte su volumen a partes iguales entre los niveles que
+    toca. En lugar de recorrer niveles se suma +v en el primer nivel y -v
+    justo después del último (array de diferencias) y una suma acumulada
+    reconstruye el volumen por nivel.
+    
+    Args:
+        highs, lows, volumes: arrays (símbolos × velas), NaN = sin vela
+        n_bins: número de niveles de precio
+        value_area_pct: fracción del volumen total en la value area
+    
+    Returns:
+        dict con edges (S × n_bins+1), volume (S × n_bins) y los índices
+        de nivel poc, va_low, va_high (S)
+    """
+    highs = np.atleast_2d(np.asarray(highs, dtype=float))
+    lows = np.atleast_2d(np.asarray(lows, dtype=float))
+    volumes = np.atleast_2d(np.asarray(volumes, dtype=float))
+    n_symbols = highs.shape[0]
+    
+    # Dividir rango de precio en niveles
+    price_min = np.nanmin(lows, axis=1)
+    price_max = np.nanmax(highs, axis=1)
+    width = (price_max - price_min) / n_bins
+    width[~(width > 0)] = 1.0
+    edges = price_min[:, None] + width[:, None] * np.arange(n_bins + 1)
+    
+    valid = ~(np.isnan(highs) | np.isnan(lows) | np.isnan(volumes))
+    lo_idx = np.floor((np.where(valid, lows, price_min[:, None]) - price_min[:, None]) / width[:, None])
+    hi_idx = np.floor((np.where(valid, highs, price_min[:, None]) - price_min[:, None]) / width[:, None])
+    lo_idx = np.clip(lo_idx, 0, n_bins - 1).astype(np.int64)
+    hi_idx = np.clip(hi_idx, 0, n_bins - 1).astype(np.int64)
+    share = np.where(valid, volumes, 0.0) / (hi_idx - lo_idx + 1)
+    
+    # Array de diferencias por símbolo: n_bins + 1 huecos por fila
+    offsets = np.arange(n_symbols)[:, None] * (n_bins + 1)
+    diff = np.bincount(
+        np.concatenate([(offsets + lo_idx).ravel(), (offsets + hi_idx + 1).ravel()]),
+        weights=np.concatenate([share.ravel(), -share.ravel()]),
+        minlength=n_symbols * (n_bins + 1)
+    )
+    volume = np.cumsum(diff.reshape(n_symbols, n_bins + 1), axis=1)[:, :n_bins]
+    volume = np.maximum(volume, 0.0)
+    
+    # Value area: desde el POC, añadir el nivel vecino con más volumen
+    rows = np.arange(n_symbols)
+    poc = np.argmax(volume, axis=1)
+    target = volume.sum(axis=1) * value_area_pct
+    va_low = poc.copy()
+    va_high = poc.copy()
+    acc = volume[rows, poc]
+    
+    for _ in range(n_bins - 1):
+        pending = acc < target
+        if not pending.any():
+            break
+        below = np.where(va_low > 0, volume[rows, np.maximum(va_low - 1, 0)], -1.0)
+        above = np.where(va_high < n_bins - 1, volume[rows, np.minimum(va_high + 1, n_bins - 1)], -1.0)
+        take_above = pending & (above >= 0) & (above >= below)
+        take_below = pending & ~take_above & (below >= 0)
+        va_high = va_high + take_above
+        va_low = va_low - take_below
+        acc = acc + np.where(take_above, above, 0.0) + np.where(take_below, below, 0.0)
+    
+    return {
+        'edges': edges,
+        'volume': volume,
+        'poc': poc,
+        'va_low': va_low,
+        'va_high': va_high,
+    }